@@ -0,0 +1,83 @@
+"""
+A stand-in for the embedding server that runs without the model.
+
+It serves the embedding server's socket protocol with the server's own queues
+(src/ai_service/embeddings/server.py), but a text's embedding is its hashed
+words, projected to --dimension and normalized: similar texts still get
+similar vectors, and no model has to be downloaded. Encoding sleeps
+--ms-per-text per text in place of the model's work, so load tests measure
+the service around it.
+
+Usage (from the ai-service directory):
+
+    PYTHONPATH=src python benchmarks/fake_embeddings.py --socket /tmp/fake.sock
+    EMBEDDING_SERVER_SOCKET=/tmp/fake.sock make run
+"""
+
+import argparse
+import re
+import signal
+import threading
+import time
+import zlib
+from typing import Any
+
+import numpy as np
+
+from ai_service.embeddings.server import EmbeddingQueue, EmbeddingServer
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+class FakeTokenizer:
+    def __call__(self, text: str, **_options: Any) -> dict[str, list[int]]:
+        return {
+            "input_ids": [zlib.crc32(token.encode()) for token in _TOKEN.findall(text)]
+        }
+
+
+class FakeModel:
+    """Just enough of SentenceTransformer for EmbeddingQueue."""
+
+    def __init__(self, dimension: int, ms_per_text: float):
+        self.dimension = dimension
+        self.ms_per_text = ms_per_text
+        self.tokenizer = FakeTokenizer()
+
+    def encode(self, texts: list[str], **_options: Any) -> np.ndarray:
+        time.sleep(len(texts) * self.ms_per_text / 1000)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                hashed = zlib.crc32(token.encode())
+                embeddings[row, hashed % self.dimension] += 1 if hashed & 1 else -1
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--ms-per-text", type=float, default=1.0)
+    args = parser.parse_args()
+
+    queue = EmbeddingQueue(FakeModel(args.dimension, args.ms_per_text))
+    queue.start()
+    server = EmbeddingServer(args.socket, queue)
+
+    def stop(_signum: int, _frame: Any) -> None:
+        # shutdown() waits for serve_forever, so it can't run on this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+A stand-in for Ollama that answers /api/chat without a model.
+
+It speaks the chat API the service uses, with and without streaming, and
+generates filler tokens at a configurable rate after a configurable time to
+first token, so load tests measure the service instead of the GPU. A request
+with no messages only "loads the model", like Ollama does.
+
+Usage (from the ai-service directory):
+
+    python benchmarks/fake_ollama.py --port 11435 --tokens-per-s 50 --latency-ms 200
+    OLLAMA_HOST=http://127.0.0.1:11435 make run
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+_WORDS = ["the", "handler", "reads", "chunks", "from", "each", "file", "and", "then"]
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    tokens_per_s: float = 0.0,
+    tokens: int = 64,
+    error_rate: float = 0.0,
+    seed: int | None = None,
+) -> FastAPI:
+    """
+    Build the fake server.
+
+    Args:
+        latency_ms: Delay before the first token, standing in for prompt processing.
+        tokens_per_s: Generation speed; 0 generates all tokens at once.
+        tokens: Number of tokens in every answer.
+        error_rate: Fraction of chat requests that fail with a 500.
+        seed: Seed for the error draws, for reproducible runs.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0, "active": 0, "max_active": 0}
+
+    def _chunk(model: str, content: str, done: bool, **extra: Any) -> dict[str, Any]:
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+            **extra,
+        }
+
+    def _final(model: str, prompt: str, started: float, reason: str) -> dict[str, Any]:
+        return _chunk(
+            model,
+            "",
+            True,
+            done_reason=reason,
+            total_duration=int((time.perf_counter() - started) * 1e9),
+            prompt_eval_count=len(prompt.split()),
+            eval_count=tokens if reason == "stop" else 0,
+        )
+
+    async def _generate(body: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        """Yield the response chunks of one chat request at the configured pace."""
+        started = time.perf_counter()
+        model = body.get("model", "fake")
+        messages = body.get("messages") or []
+        prompt = " ".join(message.get("content", "") for message in messages)
+        if not messages:
+            yield _final(model, prompt, started, "load")
+            return
+        await asyncio.sleep(latency_ms / 1000)
+        for index in range(tokens):
+            if tokens_per_s > 0:
+                # Pace against the start, so sleep overhead doesn't accumulate
+                due = started + latency_ms / 1000 + index / tokens_per_s
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            yield _chunk(model, _WORDS[index % len(_WORDS)] + " ", False)
+        yield _final(model, prompt, started, "stop")
+
+    @app.post("/api/chat")
+    async def chat(request: Request) -> Any:
+        body = await request.json()
+        stats["requests"] += 1
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": "fake failure"})
+
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        if body.get("stream", True):
+
+            async def lines() -> AsyncIterator[str]:
+                try:
+                    async for chunk in _generate(body):
+                        yield json.dumps(chunk) + "\n"
+                finally:
+                    stats["active"] -= 1
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        try:
+            content = []
+            async for chunk in _generate(body):
+                content.append(chunk["message"]["content"])
+        finally:
+            stats["active"] -= 1
+        chunk["message"]["content"] = "".join(content)
+        return chunk
+
+    @app.get("/api/tags")
+    async def tags() -> dict[str, Any]:
+        return {"models": [{"name": "fake", "model": "fake"}]}
+
+    @app.get("/stats")
+    async def get_stats() -> dict[str, int]:
+        """Requests seen and the highest number generating at once."""
+        return stats
+
+    @app.get("/")
+    async def root() -> PlainTextResponse:
+        return PlainTextResponse("Ollama is running")
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    app = create_app(
+        args.latency_ms, args.tokens_per_s, args.tokens, args.error_rate, args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
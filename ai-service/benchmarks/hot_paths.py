@@ -0,0 +1,431 @@
+"""
+Benchmark the ingest and retrieval hot paths on a synthetic repository.
+
+A repository of configurable size and language mix is generated on disk from a
+seed, then each stage is timed on it: scan_code_files, chunk_code_file,
+embed_documents, add_chunks, query_chunks and end-to-end /answer with the LLM
+replaced by a stub. Nothing goes over the network: the embedding model is
+loaded from the local Hugging Face cache (run once with --online to fetch it)
+and /answer is called in-process.
+
+The JSON report records the commit and parameters next to the timings, and
+--compare fails on stages that got slower than in an earlier report.
+
+Usage (from the ai-service directory):
+
+    PYTHONPATH=src python benchmarks/hot_paths.py --output before.json
+    PYTHONPATH=src python benchmarks/hot_paths.py --compare before.json
+    PYTHONPATH=src python benchmarks/hot_paths.py --files 2000 --languages py=1,go=1
+    PYTHONPATH=src python benchmarks/hot_paths.py --stages scan_code_files chunk_code_file
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+STAGES = [
+    "scan_code_files",
+    "chunk_code_file",
+    "embed_documents",
+    "add_chunks",
+    "query_chunks",
+    "answer",
+]
+# Stages that need the embedding model; without embed_documents, add_chunks
+# and query_chunks use random vectors instead
+MODEL_STAGES = {"embed_documents", "answer"}
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_TEMPLATES = {
+    "py": (
+        "def {name}(items, limit={n}):\n"
+        '    """Return the {noun} of the first items."""\n'
+        "    total = 0\n"
+        "    for item in items[:limit]:\n"
+        "        total += len(str(item))\n"
+        "    return total\n"
+    ),
+    "js": (
+        "export function {name}(items, limit = {n}) {{\n"
+        "  // Return the {noun} of the first items\n"
+        "  return items.slice(0, limit).reduce((sum, x) => sum + String(x).length, 0);\n"
+        "}}\n"
+    ),
+    "ts": (
+        "export function {name}(items: unknown[], limit = {n}): number {{\n"
+        "  // Return the {noun} of the first items\n"
+        "  let total = 0;\n"
+        "  for (const item of items.slice(0, limit)) total += String(item).length;\n"
+        "  return total;\n"
+        "}}\n"
+    ),
+    "go": (
+        "// {name} returns the {noun} of the first items.\n"
+        "func {name}(items []string) int {{\n"
+        "\ttotal := 0\n"
+        "\tfor i, item := range items {{\n"
+        "\t\tif i >= {n} {{\n"
+        "\t\t\tbreak\n"
+        "\t\t}}\n"
+        "\t\ttotal += len(item)\n"
+        "\t}}\n"
+        "\treturn total\n"
+        "}}\n"
+    ),
+    "java": (
+        "    /** Returns the {noun} of the first items. */\n"
+        "    public static int {name}(List<String> items) {{\n"
+        "        return items.stream().limit({n}).mapToInt(String::length).sum();\n"
+        "    }}\n"
+    ),
+    "rs": (
+        "/// Returns the {noun} of the first items.\n"
+        "pub fn {name}(items: &[String]) -> usize {{\n"
+        "    items.iter().take({n}).map(|item| item.len()).sum()\n"
+        "}}\n"
+    ),
+    "md": "## {name}\n\nDescribes the {noun} of the first {n} items.\n",
+}
+_NOUNS = ["length", "checksum", "weight", "size", "score", "cost", "count", "rank"]
+
+
+def _parse_languages(value: str) -> dict[str, float]:
+    """Parse a language mix such as "py=3,ts=1" into weights."""
+    mix: dict[str, float] = {}
+    for part in value.split(","):
+        language, _, weight = part.partition("=")
+        if language not in _TEMPLATES:
+            raise argparse.ArgumentTypeError(
+                f"Unknown language {language!r}, expected one of {sorted(_TEMPLATES)}"
+            )
+        mix[language] = float(weight or 1)
+    return mix
+
+
+def generate_repo(
+    root: str,
+    files: int,
+    functions_per_file: int,
+    languages: dict[str, float],
+    seed: int,
+) -> dict[str, int]:
+    """Write a synthetic repository under root. The same seed gives the same files."""
+    rng = random.Random(seed)
+    names, weights = zip(*languages.items())
+    total_bytes = 0
+    for index in range(files):
+        language = rng.choices(names, weights)[0]
+        directory = os.path.join(root, f"pkg_{index // 50}")
+        os.makedirs(directory, exist_ok=True)
+        blocks = [
+            _TEMPLATES[language].format(
+                name=f"{rng.choice(_NOUNS)}_{index}_{f}",
+                noun=rng.choice(_NOUNS),
+                n=rng.randint(1, 100),
+            )
+            for f in range(rng.randint(1, 2 * functions_per_file - 1))
+        ]
+        content = "\n".join(blocks)
+        with open(os.path.join(directory, f"module_{index}.{language}"), "w") as f:
+            f.write(content)
+        total_bytes += len(content)
+    # Files the scanner must skip
+    with open(os.path.join(root, "logo.png"), "wb") as f:
+        f.write(bytes(1024))
+    return {"files": files, "bytes": total_bytes}
+
+
+def _summary(latencies_ms: list[float], items: int) -> dict[str, Any]:
+    """Latency percentiles, plus throughput for stages that process many items."""
+    ordered = sorted(latencies_ms)
+    summary: dict[str, Any] = {
+        "runs": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[math.ceil(len(ordered) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+    if items > 1:
+        summary["items"] = items
+        summary["items_per_s"] = round(items / (statistics.median(ordered) / 1000), 1)
+    return summary
+
+
+def _timed(run: Callable[[], Any]) -> tuple[float, Any]:
+    start = time.perf_counter()
+    result = run()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configure_environment(args: argparse.Namespace) -> None:
+    """Point the service at a scratch store, the local model cache and no network."""
+    os.environ["CHROMA_STORE_PATH"] = tempfile.mkdtemp(prefix="hot_paths_bench_")
+    os.environ["EMBEDDING_MODEL"] = args.model
+    os.environ["ANSWER_CACHE_MAX_ENTRIES"] = "0"  # time the full /answer path
+    os.environ["METRICS_ENABLED"] = "0"
+    if not args.online:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def _random_embeddings(count: int, dimension: int, seed: int) -> list[list[float]]:
+    vectors = np.random.default_rng(seed).standard_normal((count, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32).tolist()
+
+
+async def _time_answers(questions: list[str], repo_url: str) -> list[float]:
+    """Latency of /answer requests, sent one at a time through the ASGI app."""
+    import httpx
+
+    from ai_service.main import app
+
+    latencies: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for question in questions:
+            start = time.perf_counter()
+            response = await client.post(
+                "/answer",
+                json={"user_question": question, "canonical_github_url": repo_url},
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+    return latencies
+
+
+def _stub_llm(latency_ms: float) -> None:
+    """Replace the Ollama call with a fixed answer after a fixed delay."""
+    from ai_service import ollama_client
+
+    async def chat_with_ollama(prompt: Any, keep_alive: Any = None) -> str:
+        await asyncio.sleep(latency_ms / 1000)
+        return "Stub answer."
+
+    ollama_client.chat_with_ollama = chat_with_ollama  # type: ignore[assignment]
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    _configure_environment(args)
+    # Imported after the environment is set, as the service reads it on import
+    from ai_service.chunking import chunk_code_file
+    from ai_service.db_setup import (
+        add_chunks,
+        get_collection,
+        initialize_db,
+        query_chunks,
+        set_repo_context,
+    )
+    from ai_service.project_ingestor import scan_code_files
+
+    stages = set(args.stages)
+    results: dict[str, Any] = {}
+    root = tempfile.mkdtemp(prefix="hot_paths_repo_")
+    repo = generate_repo(
+        root, args.files, args.functions_per_file, args.languages, args.seed
+    )
+    initialize_db()
+    if stages & MODEL_STAGES:
+        from ai_service.embeddings import initialize_model
+
+        initialize_model()
+
+    def record(stage: str, latencies: list[float], items: int = 1) -> None:
+        results[stage] = _summary(latencies, items)
+        print(json.dumps({"stage": stage, **results[stage]}), file=sys.stderr)
+
+    # Every stage needs the output of the earlier ones, so they always run;
+    # only the selected ones are timed over --repeats runs
+    repeats = args.repeats if "scan_code_files" in stages else 1
+    runs = [_timed(lambda: scan_code_files(root)) for _ in range(repeats)]
+    code_files = runs[0][1]
+    if "scan_code_files" in stages:
+        record("scan_code_files", [ms for ms, _ in runs], len(code_files))
+
+    contents = {}
+    for path in code_files:
+        with open(path, encoding="utf-8") as f:
+            contents[path] = f.read()
+
+    def chunk_all() -> tuple[list[str], list[dict[str, str]]]:
+        chunks: list[str] = []
+        metadatas: list[dict[str, str]] = []
+        for path, content in contents.items():
+            file_chunks = chunk_code_file(path, content)
+            chunks.extend(file_chunks)
+            relative = os.path.relpath(path, root)
+            metadatas.extend({"file_path": relative} for _ in file_chunks)
+        return chunks, metadatas
+
+    repeats = args.repeats if "chunk_code_file" in stages else 1
+    runs = [_timed(chunk_all) for _ in range(repeats)]
+    chunks, metadatas = runs[0][1]
+    if "chunk_code_file" in stages:
+        record("chunk_code_file", [ms for ms, _ in runs], len(chunks))
+
+    if "embed_documents" in stages:
+        from ai_service.embeddings import embed_documents
+
+        embed_documents(chunks[: args.batch])  # first forward pass allocates
+        runs = [_timed(lambda: embed_documents(chunks)) for _ in range(args.repeats)]
+        record("embed_documents", [ms for ms, _ in runs], len(chunks))
+        embeddings = runs[0][1]
+    else:
+        embeddings = _random_embeddings(len(chunks), args.dim, args.seed)
+
+    # Every run writes into its own, empty collection
+    repo_url = "https://github.com/bench/hot-paths.git"
+    latencies = []
+    for attempt in range(args.repeats if "add_chunks" in stages else 1):
+        repo_url = f"https://github.com/bench/hot-paths-{attempt}.git"
+        set_repo_context(repo_url)
+        ms, _ = _timed(lambda: add_chunks(chunks, embeddings, metadatas))
+        latencies.append(ms)
+    if "add_chunks" in stages:
+        record("add_chunks", latencies, len(chunks))
+
+    rng = random.Random(args.seed)
+    questions = [
+        f"How is the {rng.choice(_NOUNS)} of the items computed? ({i})"
+        for i in range(args.queries)
+    ]
+    if "query_chunks" in stages:
+        if "embed_documents" in stages:
+            from ai_service.embeddings import embed_queries
+
+            query_embeddings = embed_queries(questions)
+        else:
+            query_embeddings = _random_embeddings(
+                len(questions), args.dim, args.seed + 1
+            )
+        query_chunks(query_embeddings[0], number_of_results=args.k)  # load the index
+        latencies = [
+            _timed(lambda: query_chunks(embedding, number_of_results=args.k))[0]
+            for embedding in query_embeddings
+        ]
+        record("query_chunks", latencies)
+
+    if "answer" in stages:
+        _stub_llm(args.llm_latency_ms)
+        asyncio.run(_time_answers(questions[:1], repo_url))  # warm up
+        record("answer", asyncio.run(_time_answers(questions, repo_url)))
+
+    return {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": {
+            "files": args.files,
+            "functions_per_file": args.functions_per_file,
+            "languages": args.languages,
+            "seed": args.seed,
+            "model": args.model if stages & MODEL_STAGES else None,
+            "dimension": len(embeddings[0]) if embeddings else None,
+            "repeats": args.repeats,
+            "queries": args.queries,
+            "k": args.k,
+            "llm_latency_ms": args.llm_latency_ms,
+            "vector_backend": os.getenv("VECTOR_BACKEND", "chroma"),
+        },
+        "repository": {**repo, "code_files": len(code_files), "chunks": len(chunks)},
+        "stored_chunks": get_collection().count(),
+        "stages": results,
+    }
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Stages whose median is more than `tolerance` slower than in the baseline."""
+    if report["parameters"] != baseline.get("parameters"):
+        print("Warning: the baseline was run with other parameters", file=sys.stderr)
+    regressions = []
+    for stage, summary in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        ratio = summary["p50_ms"] / before["p50_ms"]
+        line = (
+            f"{stage}: {before['p50_ms']} ms -> {summary['p50_ms']} ms ({ratio:.2f}x)"
+        )
+        print(line, file=sys.stderr)
+        if ratio > 1 + tolerance:
+            regressions.append(line)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--functions-per-file", type=int, default=8)
+    parser.add_argument(
+        "--languages",
+        type=_parse_languages,
+        default=_parse_languages("py=4,ts=2,js=1,go=1,java=1,rs=1,md=1"),
+        metavar="LANG=WEIGHT,...",
+        help=f"Language mix of the files, from {', '.join(_TEMPLATES)}",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument(
+        "--dim", type=int, default=384, help="Random vector size without a model"
+    )
+    parser.add_argument("--batch", type=int, default=32, help="Warm-up batch size")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL))
+    parser.add_argument(
+        "--online", action="store_true", help="Allow downloading the model"
+    )
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown per stage with --compare (0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+"""
+Load test /answer and /ingest against the fake Ollama server.
+
+Starts the fake Ollama (benchmarks/fake_ollama.py), serves synthetic fixture
+repositories over git's HTTP protocol from a local directory, and starts the
+service pointed at both. It then ingests one fixture, the repository that
+questions are asked about. At each --concurrency level, that many clients ask
+/answer in a closed loop for --duration seconds while --ingest-workers clients
+keep ingesting the fixtures. The report gives throughput, p50/p95/p99 latency
+and error rate per endpoint and level, so the level where throughput stops
+growing is the service's own saturation point. With --workers the whole run
+is repeated per number of worker processes, reporting their memory as well.
+
+The service needs the embedding model in the local Hugging Face cache, unless
+--fake-model runs benchmarks/fake_embeddings.py as its embedding server. Questions
+are all different and the answer cache is off, so every request is processed in full.
+
+Usage (from the ai-service directory):
+
+    PYTHONPATH=src python benchmarks/load_test.py --concurrency 1 4 16 64
+    PYTHONPATH=src python benchmarks/load_test.py --tokens-per-s 30 --ingest-workers 0
+    PYTHONPATH=src python benchmarks/load_test.py --workers 1 2 4 --concurrency 32
+    PYTHONPATH=src python benchmarks/load_test.py --fake-model --workers 1 2 4
+    PYTHONPATH=src python benchmarks/load_test.py --target http://127.0.0.1:8000 --repo-url ...
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import httpx
+
+from hot_paths import _parse_languages, generate_repo
+
+_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+
+def _git(cwd: str, *args: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def build_fixtures(root: str, count: int, files: int, seed: int) -> list[str]:
+    """Create bare fixture repositories under root, ready to be served over HTTP."""
+    names = []
+    for index in range(count):
+        work = tempfile.mkdtemp(prefix="load_test_work_")
+        generate_repo(work, files, 8, _parse_languages("py=2,ts=1,go=1"), seed + index)
+        _git(work, "init", "-q")
+        _git(work, "add", ".")
+        _git(work, "commit", "-q", "-m", "fixture")
+        name = f"fixture_{index}.git"
+        _git(root, "clone", "-q", "--bare", work, name)
+        # The dumb HTTP protocol needs the refs listed in info/refs
+        _git(os.path.join(root, name), "update-server-info")
+        names.append(name)
+    return names
+
+
+def serve_directory(root: str) -> tuple[ThreadingHTTPServer, int]:
+    """Serve a directory over HTTP in a background thread."""
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    handler = functools.partial(QuietHandler, directory=root)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def _wait_for(url: str, process: subprocess.Popen, timeout_s: float) -> None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout_s:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(url) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout_s} s")
+
+
+def start_fake_ollama(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    command = [
+        sys.executable,
+        os.path.join(_BENCHMARKS, "fake_ollama.py"),
+        f"--port={args.fake_port}",
+        f"--latency-ms={args.latency_ms}",
+        f"--tokens-per-s={args.tokens_per_s}",
+        f"--tokens={args.tokens}",
+        f"--error-rate={args.llm_error_rate}",
+        f"--seed={args.seed}",
+    ]
+    process = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{args.fake_port}"
+    _wait_for(url, process, 30)
+    return process, url
+
+
+def start_fake_embeddings(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="load_test_"), "embed.sock")
+    command = [
+        sys.executable,
+        os.path.join(_BENCHMARKS, "fake_embeddings.py"),
+        f"--socket={socket_path}",
+        f"--ms-per-text={args.embed_ms_per_text}",
+    ]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("Fake embedding server didn't start")
+        time.sleep(0.1)
+    return process, socket_path
+
+
+def start_service(
+    args: argparse.Namespace,
+    ollama_url: str,
+    workers: int,
+    embedding_socket: str | None = None,
+) -> tuple[subprocess.Popen, str]:
+    """Start the service the way production does, with `workers` processes."""
+    env = {
+        **os.environ,
+        "OLLAMA_HOST": ollama_url,
+        "LLM_MODEL": "fake",
+        "CHROMA_STORE_PATH": tempfile.mkdtemp(prefix="load_test_store_"),
+        "ANSWER_CACHE_MAX_ENTRIES": "0",
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "ENVIRONMENT": "production",
+        "AI_SERVICE_PORT": str(args.port),
+        "AI_SERVICE_WORKERS": str(workers),
+    }
+    if embedding_socket:
+        env["EMBEDDING_SERVER_SOCKET"] = embedding_socket
+    process = subprocess.Popen([sys.executable, "-m", "ai_service.main"], env=env)
+    url = f"http://127.0.0.1:{args.port}"
+    _wait_for(f"{url}/ready", process, args.startup_timeout_s)
+    return process, url
+
+
+def memory_usage(pid: int) -> dict[str, Any] | None:
+    """
+    Memory of a process and its children in MiB (Linux only).
+
+    RSS counts shared pages once per process, so its sum overstates what
+    forked workers use together; PSS splits shared pages between them.
+    """
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids += [int(child) for child in f.read().split()]
+        totals = {"Rss": 0, "Pss": 0}
+        for process_id in pids:
+            with open(f"/proc/{process_id}/smaps_rollup") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in totals:
+                        totals[key] += int(value.split()[0])
+    except OSError:
+        return None
+    return {
+        "processes": len(pids),
+        "rss_sum_mb": round(totals["Rss"] / 1024),
+        "pss_sum_mb": round(totals["Pss"] / 1024),
+    }
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+
+class _Recorder:
+    """Latencies and outcomes of the requests to one endpoint."""
+
+    def __init__(self) -> None:
+        self.latencies_ms: list[float] = []
+        self.outcomes: Counter[str] = Counter()
+
+    def add(self, started: float, outcome: str) -> None:
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        self.outcomes[outcome] += 1
+
+    def summary(self, seconds: float) -> dict[str, Any]:
+        count = len(self.latencies_ms)
+        ordered = sorted(self.latencies_ms)
+        errors = count - self.outcomes["200"] - self.outcomes["201"]
+        summary: dict[str, Any] = {
+            "requests": count,
+            "throughput_rps": round(count / seconds, 2),
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "outcomes": dict(self.outcomes),
+        }
+        if ordered:
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                summary[f"{name}_ms"] = round(_percentile(ordered, fraction), 1)
+        return summary
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    deadline: float,
+    recorder: _Recorder,
+    requests: "itertools.count[int]",
+    make_request: Any,
+) -> None:
+    """Send requests one after another until the deadline."""
+    while time.perf_counter() < deadline:
+        path, body = make_request(next(requests))
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+            recorder.add(started, str(response.status_code))
+        except httpx.HTTPError as e:
+            recorder.add(started, e.__class__.__name__)
+
+
+async def run_level(
+    service_url: str,
+    concurrency: int,
+    ingest_workers: int,
+    duration_s: float,
+    repo_url: str,
+    fixture_urls: list[str],
+) -> dict[str, Any]:
+    """Drive /answer with `concurrency` clients and /ingest alongside it."""
+    answers, ingests = _Recorder(), _Recorder()
+    numbers = itertools.count()
+
+    def answer_request(number: int) -> tuple[str, dict[str, Any]]:
+        question = f"How does the module compute value number {number}?"
+        return "/answer", {"user_question": question, "canonical_github_url": repo_url}
+
+    def ingest_request(number: int) -> tuple[str, dict[str, Any]]:
+        url = fixture_urls[number % len(fixture_urls)]
+        return "/ingest", {"canonical_github_url": url}
+
+    limits = httpx.Limits(max_connections=concurrency + ingest_workers)
+    timeout = httpx.Timeout(duration_s + 300)
+    started = time.perf_counter()
+    deadline = started + duration_s
+    async with httpx.AsyncClient(
+        base_url=service_url, limits=limits, timeout=timeout
+    ) as client:
+        loops = [
+            _client_loop(client, deadline, answers, numbers, answer_request)
+            for _ in range(concurrency)
+        ]
+        loops += [
+            _client_loop(client, deadline, ingests, numbers, ingest_request)
+            for _ in range(ingest_workers if fixture_urls else 0)
+        ]
+        await asyncio.gather(*loops)
+    # Requests started before the deadline may finish after it
+    seconds = time.perf_counter() - started
+    level: dict[str, Any] = {
+        "concurrency": concurrency,
+        "ingest_workers": ingest_workers,
+        "seconds": round(seconds, 1),
+        "answer": answers.summary(seconds),
+    }
+    if ingests.latencies_ms:
+        level["ingest"] = ingests.summary(seconds)
+    return level
+
+
+def _stats(url: str) -> dict[str, Any] | None:
+    try:
+        with urllib.request.urlopen(f"{url}/stats") as response:
+            return json.load(response)
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def _ingest(service_url: str, repo_url: str) -> None:
+    response = httpx.post(
+        f"{service_url}/ingest", json={"canonical_github_url": repo_url}, timeout=600
+    )
+    response.raise_for_status()
+
+
+def _run_levels(
+    args: argparse.Namespace,
+    service_url: str,
+    repo_url: str,
+    fixture_urls: list[str],
+) -> list[dict[str, Any]]:
+    levels = []
+    for concurrency in args.concurrency:
+        level = asyncio.run(
+            run_level(
+                service_url,
+                concurrency,
+                args.ingest_workers,
+                args.duration_s,
+                repo_url,
+                fixture_urls[1:] or fixture_urls,
+            )
+        )
+        levels.append(level)
+        print(json.dumps(level), file=sys.stderr)
+    return levels
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    processes: list[subprocess.Popen] = []
+    fixture_root = tempfile.mkdtemp(prefix="load_test_fixtures_")
+    names = build_fixtures(fixture_root, args.fixtures, args.fixture_files, args.seed)
+    server, fixture_port = serve_directory(fixture_root)
+    fixture_urls = [f"http://127.0.0.1:{fixture_port}/{name}" for name in names]
+    repo_url = args.repo_url or fixture_urls[0]
+    runs: list[dict[str, Any]] = []
+    ollama_url = None
+    embedding_socket = None
+    try:
+        if args.target:
+            if not args.repo_url:
+                _ingest(args.target, repo_url)
+            levels = _run_levels(args, args.target, repo_url, fixture_urls)
+            runs.append({"workers": None, "levels": levels})
+        else:
+            fake, ollama_url = start_fake_ollama(args)
+            processes.append(fake)
+            if args.fake_model:
+                embeddings, embedding_socket = start_fake_embeddings(args)
+                processes.append(embeddings)
+        # A fresh service (and store) per worker count
+        for workers in args.workers if not args.target else []:
+            service, service_url = start_service(
+                args, ollama_url or "", workers, embedding_socket
+            )
+            try:
+                _ingest(service_url, repo_url)
+                levels = _run_levels(args, service_url, repo_url, fixture_urls)
+                runs.append(
+                    {
+                        "workers": workers,
+                        "memory": memory_usage(service.pid),
+                        "levels": levels,
+                    }
+                )
+                print(
+                    json.dumps({"workers": workers, "memory": runs[-1]["memory"]}),
+                    file=sys.stderr,
+                )
+            finally:
+                service.terminate()
+                service.wait()
+        return {
+            "parameters": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("output", "target", "repo_url")
+            },
+            "runs": runs,
+            "fake_ollama": _stats(ollama_url) if ollama_url else None,
+        }
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ingest-workers", type=int, default=1)
+    parser.add_argument("--duration-s", type=float, default=30.0)
+    parser.add_argument("--fixtures", type=int, default=3)
+    parser.add_argument("--fixture-files", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    # Fake LLM
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-s", type=float, default=100.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-port", type=int, default=11435)
+    # Fake embedding model
+    parser.add_argument(
+        "--fake-model",
+        action="store_true",
+        help="Embed with benchmarks/fake_embeddings.py instead of the model",
+    )
+    parser.add_argument("--embed-ms-per-text", type=float, default=1.0)
+    # Service
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="Worker processes (AI_SERVICE_WORKERS); one run per count",
+    )
+    parser.add_argument("--startup-timeout-s", type=float, default=120.0)
+    parser.add_argument(
+        "--target", help="URL of a running service (with its own fake Ollama)"
+    )
+    parser.add_argument(
+        "--repo-url", help="Ask about this already ingested repository instead"
+    )
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark cold import time and time-to-ready, failing on regressions.
+
+Every import is timed in a fresh interpreter, so nothing is cached between
+runs. Heavy dependencies that a module pulls in are listed with its timing.
+Time-to-ready starts the service with uvicorn and polls /ready, so it needs
+the embedding model and Ollama (see --ready).
+
+Usage (from the ai-service directory):
+
+    PYTHONPATH=src python benchmarks/startup.py
+    PYTHONPATH=src python benchmarks/startup.py --ready --max-ready-s 60
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+# Import budgets in milliseconds; light modules must stay free of heavy deps
+DEFAULT_BUDGETS_MS = {
+    "ai_service": 100,
+    "ai_service.chunking": 100,
+    "ai_service.context_builder": 500,
+    "ai_service.main": 1500,
+}
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "git", "fastapi"]
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"ms": elapsed_ms, "heavy": heavy}}))
+"""
+
+
+def _environment() -> dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("CHROMA_STORE_PATH", tempfile.mkdtemp(prefix="startup_bench_"))
+    return env
+
+
+def time_import(module: str, repeats: int) -> dict[str, object]:
+    """Median import time of a module over fresh interpreters."""
+    timings: list[float] = []
+    heavy: list[str] = []
+    for _ in range(repeats):
+        probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+        output = subprocess.run(
+            [sys.executable, "-c", probe],
+            check=True,
+            capture_output=True,
+            text=True,
+            env=_environment(),
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        heavy = result["heavy"]
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(timings), 1),
+        "heavy_deps": heavy,
+    }
+
+
+def time_to_ready(port: int, timeout_s: float) -> float:
+    """Seconds from starting the server until /ready returns 200."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ai_service.main:app", "--port", str(port)],
+        env=_environment(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout_s:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready") as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.1)
+        raise TimeoutError(f"Not ready after {timeout_s} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run(args: argparse.Namespace) -> tuple[list[dict[str, object]], list[str]]:
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for budget in args.budget:
+        module, ms = budget.split("=")
+        budgets[module] = float(ms)
+
+    report: list[dict[str, object]] = []
+    failures: list[str] = []
+    for module, budget_ms in budgets.items():
+        row = time_import(module, args.repeats)
+        row["budget_ms"] = budget_ms
+        report.append(row)
+        print(json.dumps(row))
+        if row["median_ms"] > budget_ms:  # type: ignore[operator]
+            failures.append(f"import {module}: {row['median_ms']} ms > {budget_ms} ms")
+
+    if args.ready:
+        seconds = time_to_ready(args.port, args.max_ready_s * 2)
+        row = {"time_to_ready_s": round(seconds, 2), "budget_s": args.max_ready_s}
+        report.append(row)
+        print(json.dumps(row))
+        if seconds > args.max_ready_s:
+            failures.append(f"time to ready: {seconds:.1f} s > {args.max_ready_s} s")
+    return report, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="MODULE=MS",
+        help="Import budget for a module, added to or overriding the defaults",
+    )
+    parser.add_argument("--ready", action="store_true", help="Also time /ready")
+    parser.add_argument("--max-ready-s", type=float, default=60.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    args = parser.parse_args()
+
+    report, failures = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        print("Startup regressions:\n  " + "\n  ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
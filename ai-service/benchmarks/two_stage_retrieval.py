@@ -0,0 +1,149 @@
+"""
+Benchmark flat vs two-stage retrieval on a synthetic large repository.
+
+The synthetic repository lives purely in vector space: every file gets a random
+centroid and its chunks are noisy copies of it, which mimics how chunks of the
+same file cluster together. No embedding model or LLM is needed.
+
+Usage (from the ai-service directory):
+
+    PYTHONPATH=src python benchmarks/two_stage_retrieval.py --chunks 10000 50000 100000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from ai_service.db_setup import (
+    add_chunks,
+    add_file_summaries,
+    get_collection,
+    initialize_db,
+    query_chunks,
+    set_repo_context,
+)
+from ai_service.embeddings import pool_embeddings
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def build_synthetic_repo(
+    number_of_chunks: int,
+    chunks_per_file: int,
+    dimension: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Create and store a synthetic repository. Returns the chunk vectors."""
+    number_of_files = max(1, number_of_chunks // chunks_per_file)
+    centroids = _normalize(rng.standard_normal((number_of_files, dimension)))
+    file_ids = np.arange(number_of_chunks) % number_of_files
+    noise = rng.standard_normal((number_of_chunks, dimension)) * 0.05
+    vectors = _normalize(centroids[file_ids] + noise).astype(np.float32)
+
+    file_paths = [f"src/module_{f // 50}/file_{f}.py" for f in file_ids]
+    documents = [
+        f"# File: {path}\n# Chunk: {i}\n\ndef function_{i}(): return {i}"
+        for i, path in enumerate(file_paths)
+    ]
+    embeddings = vectors.tolist()
+    add_chunks(documents, embeddings, [{"file_path": path} for path in file_paths])
+
+    by_file: dict[str, list[list[float]]] = {}
+    for path, embedding in zip(file_paths, embeddings):
+        by_file.setdefault(path, []).append(embedding)
+    add_file_summaries(
+        list(by_file), [pool_embeddings(group) for group in by_file.values()]
+    )
+    return vectors
+
+
+def _time_queries(
+    queries: np.ndarray, two_stage: bool, k: int
+) -> tuple[list[float], list[list[str]]]:
+    os.environ["TWO_STAGE_MIN_CHUNKS"] = "1" if two_stage else "0"
+    latencies: list[float] = []
+    results: list[list[str]] = []
+    for query in queries:
+        start = time.perf_counter()
+        result = query_chunks(query.tolist(), number_of_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(result["ids"][0])
+    return latencies, results
+
+
+def _summary(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": ordered[int(len(ordered) * 0.95) - 1],
+        "mean_ms": statistics.fmean(ordered),
+    }
+
+
+def run(args: argparse.Namespace) -> list[dict[str, object]]:
+    rng = np.random.default_rng(args.seed)
+    store = tempfile.mkdtemp(prefix="two_stage_bench_")
+    os.environ["CHROMA_STORE_PATH"] = store
+    os.environ["TWO_STAGE_TOP_FILES"] = str(args.top_files)
+    initialize_db()
+
+    report: list[dict[str, object]] = []
+    for size in args.chunks:
+        set_repo_context(f"https://github.com/bench/synthetic-{size}.git")
+        start = time.perf_counter()
+        vectors = build_synthetic_repo(size, args.chunks_per_file, args.dim, rng)
+        build_seconds = time.perf_counter() - start
+
+        picks = rng.integers(0, size, args.queries)
+        queries = _normalize(
+            vectors[picks] + rng.standard_normal((args.queries, args.dim)) * 0.05
+        )
+        # Warm up HNSW segments before timing
+        _time_queries(queries[:5], two_stage=False, k=args.k)
+        _time_queries(queries[:5], two_stage=True, k=args.k)
+
+        flat_latencies, flat_ids = _time_queries(queries, two_stage=False, k=args.k)
+        staged_latencies, staged_ids = _time_queries(queries, two_stage=True, k=args.k)
+        recall = statistics.fmean(
+            len(set(a) & set(b)) / max(1, len(a)) for a, b in zip(flat_ids, staged_ids)
+        )
+
+        row: dict[str, object] = {
+            "chunks": get_collection().count(),
+            "build_s": round(build_seconds, 2),
+            "flat": _summary(flat_latencies),
+            "two_stage": _summary(staged_latencies),
+            "recall_vs_flat": round(recall, 3),
+        }
+        report.append(row)
+        print(json.dumps(row))
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-files", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Optional path for the JSON report")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,17 +15,36 @@ Main Components:
 Core functionality is exposed through submodules for easy integration.
 """
 
+import importlib
+from typing import Any
+
 # Core modules
 from . import errors
 from . import utils
 
-# Main application
-from .main import app, main
+# The application and the submodules below pull in FastAPI, torch, ChromaDB
+# and GitPython, so they are only imported on first access. Importing a light
+# module such as `ai_service.chunking` then doesn't pay for them.
+_LAZY_ATTRIBUTES = {
+    # Main application
+    "app": ".main",
+    "main": ".main",
+    # Submodules for external use
+    "embeddings": ".embeddings",
+    "db_setup": ".db_setup",
+    "handlers": ".handlers",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_name, __name__)
+    value = getattr(module, name) if module_name == ".main" else module
+    globals()[name] = value
+    return value
 
-# Submodules for external use
-from . import embeddings
-from . import db_setup
-from . import handlers
 
 __version__ = "1.0.0"
 
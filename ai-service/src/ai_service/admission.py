@@ -0,0 +1,234 @@
+"""
+Admission control for the expensive endpoints.
+
+Without a limit, every /ingest waits for a thread of Starlette's threadpool and
+every /answer for Ollama, however many are already waiting, until they all
+time out together. Here each endpoint group gets a number of slots, a bounded
+queue of requests waiting for one, and a deadline for that wait:
+
+- ingest: POST /ingest, limited by INGEST_MAX_CONCURRENCY, INGEST_MAX_QUEUE
+  and INGEST_QUEUE_TIMEOUT_SECONDS;
+- answer: POST /answer, /answer/stream, /answer/batch and
+  /sessions/{id}/answer, limited by the matching ANSWER_* variables.
+
+A request arriving at a full queue is rejected at once with 429, and one that
+waited past the deadline with 503, both with a Retry-After estimated from how
+long slots are held. A concurrency of 0 turns a group's limit off. Slots are
+held until the response is fully sent, streamed ones included, and are per
+worker process.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from fastapi.responses import JSONResponse
+
+from ai_service import errors, metrics, utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INGEST_MAX_CONCURRENCY = 2
+DEFAULT_INGEST_MAX_QUEUE = 8
+DEFAULT_INGEST_QUEUE_TIMEOUT_SECONDS = 60.0
+DEFAULT_ANSWER_MAX_CONCURRENCY = 16
+DEFAULT_ANSWER_MAX_QUEUE = 64
+DEFAULT_ANSWER_QUEUE_TIMEOUT_SECONDS = 15.0
+# Weight of the latest slot hold time in the running average
+_HOLD_SMOOTHING = 0.2
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class Limiter:
+    """Slots for one endpoint group, with a bounded FIFO queue in front."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_s: float,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        # Running average of how long a request holds its slot
+        self._hold_s = 1.0
+        self._report()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the requests queued now would likely have been served."""
+        rounds = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(self._hold_s * rounds))
+
+    def _report(self) -> None:
+        metrics.set_gauge("admission_in_flight", self._active, endpoint=self.name)
+        metrics.set_gauge("admission_queue_depth", self.waiting, endpoint=self.name)
+
+    def _reject(self, reason: str, error: errors.Overloaded) -> errors.Overloaded:
+        metrics.count("admission_rejected", endpoint=self.name, reason=reason)
+        logger.warning("Rejected %s request: %s", self.name, error)
+        return error
+
+    async def acquire(self) -> None:
+        """
+        Take a slot, waiting in line for one if needed.
+
+        Raises:
+            Overloaded: If the queue is full, or no slot freed up in time.
+        """
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._report()
+            return
+        if self.waiting >= self.max_queue:
+            raise self._reject(
+                "queue_full",
+                errors.Overloaded.queue_full(self.name, self.retry_after()),
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._report()
+        started = time.perf_counter()
+        try:
+            # Shielded, so a timeout leaves the waiter to be checked below
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the deadline passed; give it on
+                self.release(0.0)
+            raise self._reject(
+                "queue_timeout",
+                errors.Overloaded.queue_timeout(
+                    self.name, self.queue_timeout_s, self.retry_after()
+                ),
+            ) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._report()
+            metrics.observe("admission_wait", time.perf_counter() - started)
+
+    def release(self, held_s: float) -> None:
+        """Free a slot held for `held_s` seconds, handing it to the next in line."""
+        if held_s > 0:
+            self._hold_s += _HOLD_SMOOTHING * (held_s - self._hold_s)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes on directly, so it can't be taken by a newcomer
+                waiter.set_result(None)
+                self._report()
+                return
+        self._active -= 1
+        self._report()
+
+
+def _limiter_from_env(
+    name: str,
+    concurrency: tuple[str, int],
+    queue: tuple[str, int],
+    timeout: tuple[str, float],
+) -> Limiter | None:
+    max_concurrency = utils.get_env_int(*concurrency)
+    if max_concurrency <= 0:
+        return None
+    return Limiter(
+        name,
+        max_concurrency,
+        max(0, utils.get_env_int(*queue)),
+        utils.get_env_float(*timeout),
+    )
+
+
+def limiters_from_env() -> dict[str, Limiter]:
+    """The limiters of the endpoint groups that have a limit configured."""
+    limiters = {
+        "ingest": _limiter_from_env(
+            "ingest",
+            (utils.INGEST_MAX_CONCURRENCY, DEFAULT_INGEST_MAX_CONCURRENCY),
+            (utils.INGEST_MAX_QUEUE, DEFAULT_INGEST_MAX_QUEUE),
+            (utils.INGEST_QUEUE_TIMEOUT_SECONDS, DEFAULT_INGEST_QUEUE_TIMEOUT_SECONDS),
+        ),
+        "answer": _limiter_from_env(
+            "answer",
+            (utils.ANSWER_MAX_CONCURRENCY, DEFAULT_ANSWER_MAX_CONCURRENCY),
+            (utils.ANSWER_MAX_QUEUE, DEFAULT_ANSWER_MAX_QUEUE),
+            (utils.ANSWER_QUEUE_TIMEOUT_SECONDS, DEFAULT_ANSWER_QUEUE_TIMEOUT_SECONDS),
+        ),
+    }
+    return {name: limiter for name, limiter in limiters.items() if limiter is not None}
+
+
+def endpoint_group(method: str, path: str) -> str | None:
+    """The endpoint group a request counts against, if any."""
+    if method != "POST":
+        return None
+    if path == "/ingest":
+        return "ingest"
+    if path in ("/answer", "/answer/stream", "/answer/batch"):
+        return "answer"
+    if path.startswith("/sessions/") and path.endswith("/answer"):
+        return "answer"
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests through their endpoint group's limiter."""
+
+    def __init__(
+        self,
+        app: Callable[[Scope, Receive, Send], Awaitable[None]],
+        limiters: dict[str, Limiter] | None = None,
+    ):
+        self.app = app
+        self.limiters = limiters_from_env() if limiters is None else limiters
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = None
+        if scope["type"] == "http":
+            group = endpoint_group(scope["method"], scope["path"])
+            limiter = self.limiters.get(group) if group is not None else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except errors.Overloaded as e:
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"error": str(e), "code": e.__class__.__name__},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            # Returns once the whole response, streamed or not, is sent
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
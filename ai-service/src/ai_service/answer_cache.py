@@ -0,0 +1,219 @@
+"""
+Semantic cache of LLM answers per repository.
+
+A question is answered from the cache when its embedding is within a cosine
+similarity threshold of a question already answered for the same
+repositories. Entries are bound to the collection version they were answered
+from, so a re-ingest (which creates a new version) invalidates them.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from ai_service import metrics, utils
+from ai_service.db_setup import collection_version
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of cached answers across all repositories, 0 disables the cache
+DEFAULT_ANSWER_CACHE_MAX_ENTRIES = 1000
+DEFAULT_ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+# Minimum cosine similarity between two questions to reuse an answer
+DEFAULT_ANSWER_CACHE_THRESHOLD = 0.95
+
+
+@dataclass
+class _Entry:
+    question: str
+    embedding: np.ndarray
+    answer: str
+    created_at: float
+
+
+@dataclass
+class _RepoEntries:
+    """Cached answers for one set of repositories at specific collection versions."""
+
+    versions: tuple[str, ...]
+    entries: dict[int, _Entry] = field(default_factory=dict)
+
+
+class AnswerCache:
+    """In-process semantic answer cache with TTL and LRU size limits."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._repos: dict[tuple[str, ...], _RepoEntries] = {}
+        # Least recently used first; values are the repos key of the entry
+        self._lru: OrderedDict[int, tuple[str, ...]] = OrderedDict()
+        self._ids = itertools.count()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+    def _current_entries(
+        self, repos: tuple[str, ...], versions: tuple[str, ...]
+    ) -> _RepoEntries | None:
+        """Entries for the repos at these versions, dropping those of other versions."""
+        current = self._repos.get(repos)
+        if current is not None and current.versions != versions:
+            self._stats["invalidated"] += len(current.entries)
+            for entry_id in current.entries:
+                self._lru.pop(entry_id, None)
+            del self._repos[repos]
+            current = None
+        return current
+
+    def _remove(self, repos: tuple[str, ...], entry_id: int) -> None:
+        repo_entries = self._repos[repos]
+        repo_entries.entries.pop(entry_id, None)
+        self._lru.pop(entry_id, None)
+        # Keyed by every combination of repositories ever asked about, so
+        # empty ones mustn't stay
+        if not repo_entries.entries:
+            del self._repos[repos]
+
+    def get(
+        self,
+        repos: tuple[str, ...],
+        versions: tuple[str, ...],
+        embedding: list[float],
+    ) -> str | None:
+        """Cached answer of the most similar question above the threshold."""
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        now = time.time()
+        with self._lock:
+            repo_entries = self._current_entries(repos, versions)
+            entries = repo_entries.entries if repo_entries is not None else {}
+            for entry_id, entry in list(entries.items()):
+                if now - entry.created_at > self.ttl_seconds:
+                    self._remove(repos, entry_id)
+                    self._stats["expired"] += 1
+
+            best_id, best_score = None, self.threshold
+            for entry_id, entry in entries.items():
+                score = float(entry.embedding @ query)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._stats["hits"] += 1
+            self._lru.move_to_end(best_id)
+            entry = entries[best_id]
+            logger.info(
+                "Answer cache hit (similarity %.3f) for question like %r",
+                best_score,
+                entry.question,
+            )
+            return entry.answer
+
+    def put(
+        self,
+        repos: tuple[str, ...],
+        versions: tuple[str, ...],
+        question: str,
+        embedding: list[float],
+        answer: str,
+    ) -> None:
+        """
+        Cache an answer, evicting the least recently used ones over the limit.
+
+        The versions must be the repositories' current ones: entries of any
+        other versions are dropped.
+        """
+        if self.max_entries <= 0:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            entry_id = next(self._ids)
+            repo_entries = self._current_entries(repos, versions)
+            if repo_entries is None:
+                repo_entries = self._repos[repos] = _RepoEntries(versions)
+            repo_entries.entries[entry_id] = _Entry(
+                question, vector, answer, time.time()
+            )
+            self._lru[entry_id] = repos
+            while len(self._lru) > self.max_entries:
+                oldest_id, oldest_repos = next(iter(self._lru.items()))
+                self._remove(oldest_repos, oldest_id)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._lru),
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
+
+
+_cache: AnswerCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> AnswerCache:
+    """The process-wide answer cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache(
+                max_entries=utils.get_env_int(
+                    utils.ANSWER_CACHE_MAX_ENTRIES, DEFAULT_ANSWER_CACHE_MAX_ENTRIES
+                ),
+                ttl_seconds=utils.get_env_int(
+                    utils.ANSWER_CACHE_TTL_SECONDS, DEFAULT_ANSWER_CACHE_TTL_SECONDS
+                ),
+                threshold=utils.get_env_float(
+                    utils.ANSWER_CACHE_THRESHOLD, DEFAULT_ANSWER_CACHE_THRESHOLD
+                ),
+            )
+        return _cache
+
+
+class CacheKey(NamedTuple):
+    """Repositories of a question and the collection versions they were read at."""
+
+    repos: tuple[str, ...]
+    versions: tuple[str, ...]
+
+
+def cache_key(repo_urls: list[str]) -> CacheKey:
+    """Key for a question about some repositories, at their current versions."""
+    repos = tuple(sorted(repo_urls))
+    return CacheKey(repos, tuple(collection_version(url) for url in repos))
+
+
+def lookup(key: CacheKey, embedding: list[float]) -> str | None:
+    """Cached answer to a similar question about the same repositories, if any."""
+    cache = get_cache()
+    if cache.max_entries <= 0:
+        return None
+    answer = cache.get(key.repos, key.versions, embedding)
+    metrics.count("answer_cache_misses" if answer is None else "answer_cache_hits")
+    return answer
+
+
+def store(key: CacheKey, question: str, embedding: list[float], answer: str) -> None:
+    """
+    Cache the answer to a question.
+
+    The key should be taken before retrieval. An answer generated while the
+    repository was re-ingested was read from the replaced version, so it is
+    not cached, nor does it disturb the answers of the new version.
+    """
+    if cache_key(list(key.repos)).versions != key.versions:
+        logger.info("Not caching an answer read from a replaced collection version")
+        return
+    get_cache().put(key.repos, key.versions, question, embedding, answer)
@@ -5,6 +5,7 @@ This module provides different strategies for chunking code files to optimize
 embedding storage and retrieval for semantic search.
 """
 
-from .strategies import chunk_code_file
+from .strategies import ChunkLines, chunk_code_file, parse_chunk
+from .near_duplicates import find_near_duplicates
 
-__all__ = ["chunk_code_file"]
+__all__ = ["ChunkLines", "chunk_code_file", "parse_chunk", "find_near_duplicates"]
@@ -0,0 +1,117 @@
+"""
+Near-duplicate detection of chunks with MinHash and LSH.
+
+Repositories repeat themselves: license headers, generated clients, copied
+test fixtures. Their chunks differ in the file header and a few tokens, so
+exact hashing misses them, yet each one costs an embedding and crowds real
+results out of searches.
+
+Each chunk's code (without its header) is cut into shingles of consecutive
+tokens. A MinHash signature of the shingles estimates the Jaccard similarity
+of two chunks as the fraction of equal signature values. Locality-sensitive
+hashing (LSH) splits the signatures into bands; chunks sharing a band become
+candidates, so a chunk is compared with a few likely duplicates instead of
+with every chunk before it.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+from .strategies import parse_chunk
+
+NUM_PERMUTATIONS = 128
+SHINGLE_TOKENS = 5
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Parameters of the permutations h(x) = (a * x + b) mod p, fixed so that
+# signatures are the same in every process. a * x wraps around 64 bits, as in
+# datasketch; a must span the whole range for the minima to be independent.
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240531)
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _shingles(chunk: str) -> np.ndarray:
+    """32-bit hashes of the chunk's code shingles."""
+    parsed = parse_chunk(chunk)
+    code = "\n".join(parsed.lines) if parsed is not None else chunk
+    tokens = _TOKEN.findall(code)
+    count = max(1, len(tokens) - SHINGLE_TOKENS + 1)
+    return np.fromiter(
+        (
+            zlib.crc32(" ".join(tokens[i : i + SHINGLE_TOKENS]).encode("utf-8"))
+            for i in range(count)
+        ),
+        dtype=np.uint64,
+        count=count,
+    )
+
+
+def minhash(chunk: str) -> np.ndarray:
+    """MinHash signature of a chunk: NUM_PERMUTATIONS 64-bit values."""
+    shingles = _shingles(chunk)
+    hashes = (np.outer(shingles, _A) + _B) % _PRIME
+    return hashes.min(axis=0)
+
+
+def lsh_bands(threshold: float) -> int:
+    """
+    Number of bands splitting the signature so that pairs at about the
+    threshold's similarity become candidates.
+
+    A pair with similarity s shares some band with probability
+    1 - (1 - s**r)**b, for b bands of r rows; that curve rises steepest
+    around (1 / b) ** (1 / r).
+    """
+    divisors = [b for b in range(1, NUM_PERMUTATIONS + 1) if NUM_PERMUTATIONS % b == 0]
+    # Of the bandings rising at or below the threshold, the closest to it, so
+    # that pairs just above the threshold aren't missed
+    below = [
+        b for b in divisors if (1 / b) ** (b / NUM_PERMUTATIONS) <= threshold
+    ] or divisors[-1:]
+    return min(below, key=lambda b: threshold - (1 / b) ** (b / NUM_PERMUTATIONS))
+
+
+def find_near_duplicates(chunks: list[str], threshold: float) -> list[int | None]:
+    """
+    Find chunks whose code is nearly the same as an earlier chunk's.
+
+    Args:
+        chunks: Chunks as created by `chunk_code_file`.
+        threshold: Estimated Jaccard similarity of shingles from which a
+            chunk counts as a duplicate, between 0 and 1.
+
+    Returns:
+        For each chunk, the index of the earlier kept chunk it duplicates,
+        or None if it is kept.
+    """
+    bands = lsh_bands(threshold)
+    rows = NUM_PERMUTATIONS // bands
+    buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+    signatures: dict[int, np.ndarray] = {}
+    duplicate_of: list[int | None] = []
+
+    for index, chunk in enumerate(chunks):
+        signature = minhash(chunk)
+        keys = [
+            signature[band * rows : (band + 1) * rows].tobytes()
+            for band in range(bands)
+        ]
+        candidates = {
+            kept for band, key in enumerate(keys) for kept in buckets[band].get(key, ())
+        }
+        match = None
+        for kept in sorted(candidates):
+            if np.mean(signatures[kept] == signature) >= threshold:
+                match = kept
+                break
+        duplicate_of.append(match)
+        if match is None:
+            # Only kept chunks are compared against, so a chain of small
+            # edits can't drift arbitrarily far from what was stored
+            signatures[index] = signature
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(index)
+    return duplicate_of
@@ -1,5 +1,20 @@
+import re
+from typing import NamedTuple
+
 from ai_service import errors
 
+_CHUNK_HEADER = re.compile(
+    r"# File: (?P<path>[^\n]*)\n# Chunk: (?:lines (?P<start>\d+)-\d+|complete-file)\n\n"
+)
+
+
+class ChunkLines(NamedTuple):
+    """The code lines of a chunk and where they start in their file."""
+
+    short_path: str
+    start: int  # 1-based line number of lines[0]
+    lines: list[str]
+
 
 def chunk_code_file(file_path: str, content: str) -> list[str]:
     """
@@ -65,3 +80,20 @@ def _add_file_context(file_path: str, chunk: str, chunk_name: str) -> str:
 
     # Create header with file info and chunk identifier, then add the actual code
     return f"# File: {short_path}\n# Chunk: {chunk_name}\n\n{chunk}"
+
+
+def parse_chunk(document: str) -> ChunkLines | None:
+    """
+    Recover the file and line range of a chunk created by `chunk_code_file`.
+
+    Args:
+        document: A stored chunk, including its context header.
+
+    Returns:
+        The chunk's lines and position, or None if it has no chunk header.
+    """
+    match = _CHUNK_HEADER.match(document)
+    if match is None:
+        return None
+    start = int(match.group("start") or 1)
+    return ChunkLines(match.group("path"), start, document[match.end() :].split("\n"))
@@ -0,0 +1,193 @@
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from ai_service import metrics, utils
+from ai_service.chunking import parse_chunk
+from ai_service.retrieval import Snippet
+
+logger = logging.getLogger(__name__)
+
+# Roughly the 12000 characters the prompt context used to be capped at
+DEFAULT_MAX_CONTEXT_TOKENS = 3000
+_SEPARATOR = "\n---\n"
+_TRUNCATED = "... [truncated]"
+
+
+@dataclass
+class _Span:
+    """Consecutive lines of one file, merged from one or more retrieved chunks."""
+
+    repo_url: str
+    path: str
+    start: int
+    lines: list[str]
+    rank: int  # Position of its most relevant chunk in the retrieval results
+    ranks: list[int]  # Positions of all chunks merged into it
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.lines) - 1
+
+    def render(self, label_repo: bool, line_count: int | None = None) -> str:
+        """The span with a header naming its file and line range."""
+        lines = self.lines if line_count is None else self.lines[:line_count]
+        end = self.start + len(lines) - 1
+        text = f"# File: {self.path} (lines {self.start}-{end})\n" + "\n".join(lines)
+        if label_repo:
+            text = f"# Repository: {self.repo_url}\n{text}"
+        if line_count is not None:
+            text += f"\n{_TRUNCATED}"
+        return text
+
+
+def _merge_spans(spans: list[_Span]) -> list[_Span]:
+    """Merge overlapping or adjacent spans of the same file, dropping repeated lines."""
+    merged: list[_Span] = []
+    for span in sorted(spans, key=lambda s: (s.repo_url, s.path, s.start)):
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous.repo_url == span.repo_url
+            and previous.path == span.path
+            and span.start <= previous.end + 1
+        ):
+            # Only the lines past the end of the previous span are new
+            previous.lines.extend(span.lines[previous.end - span.start + 1 :])
+            previous.rank = min(previous.rank, span.rank)
+            previous.ranks.extend(span.ranks)
+        else:
+            merged.append(span)
+    return merged
+
+
+def build_context(
+    snippets: list[Snippet],
+    label_repos: bool,
+    count_tokens: Callable[[str], int],
+    max_tokens: int | None = None,
+) -> str:
+    """
+    Assemble retrieved snippets into prompt context within a token budget.
+
+    Chunks of the same file that overlap or touch are merged into one span, so
+    the lines shared by overlapping chunks appear once. Spans are then added
+    in relevance order while they fit the budget; the first one that doesn't
+    fit is cut at a line boundary to use the remaining tokens.
+
+    Args:
+        snippets: Retrieved snippets, most relevant first.
+        label_repos: Prefix each span with its repository URL.
+        count_tokens: Tokenizer-based length function.
+        max_tokens: Token budget. Defaults to MAX_CONTEXT_TOKENS.
+
+    Returns:
+        The context text.
+    """
+    context, _ = assemble_context(snippets, label_repos, count_tokens, max_tokens)
+    return context
+
+
+def assemble_context(
+    snippets: list[Snippet],
+    label_repos: bool,
+    count_tokens: Callable[[str], int],
+    max_tokens: int | None = None,
+) -> tuple[str, list[Snippet]]:
+    """
+    Like `build_context`, also returning the snippets included in full.
+
+    Snippets that were cut or left out over the budget aren't returned.
+    """
+    with metrics.timed("prompt_build"):
+        return _assemble(snippets, label_repos, count_tokens, max_tokens)
+
+
+def _assemble(
+    snippets: list[Snippet],
+    label_repos: bool,
+    count_tokens: Callable[[str], int],
+    max_tokens: int | None,
+) -> tuple[str, list[Snippet]]:
+    if max_tokens is None:
+        max_tokens = utils.get_env_int(
+            utils.MAX_CONTEXT_TOKENS, DEFAULT_MAX_CONTEXT_TOKENS
+        )
+
+    spans: list[_Span] = []
+    blocks: list[tuple[int, str]] = []  # Snippets without a chunk header
+    for rank, snippet in enumerate(snippets):
+        chunk = parse_chunk(snippet.document)
+        if chunk is None:
+            text = snippet.document
+            if label_repos:
+                text = f"# Repository: {snippet.repo_url}\n{text}"
+            blocks.append((rank, text))
+            continue
+        path = snippet.metadata.get("file_path") or chunk.short_path
+        spans.append(
+            _Span(snippet.repo_url, path, chunk.start, chunk.lines, rank, [rank])
+        )
+
+    parts = sorted(
+        [(span.rank, span) for span in _merge_spans(spans)] + blocks,
+        key=lambda part: part[0],
+    )
+
+    context: list[str] = []
+    included: list[int] = []
+    used = 0
+    separator_tokens = count_tokens(_SEPARATOR)
+    for rank, part in parts:
+        text = part.render(label_repos) if isinstance(part, _Span) else part
+        cost = count_tokens(text) + (separator_tokens if context else 0)
+        if used + cost <= max_tokens:
+            context.append(text)
+            included.extend(part.ranks if isinstance(part, _Span) else [rank])
+            used += cost
+            continue
+        remaining = max_tokens - used - (separator_tokens if context else 0)
+        truncated = _truncate(part, label_repos, remaining, count_tokens)
+        if truncated:
+            context.append(truncated)
+        break
+
+    logger.info(
+        "Built context from %d snippets: %d parts, ~%d tokens",
+        len(snippets),
+        len(context),
+        used,
+    )
+    return _SEPARATOR.join(context), [snippets[i] for i in sorted(included)]
+
+
+def _truncate(
+    part: _Span | str,
+    label_repos: bool,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+) -> str | None:
+    """Longest line-aligned prefix of a part that fits the budget, if any."""
+    if isinstance(part, _Span):
+        line_total = len(part.lines)
+
+        def render(n: int) -> str:
+            return part.render(label_repos, n)
+    else:
+        lines = part.split("\n")
+        line_total = len(lines)
+
+        def render(n: int) -> str:
+            return "\n".join(lines[:n] + [_TRUNCATED])
+
+    # Binary search the number of lines to keep
+    low, high = 0, line_total
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(render(middle)) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        return None
+    return render(low)
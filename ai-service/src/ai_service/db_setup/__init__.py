@@ -5,14 +5,77 @@ This module provides database configuration, storage, and query operations
 for code embeddings using ChromaDB as the vector database backend.
 """
 
-from .setup import set_repo_context, get_collection, initialize_db
-from .store_embeddings import add_chunks
-from .query_embeddings import query_chunks
+from .setup import (
+    set_repo_context,
+    get_collection,
+    get_file_collection,
+    initialize_db,
+)
+from .store_embeddings import add_chunks, add_file_summaries
+from .query_embeddings import query_chunks, query_chunks_batch, query_files
+from .lifecycle import (
+    staged_ingest,
+    record_ingest,
+    collect_retired,
+    delete_repo,
+    is_stored,
+    is_evicted,
+    collection_version,
+    evict_collections,
+    run_evictor,
+)
+from .registry import list_entries as list_collections
+from .checkpoints import (
+    Checkpoint,
+    load_checkpoint,
+    start_checkpoint,
+    save_checkpoint,
+    remove_checkpoint,
+    discard_checkpoint,
+    pending_ingests,
+    job_lock,
+)
+from .snapshots import (
+    export_snapshot,
+    import_snapshot,
+    publish_snapshot,
+    hydrate_from_store,
+    has_snapshot,
+    snapshot_store_enabled,
+)
 
 __all__ = [
     "initialize_db",
     "set_repo_context",
     "get_collection",
+    "get_file_collection",
     "add_chunks",
+    "add_file_summaries",
     "query_chunks",
+    "query_chunks_batch",
+    "query_files",
+    "staged_ingest",
+    "record_ingest",
+    "collect_retired",
+    "delete_repo",
+    "is_stored",
+    "is_evicted",
+    "collection_version",
+    "evict_collections",
+    "run_evictor",
+    "list_collections",
+    "Checkpoint",
+    "load_checkpoint",
+    "start_checkpoint",
+    "save_checkpoint",
+    "remove_checkpoint",
+    "discard_checkpoint",
+    "pending_ingests",
+    "job_lock",
+    "export_snapshot",
+    "import_snapshot",
+    "publish_snapshot",
+    "hydrate_from_store",
+    "has_snapshot",
+    "snapshot_store_enabled",
 ]
@@ -0,0 +1,150 @@
+"""
+Checkpoints of ingests in progress, persisted next to the vector store.
+
+An ingest writes into a staging collection batch by batch (see
+`handlers/ingest.py`). After each batch it records here which files are
+stored, at which commit and in which staging collection, in
+`<CHROMA_STORE_PATH>/ingest_jobs/<collection name>.json`. If the process dies,
+the checkpoint outlives it: the next ingest of the repository, or the
+recovery on startup, continues in the same staging collection and skips the
+files already stored. Once the ingest is published the checkpoint is removed.
+
+Each repository has a lock file next to its checkpoint, held exclusively
+(across threads and processes) for the whole ingest, so a job is never
+resumed twice at once.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterator
+
+from ai_service import utils
+from .setup import collection_name_for, delete_collection, new_collection_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Checkpoint:
+    canonical_github_url: str
+    commit_sha: str
+    staging: str
+    done_files: list[str] = field(default_factory=list)
+    # Embedding dimension, known once a batch is stored
+    dimension: int | None = None
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+
+def _directory() -> str:
+    return os.path.join(utils.get_env_var(utils.CHROMA_STORE_PATH), "ingest_jobs")
+
+
+def _path(canonical_github_url: str) -> str:
+    return os.path.join(
+        _directory(), f"{collection_name_for(canonical_github_url)}.json"
+    )
+
+
+@contextmanager
+def job_lock(canonical_github_url: str, blocking: bool = True) -> Iterator[bool]:
+    """Hold a repository's ingest lock; yields False if `blocking` is off and it's taken."""
+    os.makedirs(_directory(), exist_ok=True)
+    # Lock files are never deleted: removing one that another process just
+    # opened would let two processes hold "the" lock at once
+    with open(f"{_path(canonical_github_url)}.lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def _read(path: str) -> Checkpoint | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return Checkpoint(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (ValueError, TypeError):
+        # Written atomically, so only a file from another version gets here
+        logger.warning("Ignoring unreadable ingest checkpoint %s", path)
+        return None
+
+
+def load_checkpoint(canonical_github_url: str) -> Checkpoint | None:
+    """The checkpoint of an interrupted ingest of a repository, if any."""
+    return _read(_path(canonical_github_url))
+
+
+def start_checkpoint(canonical_github_url: str, commit_sha: str) -> Checkpoint:
+    """Begin an ingest of a commit into a new staging collection."""
+    checkpoint = Checkpoint(
+        canonical_github_url=canonical_github_url,
+        commit_sha=commit_sha,
+        staging=new_collection_version(canonical_github_url),
+    )
+    save_checkpoint(checkpoint)
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: Checkpoint) -> None:
+    """Atomically replace a repository's checkpoint."""
+    checkpoint.updated_at = time.time()
+    path = _path(checkpoint.canonical_github_url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(checkpoint), f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def remove_checkpoint(canonical_github_url: str) -> None:
+    """Forget a repository's checkpoint once its ingest is published."""
+    try:
+        os.remove(_path(canonical_github_url))
+    except FileNotFoundError:
+        pass
+
+
+def discard_checkpoint(canonical_github_url: str) -> bool:
+    """
+    Abandon an interrupted ingest, deleting what it stored so far.
+
+    Returns:
+        True if there was an interrupted ingest.
+    """
+    checkpoint = load_checkpoint(canonical_github_url)
+    if checkpoint is None:
+        return False
+    delete_collection(checkpoint.staging)
+    remove_checkpoint(canonical_github_url)
+    logger.info(
+        "Discarded interrupted ingest of %s into %s",
+        canonical_github_url,
+        checkpoint.staging,
+    )
+    return True
+
+
+def pending_ingests() -> list[str]:
+    """Repositories with an interrupted ingest, least recently updated first."""
+    directory = _directory()
+    if not os.path.isdir(directory):
+        return []
+    checkpoints = [
+        checkpoint
+        for name in os.listdir(directory)
+        if name.endswith(".json")
+        and (checkpoint := _read(os.path.join(directory, name))) is not None
+    ]
+    checkpoints.sort(key=lambda checkpoint: checkpoint.updated_at)
+    return [checkpoint.canonical_github_url for checkpoint in checkpoints]
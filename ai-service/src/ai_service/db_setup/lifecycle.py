@@ -0,0 +1,243 @@
+"""
+Collection lifecycle: versioned ingests, deletion and quota-based eviction.
+
+Every ingest builds a new version of a repository's collection in staging and
+only then repoints the registry alias to it, so queries never see a partial
+index and a failed ingest leaves the serving version untouched. Superseded
+versions are deleted by the background task after a grace period.
+
+Collections are evicted least-recently-queried first once the configured
+quota (number of collections and/or total bytes) is exceeded. Evicted
+repositories keep a tombstone in the registry so they can be re-ingested
+transparently the next time somebody asks about them.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from ai_service import utils
+from . import registry
+from .setup import (
+    backend_of,
+    collection_name_for,
+    collection_size_bytes,
+    delete_collection,
+    get_collection,
+    get_repo_context,
+    new_collection_version,
+    reset_staging_collection,
+    set_repo_context,
+    set_staging_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+# Quotas of 0 mean unlimited
+DEFAULT_MAX_COLLECTIONS = 0
+DEFAULT_MAX_STORE_BYTES = 0
+DEFAULT_EVICTION_INTERVAL_SECONDS = 300
+# Superseded versions outlive the swap by this long, so in-flight queries finish
+RETIRED_GRACE_SECONDS = 60
+
+
+@contextmanager
+def staged_ingest(
+    canonical_github_url: str,
+    staging: str | None = None,
+    resumable: bool = False,
+) -> Iterator[str]:
+    """
+    Build a new version of a repository's collection without touching the live one.
+
+    Within the block, all reads and writes of the current context go to a fresh
+    staging collection. Calling `record_ingest` inside the block publishes it.
+    If the block raises, or finishes without publishing, the staging collection
+    is deleted and the live version keeps serving queries.
+
+    Args:
+        canonical_github_url: Repository being ingested.
+        staging: Staging collection of an interrupted ingest to continue
+            writing into, instead of a fresh one.
+        resumable: Keep the staging collection if the block raises, so the
+            ingest can be resumed from its checkpoint.
+
+    Yields:
+        Name of the staging collection.
+    """
+    set_repo_context(canonical_github_url)
+    staging = staging or new_collection_version(canonical_github_url)
+    token = set_staging_collection(staging)
+    published = False
+    keep = False
+    try:
+        yield staging
+        entry = registry.get_entry(collection_name_for(canonical_github_url))
+        published = bool(entry and entry.get("active") == staging)
+    except BaseException:
+        keep = resumable
+        raise
+    finally:
+        reset_staging_collection(token)
+        if keep:
+            logger.info("Keeping staging collection %s to resume the ingest", staging)
+        elif not published:
+            logger.info("Discarding unpublished staging collection %s", staging)
+            delete_collection(staging)
+
+
+def record_ingest(dimension: int, commit_sha: str | None = None) -> None:
+    """
+    Record size and chunk count of the current repo's collection after an ingest.
+
+    Inside `staged_ingest` this atomically makes the staging collection the one
+    queries are served from.
+    """
+    canonical_github_url = get_repo_context()
+    collection = get_collection()
+    registry.record_ingest(
+        collection_name_for(canonical_github_url),
+        canonical_github_url,
+        chunk_count=collection.count(),
+        size_bytes=collection_size_bytes(collection, dimension),
+        backend=backend_of(collection),
+        active=collection.name,
+        commit_sha=commit_sha,
+    )
+
+
+def delete_repo(canonical_github_url: str) -> bool:
+    """
+    Delete all stored data of a repository.
+
+    Returns:
+        True if the repository had been ingested, False if it was unknown.
+    """
+    name = collection_name_for(canonical_github_url)
+    entry = registry.get_entry(name)
+    for version in {name, *_versions(entry)}:
+        delete_collection(version)
+    registry.remove(name)
+    known = entry is not None
+    logger.info("Deleted collection %s (%s)", name, canonical_github_url)
+    return known
+
+
+def is_stored(canonical_github_url: str) -> bool:
+    """Whether a repository was ingested on this node and is not evicted."""
+    entry = registry.get_entry(collection_name_for(canonical_github_url))
+    return bool(entry and not entry.get("evicted"))
+
+
+def collection_version(canonical_github_url: str) -> str:
+    """
+    Identifier of the collection version currently serving a repository.
+
+    Changes with every ingest, so it can key data derived from the index.
+    """
+    name = collection_name_for(canonical_github_url)
+    entry = registry.get_entry(name) or {}
+    return entry.get("active") or name
+
+
+def is_evicted(canonical_github_url: str) -> bool:
+    """Whether a repository was evicted and needs re-ingesting before use."""
+    entry = registry.get_entry(collection_name_for(canonical_github_url))
+    return bool(entry and entry.get("evicted"))
+
+
+def _versions(entry: dict[str, Any] | None) -> list[str]:
+    """Physical collections (live and retired) recorded for a repository."""
+    if entry is None:
+        return []
+    versions = [version["name"] for version in entry.get("retired", [])]
+    if entry.get("active"):
+        versions.append(entry["active"])
+    return versions
+
+
+def collect_retired(grace_seconds: float = RETIRED_GRACE_SECONDS) -> list[str]:
+    """
+    Delete collection versions superseded more than `grace_seconds` ago.
+
+    Returns:
+        Names of the deleted collections.
+    """
+    retired = registry.pop_retired(time.time() - grace_seconds)
+    for name in retired:
+        delete_collection(name)
+        logger.info("Deleted retired collection %s", name)
+    return retired
+
+
+def _recency(entry: dict[str, Any]) -> float:
+    """Least recently queried first; never-queried collections by ingest time."""
+    return entry.get("last_query") or entry.get("last_ingest") or 0.0
+
+
+def evict_collections() -> list[str]:
+    """
+    Enforce the collection quotas by evicting least-recently-queried collections.
+
+    Returns:
+        Names of the evicted collections.
+    """
+    max_collections = utils.get_env_int(utils.MAX_COLLECTIONS, DEFAULT_MAX_COLLECTIONS)
+    max_bytes = utils.get_env_int(utils.MAX_STORE_BYTES, DEFAULT_MAX_STORE_BYTES)
+    if max_collections <= 0 and max_bytes <= 0:
+        return []
+
+    live = sorted(
+        (
+            (name, entry)
+            for name, entry in registry.list_entries().items()
+            if not entry.get("evicted")
+        ),
+        key=lambda item: _recency(item[1]),
+    )
+    count = len(live)
+    total_bytes = sum(entry.get("size_bytes", 0) for _, entry in live)
+
+    evicted: list[str] = []
+    for name, entry in live:
+        over_count = max_collections > 0 and count > max_collections
+        over_bytes = max_bytes > 0 and total_bytes > max_bytes
+        if not (over_count or over_bytes):
+            break
+        if not registry.evict_unchanged(name, entry, delete_collection):
+            logger.info("Not evicting collection %s, it was just re-ingested", name)
+            continue
+        count -= 1
+        total_bytes -= entry.get("size_bytes", 0)
+        evicted.append(name)
+        logger.info(
+            "Evicted collection %s (%s), idle since %s",
+            name,
+            entry.get("canonical_github_url"),
+            time.ctime(_recency(entry)),
+        )
+    return evicted
+
+
+async def run_evictor() -> None:
+    """
+    Background task that deletes retired versions and enforces the quotas.
+
+    With several worker processes it runs in all of them, but only the one
+    holding the registry's maintenance lock does the work.
+    """
+    interval = utils.get_env_int(
+        utils.EVICTION_INTERVAL_SECONDS, DEFAULT_EVICTION_INTERVAL_SECONDS
+    )
+    while True:
+        try:
+            if not registry.hold_maintenance_lock():
+                await asyncio.sleep(interval)
+                continue
+            await asyncio.to_thread(collect_retired)
+            await asyncio.to_thread(evict_collections)
+        except Exception:
+            logger.exception("Collection maintenance failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,392 @@
+"""
+Exact brute-force vector store backed by memory-mapped NumPy files.
+
+Each collection is a directory holding:
+- `vectors-<version>.npy`: an (n, dim) float32 matrix of unit-length vectors.
+- `records-<version>.json`: ids, documents and metadatas in row order.
+- `manifest.json`: points to the current version and is swapped atomically,
+  so readers (including other processes) never see a half-written collection.
+
+Writers (threads and processes) serialize on an `fcntl` lock on `.lock` in the
+directory and re-read the manifest under it, so no write is lost. Version names
+are random, and a superseded version's files are deleted only after a grace
+period, since other processes may still have them memory-mapped.
+
+Queries are a single matrix multiplication followed by `argpartition`, which
+is exact and, for small and medium repositories, faster than an HNSW index.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import numpy as np
+
+_MANIFEST = "manifest.json"
+_WRITE_LOCK = ".lock"
+# Like lifecycle's retired collection versions: superseded files outlive the
+# swap by this long, so readers in other processes finish with them first
+RETIRED_GRACE_SECONDS = 60
+_DEFAULT_INCLUDE = ["metadatas", "documents"]
+_DEFAULT_QUERY_INCLUDE = ["metadatas", "documents", "distances"]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _matches(metadata: dict[str, Any] | None, where: dict[str, Any]) -> bool:
+    """Evaluate a ChromaDB-style `where` filter against one metadata dict."""
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == "$eq" and value != operand:
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyCollection:
+    """A collection stored as a memory-mapped float32 matrix plus a records file."""
+
+    def __init__(self, directory: str, name: str) -> None:
+        self._directory = directory
+        self._name = name
+        self._lock = threading.RLock()
+        # (inode, mtime) of the manifest loaded; each swap creates a new inode
+        self._manifest_stamp: tuple[int, int] | None = None
+        self._version: str | int | None = None
+        self._retired: list[dict[str, Any]] = []
+        self._vectors: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._ids: list[str] = []
+        self._documents: list[str | None] = []
+        self._metadatas: list[dict[str, Any] | None] = []
+        self._positions: dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    # --- Persistence ---
+
+    def _refresh(self) -> None:
+        """Reload from disk if another writer swapped the manifest."""
+        manifest_path = os.path.join(self._directory, _MANIFEST)
+        try:
+            stat = os.stat(manifest_path)
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp == self._manifest_stamp:
+            return
+
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        version = manifest["version"]
+        vectors = np.load(
+            os.path.join(self._directory, f"vectors-{version}.npy"), mmap_mode="r"
+        )
+        with open(
+            os.path.join(self._directory, f"records-{version}.json"), encoding="utf-8"
+        ) as f:
+            records = json.load(f)
+
+        self._version = version
+        self._retired = manifest.get("retired", [])
+        self._vectors = vectors
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+        self._manifest_stamp = stamp
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """Hold the collection's write lock, across threads and processes."""
+        # Never deleted, see checkpoints.job_lock
+        with open(os.path.join(self._directory, _WRITE_LOCK), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _write(
+        self,
+        vectors: np.ndarray,
+        ids: list[str],
+        documents: list[str | None],
+        metadatas: list[dict[str, Any] | None],
+    ) -> None:
+        """
+        Write a new version of the collection and atomically switch to it.
+
+        Must be called under `_write_lock`, after a `_refresh`.
+        """
+        version = uuid.uuid4().hex[:12]
+        np.save(
+            os.path.join(self._directory, f"vectors-{version}.npy"),
+            np.ascontiguousarray(vectors, dtype=np.float32),
+        )
+        with open(
+            os.path.join(self._directory, f"records-{version}.json"),
+            "w",
+            encoding="utf-8",
+        ) as f:
+            json.dump(
+                {"ids": ids, "documents": documents, "metadatas": metadatas},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+
+        now = time.time()
+        retired = list(self._retired)
+        if self._version is not None:
+            retired.append({"version": self._version, "retired_at": now})
+        expired = [r for r in retired if r["retired_at"] <= now - RETIRED_GRACE_SECONDS]
+        retired = [r for r in retired if r not in expired]
+
+        manifest_path = os.path.join(self._directory, _MANIFEST)
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "count": len(ids), "retired": retired}, f)
+        os.replace(tmp_path, manifest_path)
+        self._refresh()
+
+        for entry in expired:
+            for stale in (
+                f"vectors-{entry['version']}.npy",
+                f"records-{entry['version']}.json",
+            ):
+                try:
+                    os.remove(os.path.join(self._directory, stale))
+                except FileNotFoundError:
+                    pass
+
+    # --- Collection API ---
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def add(
+        self,
+        ids: list[str],
+        embeddings: Any,
+        documents: list[str] | None = None,
+        metadatas: list[dict[str, Any] | None] | None = None,
+    ) -> None:
+        """Append new records. Ids that already exist are ignored."""
+        self._write_records(ids, embeddings, documents, metadatas, replace=False)
+
+    def upsert(
+        self,
+        ids: list[str],
+        embeddings: Any,
+        documents: list[str] | None = None,
+        metadatas: list[dict[str, Any] | None] | None = None,
+    ) -> None:
+        """Insert new records and replace the ones whose ids already exist."""
+        self._write_records(ids, embeddings, documents, metadatas, replace=True)
+
+    def _write_records(
+        self,
+        ids: list[str],
+        embeddings: Any,
+        documents: list[str] | None,
+        metadatas: list[dict[str, Any] | None] | None,
+        *,
+        replace: bool,
+    ) -> None:
+        if not ids:
+            return
+        new_vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock, self._write_lock():
+            self._refresh()
+            all_ids = list(self._ids)
+            all_documents = list(self._documents)
+            all_metadatas = list(self._metadatas)
+            positions = dict(self._positions)
+            if len(self._vectors):
+                vectors = np.array(self._vectors, dtype=np.float32)
+            else:
+                vectors = np.empty((0, new_vectors.shape[1]), dtype=np.float32)
+
+            appended: list[int] = []
+            for i, id_ in enumerate(ids):
+                document = documents[i] if documents is not None else None
+                metadata = metadatas[i] if metadatas is not None else None
+                position = positions.get(id_)
+                if position is None:
+                    positions[id_] = len(all_ids)
+                    appended.append(i)
+                    all_ids.append(id_)
+                    all_documents.append(document)
+                    all_metadatas.append(metadata)
+                elif replace:
+                    vectors[position] = new_vectors[i]
+                    all_documents[position] = document
+                    all_metadatas[position] = metadata
+
+            if appended:
+                vectors = np.concatenate([vectors, new_vectors[appended]])
+            self._write(vectors, all_ids, all_documents, all_metadatas)
+
+    def delete(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+    ) -> None:
+        with self._lock, self._write_lock():
+            self._refresh()
+            doomed = set(ids or [])
+            keep = [
+                i
+                for i, id_ in enumerate(self._ids)
+                if id_ not in doomed
+                and (where is None or not _matches(self._metadatas[i], where))
+            ]
+            if len(keep) == len(self._ids):
+                return
+            self._write(
+                np.asarray(self._vectors)[keep],
+                [self._ids[i] for i in keep],
+                [self._documents[i] for i in keep],
+                [self._metadatas[i] for i in keep],
+            )
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        include: list[Any] = _DEFAULT_INCLUDE,
+    ) -> dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                rows = [self._positions[id_] for id_ in ids if id_ in self._positions]
+            else:
+                rows = list(range(len(self._ids)))
+            if where is not None:
+                rows = [i for i in rows if _matches(self._metadatas[i], where)]
+            start = offset or 0
+            rows = rows[start : start + limit if limit is not None else None]
+            return self._records(rows, include)
+
+    def peek(self, limit: int = 10) -> dict[str, Any]:
+        return self.get(limit=limit, include=["embeddings", "documents", "metadatas"])
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: dict[str, Any] | None = None,
+        include: list[Any] = _DEFAULT_QUERY_INCLUDE,
+    ) -> dict[str, Any]:
+        """
+        Exact nearest-neighbour search for one or more query vectors.
+
+        Distances are squared L2 between unit vectors (2 - 2 * cosine), the
+        same scale ChromaDB's default `l2` space reports for normalized
+        embeddings, so scores from both backends can be compared.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, np.float32)))
+        with self._lock:
+            self._refresh()
+            vectors = self._vectors
+            if where is not None:
+                candidates = np.array(
+                    [i for i, m in enumerate(self._metadatas) if _matches(m, where)],
+                    dtype=np.int64,
+                )
+            else:
+                candidates = None
+
+            result: dict[str, Any] = {
+                "ids": [],
+                "documents": [] if "documents" in include else None,
+                "metadatas": [] if "metadatas" in include else None,
+                "distances": [] if "distances" in include else None,
+                "embeddings": [] if "embeddings" in include else None,
+                "included": list(include),
+            }
+            searched = vectors if candidates is None else vectors[candidates]
+            k = min(n_results, len(searched))
+            if k == 0:
+                for _ in queries:
+                    self._append_query_rows(result, [], np.empty(0))
+                return result
+
+            # One matmul scores every query against every candidate vector
+            scores = queries @ searched.T
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            for local_rows, row_scores in zip(top, top_scores):
+                rows = local_rows if candidates is None else candidates[local_rows]
+                self._append_query_rows(result, rows.tolist(), 2.0 - 2.0 * row_scores)
+            return result
+
+    # --- Helpers ---
+
+    def _records(self, rows: list[int], include: list[Any]) -> dict[str, Any]:
+        return {
+            "ids": [self._ids[i] for i in rows],
+            "documents": [self._documents[i] for i in rows]
+            if "documents" in include
+            else None,
+            "metadatas": [self._metadatas[i] for i in rows]
+            if "metadatas" in include
+            else None,
+            "embeddings": np.asarray(self._vectors)[rows]
+            if "embeddings" in include
+            else None,
+            "included": list(include),
+        }
+
+    def _append_query_rows(
+        self,
+        result: dict[str, Any],
+        rows: list[int],
+        distances: np.ndarray,
+    ) -> None:
+        records = self._records(rows, result["included"])
+        result["ids"].append(records["ids"])
+        for key in ("documents", "metadatas", "embeddings"):
+            if result[key] is not None:
+                result[key].append(records[key])
+        if result["distances"] is not None:
+            result["distances"].append(distances.astype(float).tolist())
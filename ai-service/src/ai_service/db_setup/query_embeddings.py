@@ -1,15 +1,39 @@
-import chromadb
-from ai_service import errors
-from ai_service.db_setup.setup import get_collection
+import logging
+from typing import TYPE_CHECKING, Any
+from ai_service import errors, utils
+from ai_service.db_setup import registry
+from ai_service.db_setup.setup import (
+    collection_name_for,
+    get_collection,
+    get_file_collection,
+    get_repo_context,
+)
+
+if TYPE_CHECKING:
+    import chromadb
+
+logger = logging.getLogger(__name__)
+
+# Two-stage search is disabled by default: Chroma's HNSW search stays within a
+# few milliseconds at 100k chunks, while its metadata-filtered search scans the
+# metadata table. See benchmarks/two_stage_retrieval.py before enabling it.
+DEFAULT_TWO_STAGE_MIN_CHUNKS = 0
+# Number of candidate files kept by the coarse file-level search
+DEFAULT_TWO_STAGE_TOP_FILES = 25
 
 
 def query_chunks(
     text_embedding: list[float],
     number_of_results: int = 4,
-) -> chromadb.QueryResult:
+) -> "chromadb.QueryResult":
     """
     Query ChromaDB for most similar documents.
 
+    Collections with at least TWO_STAGE_MIN_CHUNKS chunks are searched in two
+    stages: the file-level summary index picks the most relevant files first,
+    then the chunk search is restricted to those files through metadata
+    filtering.
+
     Args:
         text_embedding: Vector embedding of a user query.
         number_of_results: Number of results to return (1-50). Default is 4.
@@ -21,16 +45,103 @@ def query_chunks(
         DatabaseError: If the query fails.
         InvalidParam: If parameters are invalid.
     """
-    if len(text_embedding) == 0:
+    return query_chunks_batch([text_embedding], number_of_results)
+
+
+def query_chunks_batch(
+    text_embeddings: list[list[float]],
+    number_of_results: int = 4,
+) -> "chromadb.QueryResult":
+    """
+    Query ChromaDB for the most similar documents of several queries at once.
+
+    Without two-stage search this is a single multi-query lookup. With it,
+    every query has its own file filter, so the queries run one by one.
+
+    Args:
+        text_embeddings: Vector embeddings of the user queries.
+        number_of_results: Number of results per query (1-50). Default is 4.
+
+    Returns:
+        A QueryResult object with one row of results per query, in order.
+
+    Raises:
+        DatabaseError: If the query fails.
+        InvalidParam: If parameters are invalid.
+    """
+    if not text_embeddings or any(len(e) == 0 for e in text_embeddings):
         raise errors.InvalidParam.empty_embedding()
     if number_of_results < 1 or number_of_results > 50:
         raise errors.InvalidParam.invalid_results_count()
 
     collection = get_collection()
     try:
-        return collection.query(
-            query_embeddings=[text_embedding],
-            n_results=number_of_results,
+        min_chunks = utils.get_env_int(
+            utils.TWO_STAGE_MIN_CHUNKS, DEFAULT_TWO_STAGE_MIN_CHUNKS
         )
+        if min_chunks > 0 and collection.count() >= min_chunks:
+            rows = []
+            for text_embedding in text_embeddings:
+                where: dict[str, Any] | None = None
+                candidate_files = query_files(text_embedding)
+                if candidate_files:
+                    logger.debug("Two-stage search over %d files", len(candidate_files))
+                    where = {"file_path": {"$in": candidate_files}}
+                rows.append(
+                    collection.query(
+                        query_embeddings=[text_embedding],
+                        n_results=number_of_results,
+                        where=where,
+                    )
+                )
+            results = _concat_rows(rows)
+        else:
+            results = collection.query(
+                query_embeddings=text_embeddings,
+                n_results=number_of_results,
+            )
     except Exception as e:
         raise errors.DatabaseError.query_chunks_failed(e) from e
+    registry.record_query(collection_name_for(get_repo_context()))
+    return results
+
+
+def _concat_rows(rows: list[Any]) -> Any:
+    """Combine single-query results into one result with a row per query."""
+    combined = dict(rows[0])
+    for key in ("ids", "documents", "metadatas", "distances", "embeddings"):
+        if combined.get(key) is not None:
+            combined[key] = [row[key][0] for row in rows]
+    return combined
+
+
+def query_files(
+    text_embedding: list[float],
+    number_of_files: int | None = None,
+) -> list[str]:
+    """
+    Find the files whose summary vectors are closest to a query.
+
+    Args:
+        text_embedding: Vector embedding of a user query.
+        number_of_files: How many files to return. Defaults to TWO_STAGE_TOP_FILES.
+
+    Returns:
+        Repository-relative file paths, most relevant first. Empty if the
+        repository has no file-level index (e.g. ingested before it existed).
+    """
+    if number_of_files is None:
+        number_of_files = utils.get_env_int(
+            utils.TWO_STAGE_TOP_FILES, DEFAULT_TWO_STAGE_TOP_FILES
+        )
+
+    file_collection = get_file_collection()
+    if file_collection.count() == 0:
+        return []
+
+    result = file_collection.query(
+        query_embeddings=[text_embedding],
+        n_results=number_of_files,
+        include=[],
+    )
+    return result["ids"][0]
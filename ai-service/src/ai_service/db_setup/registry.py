@@ -0,0 +1,226 @@
+"""
+Per-collection bookkeeping persisted next to the vector store.
+
+The registry is a small JSON file (`<CHROMA_STORE_PATH>/collections.json`)
+keyed by collection name. It records which repository a collection belongs
+to, its size, and when it was last ingested and queried. Writes take a file
+lock and atomically replace the file, so several processes can share it.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TextIO
+
+from ai_service import errors
+
+# Don't rewrite the registry for every query of the same collection
+QUERY_TOUCH_INTERVAL_SECONDS = 60
+
+_path: str | None = None
+_lock = threading.RLock()
+_entries: dict[str, dict[str, Any]] = {}
+_mtime: int | None = None
+# Held by the one process that deletes collections, see hold_maintenance_lock
+_maintenance_lock: TextIO | None = None
+
+
+def initialize_registry(store_path: str) -> None:
+    """Point the registry at the vector store directory."""
+    global _path, _mtime, _maintenance_lock
+    with _lock:
+        if _maintenance_lock is not None:
+            _maintenance_lock.close()
+            _maintenance_lock = None
+        os.makedirs(store_path, exist_ok=True)
+        _path = os.path.join(store_path, "collections.json")
+        _mtime = None
+        _entries.clear()
+
+
+def _get_path() -> str:
+    if _path is None:
+        raise errors.DatabaseError.missing_db_init()
+    return _path
+
+
+def _load() -> dict[str, dict[str, Any]]:
+    """Return the current entries, re-reading the file if another process changed it."""
+    global _mtime
+    path = _get_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return _entries
+    if mtime != _mtime:
+        with open(path, encoding="utf-8") as f:
+            loaded = json.load(f)
+        _entries.clear()
+        _entries.update(loaded)
+        _mtime = mtime
+    return _entries
+
+
+@contextmanager
+def _locked_update() -> Iterator[dict[str, dict[str, Any]]]:
+    """Lock the registry (across threads and processes), yield entries, then save."""
+    global _mtime
+    path = _get_path()
+    with _lock, open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        entries = _load()
+        yield entries
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        _mtime = os.stat(path).st_mtime_ns
+
+
+def hold_maintenance_lock() -> bool:
+    """
+    Whether this process is the one to delete retired and evicted collections.
+
+    The first process to ask takes an exclusive lock and holds it until it
+    exits, so with several workers sharing a store only one deletes
+    collections. If it dies, the OS releases the lock and the next process
+    to ask takes over.
+    """
+    global _maintenance_lock
+    with _lock:
+        if _maintenance_lock is None:
+            lock_file = open(f"{_get_path()}.maintenance.lock", "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            _maintenance_lock = lock_file
+        return True
+
+
+def record_ingest(
+    collection_name: str,
+    canonical_github_url: str,
+    chunk_count: int,
+    size_bytes: int,
+    backend: str,
+    active: str,
+    commit_sha: str | None = None,
+) -> None:
+    """
+    Record a finished ingest and atomically point the repository at its new version.
+
+    The version that was active until now is kept as retired, so queries that
+    already hold it can finish before it gets deleted.
+    """
+    now = time.time()
+    with _locked_update() as entries:
+        entry = entries.get(collection_name, {})
+        previous = entry.get("active") or collection_name
+        retired = entry.get("retired", [])
+        if previous != active:
+            retired.append({"name": previous, "retired_at": now})
+        entry.update(
+            canonical_github_url=canonical_github_url,
+            chunk_count=chunk_count,
+            size_bytes=size_bytes,
+            backend=backend,
+            active=active,
+            retired=retired,
+            commit_sha=commit_sha,
+            last_ingest=now,
+            evicted=False,
+        )
+        entry.setdefault("last_query", None)
+        entries[collection_name] = entry
+
+
+def record_query(collection_name: str) -> None:
+    """Record that a collection was queried (throttled to limit disk writes)."""
+    now = time.time()
+    with _lock:
+        entry = _load().get(collection_name)
+        if entry is None or entry.get("evicted"):
+            return
+        last_query = entry.get("last_query") or 0
+        if now - last_query < QUERY_TOUCH_INTERVAL_SECONDS:
+            return
+    with _locked_update() as entries:
+        if collection_name in entries:
+            entries[collection_name]["last_query"] = now
+
+
+def _tombstone(entry: dict[str, Any]) -> None:
+    """Keep only enough of an evicted collection's entry to re-ingest it."""
+    entry.update(evicted=True, active=None, retired=[], chunk_count=0, size_bytes=0)
+
+
+def evict_unchanged(
+    collection_name: str,
+    seen: dict[str, Any],
+    delete: Callable[[str], None],
+) -> bool:
+    """
+    Delete a collection's versions and leave a tombstone, unless it changed.
+
+    `seen` is the entry the decision to evict was based on. If the
+    repository was re-ingested since (its `active` version or `last_ingest`
+    differ), nothing happens. Deleting under the registry lock keeps an
+    ingest from publishing a version in between.
+
+    Returns:
+        True if the collection was evicted.
+    """
+    with _locked_update() as entries:
+        entry = entries.get(collection_name)
+        if (
+            entry is None
+            or entry.get("evicted")
+            or any(entry.get(key) != seen.get(key) for key in ("active", "last_ingest"))
+        ):
+            return False
+        versions = {collection_name, *(v["name"] for v in entry.get("retired", []))}
+        if entry.get("active"):
+            versions.add(entry["active"])
+        for version in versions:
+            delete(version)
+        _tombstone(entry)
+        return True
+
+
+def pop_retired(retired_before: float) -> list[str]:
+    """Forget retired versions retired before a point in time and return their names."""
+    names: list[str] = []
+    with _locked_update() as entries:
+        for entry in entries.values():
+            keep = []
+            for version in entry.get("retired", []):
+                if version["retired_at"] < retired_before:
+                    names.append(version["name"])
+                else:
+                    keep.append(version)
+            entry["retired"] = keep
+    return names
+
+
+def remove(collection_name: str) -> None:
+    """Forget a collection entirely."""
+    with _locked_update() as entries:
+        entries.pop(collection_name, None)
+
+
+def get_entry(collection_name: str) -> dict[str, Any] | None:
+    """Bookkeeping for one collection, or None if it was never ingested."""
+    with _lock:
+        entry = _load().get(collection_name)
+        return dict(entry) if entry is not None else None
+
+
+def list_entries() -> dict[str, dict[str, Any]]:
+    """Bookkeeping for all known collections, keyed by collection name."""
+    with _lock:
+        return {name: dict(entry) for name, entry in _load().items()}
@@ -1,4 +1,11 @@
 import hashlib
+import os
+import shutil
+import sys
+import threading
+import uuid
+from urllib.parse import urlparse
+
 import numpy as np
 from ai_service import utils, errors
 
@@ -8,21 +15,58 @@ from ai_service import utils, errors
 if not hasattr(np, "float_"):
     np.float_ = np.float64  # type: ignore
 
-import chromadb
-from contextvars import ContextVar
+from contextvars import ContextVar, Token
 from typing import Optional, Any
 
+from . import registry
+from .numpy_store import NumpyCollection
+from .vector_store import VectorCollection
+
+BACKEND_CHROMA = "chroma"
+BACKEND_NUMPY = "numpy"
+BACKEND_AUTO = "auto"
+# In auto mode, new collections up to this many chunks use the NumPy backend
+DEFAULT_NUMPY_BACKEND_MAX_CHUNKS = 20_000
+
 # Global client variable - initialized once at startup
 _client: Optional[Any] = None
+_numpy_root: Optional[str] = None
+_numpy_collections: dict[str, NumpyCollection] = {}
+_numpy_lock = threading.Lock()
 _current_repo_url: ContextVar[str] = ContextVar("current_repo_url")
+# Staging collection that writes of the current context go to during an ingest
+_staging_collection: ContextVar[str | None] = ContextVar(
+    "staging_collection", default=None
+)
 
 
 def initialize_db() -> None:
-    """Initialize the ChromaDB client at application startup."""
-    global _client
+    """
+    Initialize the ChromaDB client and NumPy store at application startup.
+
+    With CHROMA_SERVER_URL set, ChromaDB is used through that server instead
+    of opening CHROMA_STORE_PATH directly, so any number of processes can
+    write to it. The registry and NumPy store stay in CHROMA_STORE_PATH.
+    """
+    global _client, _numpy_root
     if _client is None:
+        # ChromaDB is imported here, not at module level, since importing it
+        # takes seconds and many users of this package never open the store
+        import chromadb
+
         chroma_path = utils.get_env_var(utils.CHROMA_STORE_PATH)
-        _client = chromadb.PersistentClient(path=chroma_path)
+        server_url = os.getenv(utils.CHROMA_SERVER_URL)
+        if server_url:
+            server = urlparse(server_url)
+            _client = chromadb.HttpClient(
+                host=server.hostname or "localhost",
+                port=server.port or 8000,
+                ssl=server.scheme == "https",
+            )
+        else:
+            _client = chromadb.PersistentClient(path=chroma_path)
+        _numpy_root = os.path.join(chroma_path, "numpy")
+        registry.initialize_registry(chroma_path)
 
 
 def _get_client() -> Any:
@@ -37,15 +81,180 @@ def set_repo_context(canonical_github_url: str) -> None:
     _current_repo_url.set(canonical_github_url)
 
 
-def get_collection() -> chromadb.Collection:
-    """Get or create a ChromaDB collection using the current repo context."""
+def get_repo_context() -> str:
+    """Get the repository URL of the current context."""
     try:
-        canonical_github_url = _current_repo_url.get()
+        return _current_repo_url.get()
     except LookupError as e:
         raise errors.DatabaseError.no_repo_context(e) from e
 
-    client = _get_client()
+
+def collection_name_for(canonical_github_url: str) -> str:
+    """Derive the collection name of a repository."""
     url_hash = hashlib.sha256(canonical_github_url.encode("utf-8")).hexdigest()[:12]
     repo_name = canonical_github_url.split("/")[-1].replace(".git", "")
-    collection_name = f"{repo_name}_{url_hash}"
-    return client.get_or_create_collection(collection_name)
+    return f"{repo_name}_{url_hash}"
+
+
+def _collection_name() -> str:
+    """
+    Name of the physical collection serving the current repo context.
+
+    Inside an ingest that's the staging collection being built. Otherwise it
+    is the version the registry alias points to, or the unversioned name for
+    repositories ingested before collections were versioned.
+    """
+    staging = _staging_collection.get()
+    if staging is not None:
+        return staging
+    name = collection_name_for(get_repo_context())
+    entry = registry.get_entry(name)
+    return (entry or {}).get("active") or name
+
+
+def new_collection_version(canonical_github_url: str) -> str:
+    """Unique name for a new version of a repository's collection."""
+    return f"{collection_name_for(canonical_github_url)}_v{uuid.uuid4().hex[:8]}"
+
+
+def set_staging_collection(name: str | None) -> Token:
+    """Route reads and writes of the current context to a staging collection."""
+    return _staging_collection.set(name)
+
+
+def reset_staging_collection(token: Token) -> None:
+    _staging_collection.reset(token)
+
+
+def _backend() -> str:
+    """Configured vector-store backend: chroma (default), numpy or auto."""
+    backend = os.getenv(utils.VECTOR_BACKEND, BACKEND_CHROMA).strip().lower()
+    if backend not in (BACKEND_CHROMA, BACKEND_NUMPY, BACKEND_AUTO):
+        raise errors.InvalidParam.invalid_env_value(utils.VECTOR_BACKEND, backend)
+    return backend
+
+
+def _numpy_collection(name: str) -> NumpyCollection:
+    """Get (and cache) a NumPy-backed collection by name."""
+    if _numpy_root is None:
+        raise errors.DatabaseError.missing_db_init()
+    with _numpy_lock:
+        collection = _numpy_collections.get(name)
+        if collection is None:
+            collection = NumpyCollection(os.path.join(_numpy_root, name), name)
+            _numpy_collections[name] = collection
+        return collection
+
+
+def _numpy_exists(name: str) -> bool:
+    return _numpy_root is not None and os.path.isdir(os.path.join(_numpy_root, name))
+
+
+def _chroma_count(name: str) -> int:
+    """Number of records in an existing Chroma collection, 0 if missing."""
+    from chromadb.errors import NotFoundError
+
+    try:
+        return _get_client().get_collection(name).count()
+    except NotFoundError:
+        return 0
+
+
+def _use_numpy(name: str, expected_count: int | None) -> bool:
+    """Decide which backend holds (or should hold) a collection."""
+    backend = _backend()
+    if backend != BACKEND_AUTO:
+        return backend == BACKEND_NUMPY
+    # Collections stay on the backend they were created on
+    if _numpy_exists(name):
+        return True
+    if expected_count is None or _chroma_count(name) > 0:
+        return False
+    max_chunks = utils.get_env_int(
+        utils.NUMPY_BACKEND_MAX_CHUNKS, DEFAULT_NUMPY_BACKEND_MAX_CHUNKS
+    )
+    return expected_count <= max_chunks
+
+
+def _get_or_create(name: str, use_numpy: bool) -> VectorCollection:
+    if use_numpy:
+        return _numpy_collection(name)
+    return _get_client().get_or_create_collection(name)
+
+
+def get_collection(expected_count: int | None = None) -> VectorCollection:
+    """
+    Get or create the collection for the current repo context.
+
+    Args:
+        expected_count: Number of chunks about to be written, if known. In
+            auto mode it decides the backend of a collection that doesn't
+            exist yet.
+    """
+    collection_name = _collection_name()
+    return _get_or_create(collection_name, _use_numpy(collection_name, expected_count))
+
+
+def get_file_collection() -> VectorCollection:
+    """
+    Get or create the file-level summary collection for the current repo context.
+
+    It holds one vector per source file and is used as the coarse first stage
+    of retrieval before searching the chunk collection. It always lives on the
+    same backend as the chunk collection.
+    """
+    collection_name = _collection_name()
+    use_numpy = _use_numpy(collection_name, None)
+    return _get_or_create(f"{collection_name}_files", use_numpy)
+
+
+def get_max_batch_size(collection: VectorCollection) -> int:
+    """Maximum number of records a collection accepts in a single write."""
+    if isinstance(collection, NumpyCollection):
+        # Each NumPy write rewrites the matrix, so write everything at once
+        return sys.maxsize
+    return _get_client().get_max_batch_size()
+
+
+def delete_collection(name: str) -> None:
+    """Delete a collection (and its file-level index) from whichever backend holds it."""
+    from chromadb.errors import NotFoundError
+
+    for collection_name in (name, f"{name}_files"):
+        if _numpy_exists(collection_name):
+            with _numpy_lock:
+                _numpy_collections.pop(collection_name, None)
+            shutil.rmtree(os.path.join(_numpy_root or "", collection_name))
+        try:
+            _get_client().delete_collection(collection_name)
+        except (NotFoundError, ValueError):
+            pass
+
+
+def collection_size_bytes(collection: VectorCollection, dimension: int) -> int:
+    """
+    Disk footprint of a collection.
+
+    Exact for the NumPy backend. For ChromaDB, whose segments are shared files,
+    it is estimated from the stored vectors, HNSW links and document sizes.
+    """
+    if isinstance(collection, NumpyCollection):
+        directory = collection.directory
+        return sum(
+            os.path.getsize(os.path.join(directory, entry))
+            for entry in os.listdir(directory)
+        )
+
+    count = collection.count()
+    if count == 0:
+        return 0
+    sample = collection.peek(limit=100)["documents"] or []
+    average_document_bytes = sum(len(doc.encode("utf-8")) for doc in sample if doc)
+    average_document_bytes //= max(1, len(sample))
+    # float32 vector + ~16 bidirectional HNSW links of 4 bytes each
+    return count * (dimension * 4 + 128 + average_document_bytes)
+
+
+def backend_of(collection: VectorCollection) -> str:
+    """Name of the backend a collection lives on."""
+    return BACKEND_NUMPY if isinstance(collection, NumpyCollection) else BACKEND_CHROMA
@@ -0,0 +1,251 @@
+"""
+Portable snapshots of one repository's vector index.
+
+A snapshot is a single compressed `.npz` file holding the chunk vectors as a
+contiguous float32 matrix, the matching ids, documents and metadatas, the
+file-level summary index and a manifest (repository, ingested commit SHA,
+embedding model). Importing one writes the vectors straight into a
+collection, so a node can serve a repository without cloning or embedding it.
+
+Snapshots are published to `SNAPSHOT_STORE_PATH`, a directory that stands in
+for an object store: files are written under a temporary name and renamed
+into place, so readers only ever see complete snapshots.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+from ai_service import errors, utils
+from .lifecycle import is_stored, record_ingest, staged_ingest
+from .registry import get_entry
+from .setup import (
+    collection_name_for,
+    get_collection,
+    get_file_collection,
+    get_max_batch_size,
+    set_repo_context,
+)
+from .vector_store import VectorCollection
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot.npz"
+# Records read from a collection per request while exporting
+_EXPORT_PAGE_SIZE = 5000
+
+
+def _encode_json(value: Any) -> np.ndarray:
+    return np.frombuffer(
+        json.dumps(value, ensure_ascii=False).encode("utf-8"), np.uint8
+    )
+
+
+def _decode_json(array: np.ndarray) -> Any:
+    return json.loads(array.tobytes().decode("utf-8"))
+
+
+def _read_collection(collection: VectorCollection) -> tuple[np.ndarray, dict]:
+    """Read all vectors and records of a collection, page by page."""
+    vectors: list[np.ndarray] = []
+    records: dict[str, list] = {"ids": [], "documents": [], "metadatas": []}
+    total = collection.count()
+    for offset in range(0, total, _EXPORT_PAGE_SIZE):
+        page = collection.get(
+            limit=_EXPORT_PAGE_SIZE,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not page["ids"]:
+            break
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        records["ids"].extend(page["ids"])
+        records["documents"].extend(page["documents"] or [None] * len(page["ids"]))
+        records["metadatas"].extend(page["metadatas"] or [None] * len(page["ids"]))
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32), records
+    return np.ascontiguousarray(np.concatenate(vectors)), records
+
+
+def _write_collection(
+    collection: VectorCollection, vectors: np.ndarray, records: dict
+) -> None:
+    """Bulk-write vectors and records into an empty collection."""
+    batch_size = get_max_batch_size(collection)
+    for start in range(0, len(records["ids"]), batch_size):
+        end = start + batch_size
+        metadatas = records["metadatas"][start:end]
+        collection.add(
+            ids=records["ids"][start:end],
+            embeddings=vectors[start:end],
+            documents=records["documents"][start:end],
+            metadatas=metadatas if any(metadatas) else None,
+        )
+
+
+def export_snapshot(canonical_github_url: str, path: str) -> dict[str, Any]:
+    """
+    Write a snapshot of a repository's stored index to a file.
+
+    Args:
+        canonical_github_url: Repository to export.
+        path: Destination file, conventionally ending in `.snapshot.npz`.
+
+    Returns:
+        The snapshot manifest.
+
+    Raises:
+        NotFound: If the repository is not stored or has no chunks.
+    """
+    # Checked first: opening the collection of an unknown repository creates it
+    if not is_stored(canonical_github_url):
+        raise errors.NotFound.collection(canonical_github_url)
+    set_repo_context(canonical_github_url)
+    vectors, records = _read_collection(get_collection())
+    if not records["ids"]:
+        raise errors.NotFound.collection(canonical_github_url)
+    file_vectors, file_records = _read_collection(get_file_collection())
+
+    entry = get_entry(collection_name_for(canonical_github_url)) or {}
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "canonical_github_url": canonical_github_url,
+        "commit_sha": entry.get("commit_sha"),
+        "embedding_model": os.getenv(utils.EMBEDDING_MODEL),
+        "dimension": int(vectors.shape[1]),
+        "chunk_count": len(records["ids"]),
+        "created_at": time.time(),
+    }
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f,
+            manifest=_encode_json(manifest),
+            vectors=vectors,
+            records=_encode_json(records),
+            file_vectors=file_vectors,
+            file_records=_encode_json(file_records),
+        )
+    logger.info(
+        "Exported %d chunks of %s to %s",
+        manifest["chunk_count"],
+        canonical_github_url,
+        path,
+    )
+    return manifest
+
+
+def import_snapshot(path: str) -> dict[str, Any]:
+    """
+    Replace a repository's stored index with the contents of a snapshot.
+
+    No embedding model is needed: vectors are written as stored.
+
+    Args:
+        path: Snapshot file written by `export_snapshot`.
+
+    Returns:
+        The snapshot manifest.
+
+    Raises:
+        SnapshotError: If the file is not a compatible snapshot.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            manifest = _decode_json(data["manifest"])
+            vectors = data["vectors"]
+            records = _decode_json(data["records"])
+            file_vectors = data["file_vectors"]
+            file_records = _decode_json(data["file_records"])
+    except (OSError, ValueError, KeyError) as e:
+        raise errors.SnapshotError.invalid_file(path, e) from e
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise errors.SnapshotError.unsupported_format(manifest.get("format_version"))
+    model = os.getenv(utils.EMBEDDING_MODEL)
+    snapshot_model = manifest.get("embedding_model")
+    if model and snapshot_model and model != snapshot_model:
+        raise errors.SnapshotError.model_mismatch(snapshot_model, model)
+
+    canonical_github_url = manifest["canonical_github_url"]
+    # Loaded like an ingest, so queries keep using the previous version until done
+    with staged_ingest(canonical_github_url):
+        _write_collection(
+            get_collection(expected_count=len(records["ids"])), vectors, records
+        )
+        if file_records["ids"]:
+            _write_collection(get_file_collection(), file_vectors, file_records)
+        record_ingest(
+            dimension=manifest["dimension"], commit_sha=manifest["commit_sha"]
+        )
+    logger.info(
+        "Imported %d chunks of %s from %s",
+        manifest["chunk_count"],
+        canonical_github_url,
+        path,
+    )
+    return manifest
+
+
+def _store_path(canonical_github_url: str) -> str | None:
+    """Location of a repository's snapshot in the store, None if no store is set."""
+    store = os.getenv(utils.SNAPSHOT_STORE_PATH)
+    if not store:
+        return None
+    return os.path.join(
+        store, collection_name_for(canonical_github_url) + SNAPSHOT_SUFFIX
+    )
+
+
+def publish_snapshot(canonical_github_url: str) -> dict[str, Any]:
+    """
+    Export a repository into the snapshot store, replacing any older snapshot.
+
+    Raises:
+        NotFound: If SNAPSHOT_STORE_PATH is not set or the repo isn't stored.
+    """
+    path = _store_path(canonical_github_url)
+    if path is None:
+        raise errors.NotFound.env_variable(utils.SNAPSHOT_STORE_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        manifest = export_snapshot(canonical_github_url, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return manifest
+
+
+def snapshot_store_enabled() -> bool:
+    """Whether a snapshot store is configured."""
+    return bool(os.getenv(utils.SNAPSHOT_STORE_PATH))
+
+
+def has_snapshot(canonical_github_url: str) -> bool:
+    """Whether the snapshot store holds a snapshot of a repository."""
+    path = _store_path(canonical_github_url)
+    return path is not None and os.path.isfile(path)
+
+
+def hydrate_from_store(canonical_github_url: str) -> dict[str, Any]:
+    """
+    Load a repository from the snapshot store.
+
+    Raises:
+        NotFound: If SNAPSHOT_STORE_PATH is not set or holds no snapshot of it.
+        SnapshotError: If the stored snapshot is not compatible.
+    """
+    path = _store_path(canonical_github_url)
+    if path is None:
+        raise errors.NotFound.env_variable(utils.SNAPSHOT_STORE_PATH)
+    if not os.path.isfile(path):
+        raise errors.NotFound.snapshot(canonical_github_url)
+    return import_snapshot(path)
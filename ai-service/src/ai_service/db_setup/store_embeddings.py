@@ -1,7 +1,13 @@
 import hashlib
+from typing import Any
 import numpy as np
 from ai_service import errors
-from ai_service.db_setup.setup import get_collection
+from ai_service.db_setup.setup import (
+    get_collection,
+    get_file_collection,
+    get_max_batch_size,
+)
+from ai_service.db_setup.vector_store import VectorCollection
 
 
 def _chunk_hash(chunk: str) -> str:
@@ -12,48 +18,110 @@ def _chunk_hash(chunk: str) -> str:
 def add_chunks(
     chunks: list[str],
     embeddings: list[list[float]],
+    metadatas: list[dict[str, Any]] | None = None,
+    expected_count: int | None = None,
 ) -> None:
     """
-    Add new code chunks and their embeddings to ChromaDB.
+    Add new code chunks and their embeddings to the vector store.
 
     Args:
         chunks: Code or text chunks to store.
         embeddings: Corresponding vector embeddings.
+        metadatas: Optional per-chunk metadata (e.g. the source file path).
+        expected_count: Total number of chunks the collection will hold, when
+            they are added in several calls; decides the backend in auto mode.
 
     Raises:
         DatabaseError: If database operation fails.
-        InvalidParam: If chunks and embeddings counts don't match.
+        InvalidParam: If chunks, embeddings or metadatas counts don't match.
     """
     if len(chunks) != len(embeddings):
         raise errors.InvalidParam.embeddings_count_mismatch()
+    if metadatas is not None and len(metadatas) != len(chunks):
+        raise errors.InvalidParam.metadatas_count_mismatch()
 
-    collection = get_collection()
+    collection = get_collection(
+        expected_count=len(chunks) if expected_count is None else expected_count
+    )
     try:
-        # Compute hashes for all chunks
-        ids = [_chunk_hash(chunk) for chunk in chunks]
-
-        # Check which IDs already exist
-        existing: set[str] = set()
-        if ids:
-            get_result = collection.get(ids=ids)
-            if "ids" in get_result:
-                existing = set(get_result["ids"])
-
-        # Filter out chunks that already exist
-        new_chunks: list[str] = []
-        new_embeddings: list[list[float]] = []
-        new_ids: list[str] = []
-        for chunk, embedding, id_ in zip(chunks, embeddings, ids):
-            if id_ not in existing:
-                new_chunks.append(chunk)
-                new_embeddings.append(embedding)
-                new_ids.append(id_)
-
-        if new_chunks:
-            collection.add(
-                documents=new_chunks,
-                embeddings=np.array(new_embeddings, dtype=np.float32),
-                ids=new_ids,
+        batch_size = get_max_batch_size(collection)
+        for start in range(0, len(chunks), batch_size):
+            end = start + batch_size
+            _add_batch(
+                collection,
+                chunks[start:end],
+                embeddings[start:end],
+                metadatas[start:end] if metadatas is not None else None,
+            )
+    except Exception as e:
+        raise errors.DatabaseError.add_chunks_failed(e) from e
+
+
+def _add_batch(
+    collection: VectorCollection,
+    chunks: list[str],
+    embeddings: list[list[float]],
+    metadatas: list[dict[str, Any]] | None,
+) -> None:
+    """Add one batch of chunks, skipping the ones already stored."""
+    # Compute hashes for all chunks
+    ids = [_chunk_hash(chunk) for chunk in chunks]
+
+    # Check which IDs already exist
+    existing: set[str] = set()
+    if ids:
+        get_result = collection.get(ids=ids, include=[])
+        if "ids" in get_result:
+            existing = set(get_result["ids"])
+
+    # Filter out chunks that already exist (or repeat within this batch)
+    new_indices: list[int] = []
+    for i, id_ in enumerate(ids):
+        if id_ not in existing:
+            existing.add(id_)
+            new_indices.append(i)
+
+    if new_indices:
+        collection.add(
+            documents=[chunks[i] for i in new_indices],
+            embeddings=np.array([embeddings[i] for i in new_indices], dtype=np.float32),
+            metadatas=[metadatas[i] for i in new_indices] if metadatas else None,
+            ids=[ids[i] for i in new_indices],
+        )
+
+
+def add_file_summaries(
+    file_paths: list[str],
+    embeddings: list[list[float]],
+) -> None:
+    """
+    Store one summary vector per source file in the file-level collection.
+
+    Existing summaries for the same paths are replaced, so re-ingesting a
+    repository keeps the file index in sync with its chunks.
+
+    Args:
+        file_paths: Repository-relative file paths.
+        embeddings: One summary vector per file.
+
+    Raises:
+        DatabaseError: If database operation fails.
+        InvalidParam: If file paths and embeddings counts don't match.
+    """
+    if len(file_paths) != len(embeddings):
+        raise errors.InvalidParam.embeddings_count_mismatch()
+
+    collection = get_file_collection()
+    try:
+        batch_size = get_max_batch_size(collection)
+        for start in range(0, len(file_paths), batch_size):
+            batch_paths = file_paths[start : start + batch_size]
+            collection.upsert(
+                ids=batch_paths,
+                embeddings=np.array(
+                    embeddings[start : start + batch_size], dtype=np.float32
+                ),
+                metadatas=[{"file_path": path} for path in batch_paths],
             )
     except Exception as e:
         raise errors.DatabaseError.add_chunks_failed(e) from e
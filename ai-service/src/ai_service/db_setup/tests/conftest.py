@@ -0,0 +1,32 @@
+"""
+Configuration for database unit tests.
+Initializes ChromaDB in a temporary directory; no embedding model is needed.
+"""
+
+from typing import Generator
+import os
+import re
+from unittest.mock import patch
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def setup_db(tmp_path_factory: pytest.TempPathFactory) -> Generator[None, None, None]:
+    """Initialize ChromaDB once for all tests in this module."""
+    store_path = str(tmp_path_factory.mktemp("chroma_store"))
+    with patch.dict(os.environ, {"CHROMA_STORE_PATH": store_path}):
+        from ai_service.db_setup import initialize_db
+
+        initialize_db()
+        yield
+
+
+@pytest.fixture(autouse=True)
+def repo_context(request: pytest.FixtureRequest) -> str:
+    """Give every test its own repository collection."""
+    from ai_service.db_setup import set_repo_context
+
+    test_name = re.sub(r"[^a-zA-Z0-9_-]", "-", request.node.name)
+    test_repo_url = f"https://github.com/test/{test_name}.git"
+    set_repo_context(test_repo_url)
+    return test_repo_url
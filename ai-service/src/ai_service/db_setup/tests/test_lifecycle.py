@@ -0,0 +1,207 @@
+"""
+Tests for collection bookkeeping, versioned ingests, deletion and eviction.
+"""
+
+import contextvars
+import fcntl
+
+import pytest
+from ai_service.db_setup import (
+    add_chunks,
+    collect_retired,
+    delete_repo,
+    evict_collections,
+    get_collection,
+    is_evicted,
+    list_collections,
+    query_chunks,
+    record_ingest,
+    set_repo_context,
+    staged_ingest,
+)
+from ai_service.db_setup import registry, setup
+
+REPOS = [f"https://github.com/test/lifecycle-{i}.git" for i in range(3)]
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    yield
+    for repo in REPOS:
+        delete_repo(repo)
+
+
+def _ingest(repo_url: str, chunks: int = 2) -> str:
+    with staged_ingest(repo_url):
+        add_chunks(
+            [f"def f{i}(): return {i}" for i in range(chunks)],
+            [[1.0, float(i)] for i in range(chunks)],
+        )
+        record_ingest(dimension=2)
+    set_repo_context(repo_url)
+    return _registry_key(repo_url)
+
+
+def _registry_key(repo_url: str) -> str:
+    return setup.collection_name_for(repo_url)
+
+
+def _exists(collection_name: str) -> bool:
+    return (
+        setup._numpy_exists(collection_name) or setup._chroma_count(collection_name) > 0
+    )
+
+
+class TestBookkeeping:
+    def test_ingest_records_size_and_count(self):
+        name = _ingest(REPOS[0], chunks=3)
+
+        entry = list_collections()[name]
+        assert entry["canonical_github_url"] == REPOS[0]
+        assert entry["chunk_count"] == 3
+        assert entry["size_bytes"] > 0
+        assert entry["last_query"] is None
+
+    def test_query_updates_last_query(self):
+        name = _ingest(REPOS[0])
+
+        query_chunks([1.0, 0.0], number_of_results=1)
+
+        assert list_collections()[name]["last_query"] is not None
+
+    def test_delete_removes_data_and_entry(self):
+        name = _ingest(REPOS[0])
+
+        assert delete_repo(REPOS[0]) is True
+        assert name not in list_collections()
+        set_repo_context(REPOS[0])
+        assert get_collection().count() == 0
+        assert delete_repo(REPOS[0]) is False
+
+
+class TestEviction:
+    def test_evicts_least_recently_queried(self, monkeypatch: pytest.MonkeyPatch):
+        names = [_ingest(repo) for repo in REPOS]
+        # Force an explicit order of recency instead of relying on timestamps
+        with registry._locked_update() as entries:
+            for age, name in enumerate(names):
+                entries[name]["last_query"] = 1000.0 - age
+        monkeypatch.setenv("MAX_COLLECTIONS", "1")
+
+        evicted = evict_collections()
+
+        assert set(evicted) >= {names[1], names[2]}
+        assert names[0] not in evicted
+        assert is_evicted(REPOS[2])
+        assert not is_evicted(REPOS[0])
+        set_repo_context(REPOS[2])
+        assert get_collection().count() == 0
+
+    def test_reingest_clears_tombstone(self, monkeypatch: pytest.MonkeyPatch):
+        _ingest(REPOS[0])
+        monkeypatch.setenv("MAX_STORE_BYTES", "1")
+        evict_collections()
+        assert is_evicted(REPOS[0])
+
+        monkeypatch.delenv("MAX_STORE_BYTES")
+        _ingest(REPOS[0])
+
+        assert not is_evicted(REPOS[0])
+
+    def test_reingest_during_eviction_is_kept(self, monkeypatch: pytest.MonkeyPatch):
+        name = _ingest(REPOS[0])
+        snapshot = registry.list_entries()
+        # Re-ingested after the evictor read the registry, before it evicts
+        _ingest(REPOS[0], chunks=3)
+        monkeypatch.setattr(registry, "list_entries", lambda: snapshot)
+        monkeypatch.setenv("MAX_STORE_BYTES", "1")
+
+        assert evict_collections() == []
+
+        assert not is_evicted(REPOS[0])
+        assert _exists(list_collections()[name]["active"])
+        set_repo_context(REPOS[0])
+        assert get_collection().count() == 3
+
+    def test_no_quota_evicts_nothing(self):
+        _ingest(REPOS[0])
+
+        assert evict_collections() == []
+
+
+class TestStagedIngest:
+    def test_queries_see_old_version_until_swap(self):
+        _ingest(REPOS[0], chunks=1)
+
+        with staged_ingest(REPOS[0]):
+            add_chunks(["def new(): pass"], [[0.0, 1.0]])
+            # Another request (fresh context) still reads the live version
+            assert _read_documents_elsewhere(REPOS[0]) == ["def f0(): return 0"]
+            record_ingest(dimension=2)
+
+        assert _read_documents_elsewhere(REPOS[0]) == ["def new(): pass"]
+
+    def test_failed_ingest_keeps_live_version(self):
+        _ingest(REPOS[0], chunks=1)
+        live = list_collections()[_registry_key(REPOS[0])]["active"]
+
+        with pytest.raises(RuntimeError):
+            with staged_ingest(REPOS[0]) as staging:
+                add_chunks(["def half(): pass"], [[0.0, 1.0]])
+                raise RuntimeError("ingest failed")
+
+        assert list_collections()[_registry_key(REPOS[0])]["active"] == live
+        assert not _exists(staging)
+        assert _read_documents_elsewhere(REPOS[0]) == ["def f0(): return 0"]
+
+    def test_resumable_ingest_continues_in_the_same_version(self):
+        with pytest.raises(RuntimeError):
+            with staged_ingest(REPOS[0], resumable=True) as staging:
+                add_chunks(["def first(): pass"], [[1.0, 0.0]])
+                raise RuntimeError("process died")
+        assert _exists(staging)
+        assert _registry_key(REPOS[0]) not in list_collections()
+
+        with staged_ingest(REPOS[0], staging=staging, resumable=True):
+            add_chunks(["def second(): pass"], [[0.0, 1.0]])
+            record_ingest(dimension=2)
+
+        assert list_collections()[_registry_key(REPOS[0])]["active"] == staging
+        assert sorted(_read_documents_elsewhere(REPOS[0])) == [
+            "def first(): pass",
+            "def second(): pass",
+        ]
+
+    def test_retired_version_collected_after_grace(self):
+        _ingest(REPOS[0])
+        old = list_collections()[_registry_key(REPOS[0])]["active"]
+        _ingest(REPOS[0])
+
+        assert collect_retired() == []
+        assert _exists(old)
+
+        assert old in collect_retired(grace_seconds=0)
+        assert not _exists(old)
+        set_repo_context(REPOS[0])
+        assert get_collection().count() == 2
+
+
+class TestMaintenanceLock:
+    def test_only_one_holder(self):
+        assert registry.hold_maintenance_lock()
+        assert registry.hold_maintenance_lock()  # kept once taken
+
+        # Another process (here: another open file) can't take it
+        with open(f"{registry._get_path()}.maintenance.lock", "w") as other:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def _read_documents_elsewhere(repo_url: str) -> list[str]:
+    """Read all documents of a repo the way a concurrent request would."""
+
+    def read() -> list[str]:
+        set_repo_context(repo_url)
+        return get_collection().get()["documents"]
+
+    return contextvars.Context().run(read)
@@ -0,0 +1,160 @@
+"""
+Tests for the memory-mapped NumPy vector backend and backend selection.
+"""
+
+import numpy as np
+import pytest
+from ai_service.db_setup import (
+    add_chunks,
+    get_collection,
+    query_chunks,
+    set_repo_context,
+)
+from ai_service.db_setup import numpy_store
+from ai_service.db_setup.numpy_store import NumpyCollection
+
+
+@pytest.fixture
+def collection(tmp_path) -> NumpyCollection:
+    return NumpyCollection(str(tmp_path / "repo"), "repo")
+
+
+def _unit(*values: float) -> list[float]:
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class TestNumpyCollection:
+    def test_query_returns_exact_top_k_in_order(self, collection: NumpyCollection):
+        collection.add(
+            ids=["a", "b", "c"],
+            embeddings=[_unit(1, 0), _unit(1, 1), _unit(0, 1)],
+            documents=["doc a", "doc b", "doc c"],
+        )
+
+        result = collection.query(query_embeddings=[_unit(1, 0.1)], n_results=2)
+
+        assert result["ids"] == [["a", "b"]]
+        assert result["documents"] == [["doc a", "doc b"]]
+        assert result["distances"][0][0] < result["distances"][0][1]
+
+    def test_distances_match_l2_on_unit_vectors(self, collection: NumpyCollection):
+        vector = _unit(3, 4)
+        collection.add(ids=["a"], embeddings=[vector])
+
+        result = collection.query(query_embeddings=[_unit(4, 3)], n_results=1)
+
+        expected = float(np.sum((np.array(vector) - np.array(_unit(4, 3))) ** 2))
+        assert result["distances"][0][0] == pytest.approx(expected, abs=1e-5)
+
+    def test_multiple_queries_in_one_call(self, collection: NumpyCollection):
+        collection.add(ids=["a", "b"], embeddings=[_unit(1, 0), _unit(0, 1)])
+
+        result = collection.query(
+            query_embeddings=[_unit(0, 1), _unit(1, 0)], n_results=1
+        )
+
+        assert result["ids"] == [["b"], ["a"]]
+
+    def test_where_filter_restricts_candidates(self, collection: NumpyCollection):
+        collection.add(
+            ids=["a", "b"],
+            embeddings=[_unit(1, 0), _unit(0.9, 0.1)],
+            metadatas=[{"file_path": "a.py"}, {"file_path": "b.py"}],
+        )
+
+        result = collection.query(
+            query_embeddings=[_unit(1, 0)],
+            n_results=2,
+            where={"file_path": {"$in": ["b.py"]}},
+        )
+
+        assert result["ids"] == [["b"]]
+
+    def test_add_ignores_existing_ids_and_upsert_replaces(
+        self, collection: NumpyCollection
+    ):
+        collection.add(ids=["a"], embeddings=[_unit(1, 0)], documents=["old"])
+        collection.add(ids=["a"], embeddings=[_unit(0, 1)], documents=["ignored"])
+        assert collection.get(ids=["a"])["documents"] == ["old"]
+
+        collection.upsert(ids=["a"], embeddings=[_unit(0, 1)], documents=["new"])
+        assert collection.get(ids=["a"])["documents"] == ["new"]
+        assert collection.count() == 1
+
+    def test_persists_and_reloads_memory_mapped(self, tmp_path):
+        path = str(tmp_path / "repo")
+        NumpyCollection(path, "repo").add(
+            ids=["a", "b"], embeddings=[_unit(1, 0), _unit(0, 1)], documents=["x", "y"]
+        )
+
+        reopened = NumpyCollection(path, "repo")
+
+        assert reopened.count() == 2
+        assert isinstance(reopened._vectors, np.memmap)
+        assert reopened.query(query_embeddings=[_unit(0, 1)], n_results=1)["ids"] == [
+            ["b"]
+        ]
+
+    def test_delete_and_empty_query(self, collection: NumpyCollection):
+        collection.add(ids=["a", "b"], embeddings=[_unit(1, 0), _unit(0, 1)])
+        collection.delete(ids=["a", "b"])
+
+        assert collection.count() == 0
+        assert collection.query(query_embeddings=[_unit(1, 0)], n_results=3)["ids"] == [
+            []
+        ]
+
+    def test_writers_sharing_a_directory_lose_nothing(self, tmp_path):
+        path = str(tmp_path / "repo")
+        # Two handles on one directory stand in for two worker processes
+        first = NumpyCollection(path, "repo")
+        second = NumpyCollection(path, "repo")
+
+        first.add(ids=["a"], embeddings=[_unit(1, 0)])
+        second.add(ids=["b"], embeddings=[_unit(0, 1)])
+        first.add(ids=["c"], embeddings=[_unit(1, 1)])
+
+        assert sorted(NumpyCollection(path, "repo").get()["ids"]) == ["a", "b", "c"]
+
+    def test_superseded_files_outlive_the_grace_period(
+        self, tmp_path, monkeypatch: pytest.MonkeyPatch
+    ):
+        path = tmp_path / "repo"
+        collection = NumpyCollection(str(path), "repo")
+        collection.add(ids=["a"], embeddings=[_unit(1, 0)])
+        reader = NumpyCollection(str(path), "repo")
+        collection.add(ids=["b"], embeddings=[_unit(0, 1)])
+
+        # Still mapped by the reader, which hasn't refreshed yet
+        assert len(list(path.glob("vectors-*.npy"))) == 2
+        assert reader._ids == ["a"]
+
+        monkeypatch.setattr(numpy_store, "RETIRED_GRACE_SECONDS", 0)
+        collection.add(ids=["c"], embeddings=[_unit(1, 1)])
+
+        assert len(list(path.glob("vectors-*.npy"))) == 1
+        assert reader.count() == 3
+
+
+class TestBackendSelection:
+    def test_numpy_backend_serves_add_and_query(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+        add_chunks(["def a(): pass", "def b(): pass"], [_unit(1, 0), _unit(0, 1)])
+
+        assert isinstance(get_collection(), NumpyCollection)
+        documents = query_chunks(_unit(0, 1), number_of_results=1)["documents"]
+        assert documents == [["def b(): pass"]]
+
+    def test_auto_backend_picks_by_collection_size(
+        self, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("VECTOR_BACKEND", "auto")
+        monkeypatch.setenv("NUMPY_BACKEND_MAX_CHUNKS", "2")
+
+        assert isinstance(get_collection(expected_count=2), NumpyCollection)
+        # Existing collections stay on the backend they were created on
+        assert isinstance(get_collection(expected_count=3), NumpyCollection)
+
+        set_repo_context("https://github.com/test/auto-backend-large.git")
+        assert not isinstance(get_collection(expected_count=3), NumpyCollection)
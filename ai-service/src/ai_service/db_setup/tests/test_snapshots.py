@@ -0,0 +1,129 @@
+"""
+Tests for snapshot export/import and hydration from a local snapshot store.
+"""
+
+import numpy as np
+import pytest
+from ai_service import errors
+from ai_service.db_setup import (
+    add_chunks,
+    add_file_summaries,
+    delete_repo,
+    export_snapshot,
+    get_collection,
+    has_snapshot,
+    hydrate_from_store,
+    import_snapshot,
+    is_stored,
+    list_collections,
+    publish_snapshot,
+    query_chunks,
+    query_files,
+    record_ingest,
+    set_repo_context,
+)
+from ai_service.db_setup import setup
+
+REPO = "https://github.com/test/snapshot-repo.git"
+
+
+@pytest.fixture(autouse=True)
+def ingested_repo():
+    set_repo_context(REPO)
+    add_chunks(
+        ["def a(): pass", "def b(): pass", "class C: pass"],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+        [{"file_path": "a.py"}, {"file_path": "b.py"}, {"file_path": "c.py"}],
+    )
+    add_file_summaries(
+        ["a.py", "b.py", "c.py"],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]],
+    )
+    record_ingest(dimension=3, commit_sha="abc123")
+    yield
+    delete_repo(REPO)
+
+
+def test_round_trip_restores_chunks_without_embedding(tmp_path):
+    path = str(tmp_path / "repo.snapshot.npz")
+    manifest = export_snapshot(REPO, path)
+    delete_repo(REPO)
+    set_repo_context(REPO)
+    assert get_collection().count() == 0
+
+    restored = import_snapshot(path)
+
+    assert restored == manifest
+    assert manifest["commit_sha"] == "abc123"
+    assert manifest["chunk_count"] == 3
+    set_repo_context(REPO)
+    results = query_chunks([0.0, 1.0, 0.0], number_of_results=1)
+    assert results["documents"] == [["def b(): pass"]]
+    assert results["metadatas"] == [[{"file_path": "b.py"}]]
+    assert query_files([0.0, 0.0, 1.0], number_of_files=1) == ["c.py"]
+    assert is_stored(REPO)
+
+
+def test_vectors_are_stored_as_contiguous_float32(tmp_path):
+    path = str(tmp_path / "repo.snapshot.npz")
+    export_snapshot(REPO, path)
+
+    with np.load(path) as data:
+        vectors = data["vectors"]
+    assert vectors.dtype == np.float32
+    assert vectors.shape == (3, 3)
+    assert vectors.flags["C_CONTIGUOUS"]
+
+
+def test_hydrate_from_store(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "store"))
+    assert not has_snapshot(REPO)
+    publish_snapshot(REPO)
+    assert has_snapshot(REPO)
+    delete_repo(REPO)
+    assert not is_stored(REPO)
+
+    hydrate_from_store(REPO)
+
+    assert is_stored(REPO)
+    entry = next(iter(list_collections().values()))
+    assert entry["chunk_count"] == 3
+    assert entry["commit_sha"] == "abc123"
+
+
+def test_export_of_unknown_repository_creates_nothing(tmp_path):
+    unknown = "https://github.com/test/never-ingested.git"
+
+    with pytest.raises(errors.NotFound):
+        export_snapshot(unknown, str(tmp_path / "unknown.snapshot.npz"))
+
+    name = setup.collection_name_for(unknown)
+    assert not setup._numpy_exists(name)
+    assert name not in [c.name for c in setup._get_client().list_collections()]
+
+
+def test_hydrate_without_snapshot_raises(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "empty"))
+
+    with pytest.raises(errors.NotFound):
+        hydrate_from_store(REPO)
+
+
+def test_import_rejects_other_embedding_model(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    path = str(tmp_path / "repo.snapshot.npz")
+    monkeypatch.setenv("EMBEDDING_MODEL", "model-a")
+    export_snapshot(REPO, path)
+    monkeypatch.setenv("EMBEDDING_MODEL", "model-b")
+
+    with pytest.raises(errors.SnapshotError):
+        import_snapshot(path)
+
+
+def test_import_rejects_invalid_file(tmp_path):
+    path = tmp_path / "broken.snapshot.npz"
+    path.write_bytes(b"not a snapshot")
+
+    with pytest.raises(errors.SnapshotError):
+        import_snapshot(str(path))
@@ -0,0 +1,95 @@
+"""
+Tests for the file-level index and two-stage chunk retrieval.
+"""
+
+import pytest
+from ai_service import errors
+from ai_service.db_setup import (
+    add_chunks,
+    add_file_summaries,
+    get_file_collection,
+    query_chunks,
+    query_chunks_batch,
+    query_files,
+)
+from ai_service.embeddings import pool_embeddings
+
+
+def _store_two_files() -> None:
+    chunks = ["auth chunk 1", "auth chunk 2", "db chunk 1", "db chunk 2"]
+    embeddings = [
+        [1.0, 0.0, 0.0],
+        [0.9, 0.1, 0.0],
+        [0.0, 1.0, 0.0],
+        [0.1, 0.9, 0.0],
+    ]
+    metadatas = [
+        {"file_path": "auth.py"},
+        {"file_path": "auth.py"},
+        {"file_path": "db.py"},
+        {"file_path": "db.py"},
+    ]
+    add_chunks(chunks, embeddings, metadatas)
+    add_file_summaries(
+        ["auth.py", "db.py"],
+        [pool_embeddings(embeddings[:2]), pool_embeddings(embeddings[2:])],
+    )
+
+
+class TestFileIndex:
+    def test_query_files_ranks_closest_file_first(self):
+        _store_two_files()
+        assert query_files([0.0, 1.0, 0.0], number_of_files=2) == ["db.py", "auth.py"]
+
+    def test_query_files_without_index_is_empty(self):
+        assert query_files([1.0, 0.0, 0.0]) == []
+
+    def test_file_summaries_are_replaced_on_reingest(self):
+        _store_two_files()
+        _store_two_files()
+        assert get_file_collection().count() == 2
+
+    def test_rejects_metadatas_count_mismatch(self):
+        with pytest.raises(errors.InvalidParam):
+            add_chunks(["a", "b"], [[1.0], [0.5]], [{"file_path": "a.py"}])
+
+
+class TestTwoStageQuery:
+    def test_restricts_chunks_to_candidate_files(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("TWO_STAGE_MIN_CHUNKS", "1")
+        monkeypatch.setenv("TWO_STAGE_TOP_FILES", "1")
+        _store_two_files()
+
+        results = query_chunks([1.0, 0.0, 0.0], number_of_results=4)
+
+        assert results["metadatas"] is not None
+        assert {m["file_path"] for m in results["metadatas"][0]} == {"auth.py"}
+
+    def test_flat_search_when_disabled(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("TWO_STAGE_MIN_CHUNKS", "0")
+        _store_two_files()
+
+        results = query_chunks([1.0, 0.0, 0.0], number_of_results=4)
+
+        assert results["documents"] is not None
+        assert len(results["documents"][0]) == 4
+
+
+class TestBatchQuery:
+    @pytest.mark.parametrize("min_chunks", ["0", "1"])
+    def test_one_result_row_per_query(
+        self, monkeypatch: pytest.MonkeyPatch, min_chunks: str
+    ):
+        monkeypatch.setenv("TWO_STAGE_MIN_CHUNKS", min_chunks)
+        monkeypatch.setenv("TWO_STAGE_TOP_FILES", "1")
+        _store_two_files()
+
+        results = query_chunks_batch(
+            [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], number_of_results=1
+        )
+
+        assert results["documents"] == [["auth chunk 1"], ["db chunk 1"]]
+
+    def test_rejects_empty_batch(self):
+        with pytest.raises(errors.InvalidParam):
+            query_chunks_batch([])
@@ -0,0 +1,59 @@
+from typing import Any, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class VectorCollection(Protocol):
+    """
+    The subset of the ChromaDB collection API the service relies on.
+
+    Every vector-store backend returns collections implementing this protocol,
+    so `add_chunks`, `query_chunks` and callers of `get_collection` work the
+    same regardless of where vectors are stored. Results use ChromaDB's
+    `GetResult` / `QueryResult` dictionary layout.
+    """
+
+    @property
+    def name(self) -> str: ...
+
+    def count(self) -> int: ...
+
+    def add(
+        self,
+        ids: list[str],
+        embeddings: Any,
+        documents: list[str] | None = None,
+        metadatas: list[dict[str, Any]] | None = None,
+    ) -> None: ...
+
+    def upsert(
+        self,
+        ids: list[str],
+        embeddings: Any,
+        documents: list[str] | None = None,
+        metadatas: list[dict[str, Any]] | None = None,
+    ) -> None: ...
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        include: list[Any] = ...,
+    ) -> Any: ...
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: dict[str, Any] | None = None,
+        include: list[Any] = ...,
+    ) -> Any: ...
+
+    def peek(self, limit: int = 10) -> Any: ...
+
+    def delete(
+        self,
+        ids: list[str] | None = None,
+        where: dict[str, Any] | None = None,
+    ) -> None: ...
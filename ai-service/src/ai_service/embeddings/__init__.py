@@ -8,17 +8,29 @@ optimized for code understanding and supports efficient batch processing.
 Main Functions:
 - embed_documents: Convert code/text documents into embeddings
 - embed_query: Convert user queries into embeddings
+- embed_queries: Convert several user queries into embeddings in one batch
+- pool_embeddings: Combine several embeddings into one summary vector
+- count_tokens: Measure text length in tokens
 - get_model: Access the underlying transformer model
 
 See README.md for detailed information about the embedding model and architecture.
 """
 
-from .encoding import embed_documents, embed_query
+from .encoding import (
+    embed_documents,
+    embed_query,
+    embed_queries,
+    pool_embeddings,
+    count_tokens,
+)
 from .transformer import get_model, initialize_model
 
 __all__ = [
     "embed_documents",
     "embed_query",
+    "embed_queries",
+    "pool_embeddings",
+    "count_tokens",
     "get_model",
     "initialize_model",
 ]
@@ -1,37 +1,40 @@
 import logging
-from typing import cast
-from sentence_transformers import SentenceTransformer
-from ai_service import errors
+from typing import TYPE_CHECKING, cast
+import numpy as np
+from ai_service import errors, metrics
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+from . import ipc
 from .transformer import get_model
 
 
 logger = logging.getLogger(__name__)
 
 
-def _encode_texts(
+def encode_array(
+    model: "SentenceTransformer",
     texts: list[str],
     *,
     is_query: bool = False,
-) -> list[list[float]]:
+) -> np.ndarray:
     """
-    Internal function to create embeddings for a list of texts.
-    Uses appropriate encoding methods based on context (query vs document).
+    Run a model over texts, picking the encoding method for queries or documents.
+
+    Shared by the local path and the embedding server.
 
     Args:
+        model: The sentence transformer to encode with.
         texts: A list of strings to embed.
         is_query: Whether these are search queries (True) or documents (False).
 
     Returns:
-        A list of embeddings (each embedding is a list of floats).
+        A float32 array with one normalized embedding per text.
 
     Raises:
-        EmbeddingError: If list of texts is empty, contains only empty strings, or encoding fails.
+        EmbeddingError: If encoding fails.
     """
-    if not texts or all(not text.strip() for text in texts):
-        raise errors.EmbeddingError.empty_input()
-    model: SentenceTransformer = get_model()
-
     embeddings = None
     try:
         # Use appropriate encoding method based on context
@@ -58,12 +61,41 @@ def _encode_texts(
                 convert_to_numpy=True,
                 normalize_embeddings=True,
             )
-        return cast(list[list[float]], embeddings.tolist())  # type: ignore
+        return np.asarray(embeddings, dtype=np.float32)
 
     except Exception as e:
         raise errors.EmbeddingError(f"Failed to encode texts: {e}") from e
 
 
+def _encode_texts(
+    texts: list[str],
+    *,
+    is_query: bool = False,
+) -> list[list[float]]:
+    """
+    Internal function to create embeddings for a list of texts.
+    Uses appropriate encoding methods based on context (query vs document),
+    on the embedding server when one is configured, else on the local model.
+
+    Args:
+        texts: A list of strings to embed.
+        is_query: Whether these are search queries (True) or documents (False).
+
+    Returns:
+        A list of embeddings (each embedding is a list of floats).
+
+    Raises:
+        EmbeddingError: If list of texts is empty, contains only empty strings, or encoding fails.
+    """
+    if not texts or all(not text.strip() for text in texts):
+        raise errors.EmbeddingError.empty_input()
+    if ipc.is_enabled():
+        embeddings = ipc.encode(texts, is_query)
+    else:
+        embeddings = encode_array(get_model(), texts, is_query=is_query)
+    return cast(list[list[float]], embeddings.tolist())
+
+
 def embed_documents(texts: list[str]) -> list[list[float]]:
     """
     Create embeddings for document texts (used during ingestion).
@@ -74,7 +106,8 @@ def embed_documents(texts: list[str]) -> list[list[float]]:
     Returns:
         A list of embeddings (each embedding is a list of floats).
     """
-    return _encode_texts(texts, is_query=False)
+    with metrics.timed("embed"):
+        return _encode_texts(texts, is_query=False)
 
 
 def embed_query(text: str) -> list[float]:
@@ -88,4 +121,63 @@ def embed_query(text: str) -> list[float]:
         A list of floats representing the query embedding.
     """
 
-    return _encode_texts([text], is_query=True)[0]
+    with metrics.timed("query_embed"):
+        return _encode_texts([text], is_query=True)[0]
+
+
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    """
+    Create embeddings for several search queries in one encoder call.
+
+    Args:
+        texts: Search query strings to embed.
+
+    Returns:
+        One embedding per query, in order.
+    """
+    with metrics.timed("query_embed"):
+        return _encode_texts(texts, is_query=True)
+
+
+def pool_embeddings(embeddings: list[list[float]]) -> list[float]:
+    """
+    Average several embeddings into a single unit-length vector.
+
+    Used to build file-level summary vectors from the chunk embeddings of a
+    file without running the encoder again.
+
+    Args:
+        embeddings: Non-empty list of embeddings of the same dimension.
+
+    Returns:
+        The normalized mean embedding.
+
+    Raises:
+        EmbeddingError: If the list of embeddings is empty.
+    """
+    if not embeddings:
+        raise errors.EmbeddingError.empty_input()
+    mean = np.asarray(embeddings, dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    if norm > 0:
+        mean /= norm
+    return cast(list[float], mean.tolist())
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the embedding model's tokenizer.
+
+    Used to size LLM prompts. It is not the LLM's own tokenizer, but subword
+    counts track each other far better than character counts do.
+
+    Args:
+        text: Text to measure.
+
+    Returns:
+        Number of tokens, without special tokens.
+    """
+    if ipc.is_enabled():
+        return ipc.count_tokens(text)
+    tokenizer = get_model().tokenizer
+    return len(tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
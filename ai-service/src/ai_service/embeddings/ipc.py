@@ -0,0 +1,130 @@
+"""
+Client of the embedding server (see server.py) over a Unix socket.
+
+When EMBEDDING_SERVER_SOCKET is set, embed_query/embed_documents/count_tokens
+send their texts to the embedding server instead of running a local model.
+
+Every message is a fixed-size prefix with the lengths of a JSON header and a
+binary payload, then both. Embeddings travel as raw float32 bytes: the server
+writes the array's buffer as is, and the client reads it into one buffer
+that `np.frombuffer` wraps without copying.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+from typing import Any
+
+import numpy as np
+
+from ai_service import errors, utils
+
+# Lengths of the JSON header and of the binary payload that follow
+_PREFIX = struct.Struct("!II")
+
+_local = threading.local()
+
+
+def is_enabled() -> bool:
+    return bool(os.getenv(utils.EMBEDDING_SERVER_SOCKET))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed mid-message")
+        received += count
+    return buffer
+
+
+def send_message(
+    sock: socket.socket,
+    header: dict[str, Any],
+    payload: bytes | memoryview = b"",
+) -> None:
+    """Send a header and an optional binary payload."""
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(_PREFIX.pack(len(data), len(payload)) + data)
+    if len(payload):
+        sock.sendall(payload)
+
+
+def recv_message(sock: socket.socket) -> tuple[dict[str, Any], bytearray] | None:
+    """Receive a header and its payload, or None if the peer closed the connection."""
+    first = sock.recv(_PREFIX.size, socket.MSG_WAITALL)
+    if not first:
+        return None
+    if len(first) < _PREFIX.size:
+        raise ConnectionError("Connection closed mid-message")
+    header_size, payload_size = _PREFIX.unpack(first)
+    header = json.loads(_recv_exact(sock, header_size))
+    return header, _recv_exact(sock, payload_size)
+
+
+def _connection() -> socket.socket:
+    """This thread's connection to the server, opened on first use."""
+    sock = getattr(_local, "sock", None)
+    if sock is None:
+        path = utils.get_env_var(utils.EMBEDDING_SERVER_SOCKET)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            sock.close()
+            raise errors.EmbeddingError.server_unavailable(path, e) from e
+        _local.sock = sock
+    return sock
+
+
+def _close() -> None:
+    sock = getattr(_local, "sock", None)
+    if sock is not None:
+        sock.close()
+        _local.sock = None
+
+
+def _request(header: dict[str, Any]) -> tuple[dict[str, Any], bytearray]:
+    """Send a request and return the reply, reconnecting once if the server restarted."""
+    for attempt in range(2):
+        sock = _connection()
+        try:
+            send_message(sock, header)
+            reply = recv_message(sock)
+            if reply is None:
+                raise ConnectionError("Embedding server closed the connection")
+        except OSError as e:
+            _close()
+            if attempt:
+                path = os.getenv(utils.EMBEDDING_SERVER_SOCKET, "")
+                raise errors.EmbeddingError.server_unavailable(path, e) from e
+            continue
+        response, payload = reply
+        if not response.get("ok"):
+            raise errors.EmbeddingError.server_failed(response.get("error", ""))
+        return response, payload
+    raise AssertionError("unreachable")
+
+
+def encode(texts: list[str], is_query: bool) -> np.ndarray:
+    """
+    Embed texts on the embedding server.
+
+    Queries are served before any queued document embeddings.
+
+    Returns:
+        A float32 array with one row per text, viewing the received bytes.
+    """
+    response, payload = _request({"op": "encode", "texts": texts, "query": is_query})
+    return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens of a text, counted by the server's tokenizer."""
+    response, _ = _request({"op": "count_tokens", "text": text})
+    return int(response["tokens"])
@@ -0,0 +1,255 @@
+"""
+Embedding server: one process holding the embedding model for all API workers.
+
+API workers started with EMBEDDING_SERVER_SOCKET send their texts here over a
+Unix socket (see ipc.py) instead of each loading the model. Run it with
+`python -m ai_service.embeddings.server` and the same EMBEDDING_SERVER_SOCKET.
+
+A single encoder thread runs the model, fed by two queues:
+
+- queries, of interactive /answer requests, are always served first, and the
+  queries waiting at a time are encoded in one forward pass;
+- documents, of bulk /ingest runs, are split into pieces of
+  EMBEDDING_SERVER_DOCUMENT_BATCH texts, so a query arriving mid-ingestion
+  waits for at most one piece, not for the whole job.
+"""
+
+import copy
+import logging
+import os
+import signal
+import socketserver
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from ai_service import errors, utils
+
+from . import ipc
+from .encoding import encode_array
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOCUMENT_BATCH = 64
+DEFAULT_QUERY_BATCH = 32
+
+
+@dataclass
+class _Job:
+    """Texts of one request, encoded piece by piece."""
+
+    texts: list[str]
+    is_query: bool
+    pieces: list[np.ndarray | None] = field(default_factory=list)
+    remaining: int = 0
+    error: str | None = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def finish_piece(self, index: int, embeddings: np.ndarray) -> None:
+        self.pieces[index] = embeddings
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.done.set()
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self.done.set()
+
+    def result(self) -> np.ndarray:
+        pieces = [piece for piece in self.pieces if piece is not None]
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+
+@dataclass
+class _Piece:
+    job: _Job
+    index: int
+    texts: list[str]
+
+
+class EmbeddingQueue:
+    """Queries-first queues in front of a single encoder thread."""
+
+    def __init__(
+        self,
+        model: "SentenceTransformer",
+        document_batch: int = DEFAULT_DOCUMENT_BATCH,
+        query_batch: int = DEFAULT_QUERY_BATCH,
+    ):
+        self.model = model
+        self.document_batch = max(1, document_batch)
+        self.query_batch = max(1, query_batch)
+        self._queries: deque[_Piece] = deque()
+        self._documents: deque[_Piece] = deque()
+        self._ready = threading.Condition()
+        self._stopping = False
+        self._encoder = threading.Thread(
+            target=self._encode_loop, name="embedding-encoder", daemon=True
+        )
+        # Fast tokenizers refuse concurrent use, and the encoder thread uses
+        # the model's own; token counts get a copy, shared under a lock
+        self._tokenizer = copy.deepcopy(model.tokenizer)
+        self._tokenizer_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._encoder.start()
+
+    def stop(self) -> None:
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+        self._encoder.join()
+
+    def encode(self, texts: list[str], is_query: bool) -> np.ndarray:
+        """Queue texts and wait for their embeddings."""
+        if not texts or all(not text.strip() for text in texts):
+            raise errors.EmbeddingError.empty_input()
+        job = _Job(texts, is_query)
+        size = self.query_batch if is_query else self.document_batch
+        pieces = [
+            _Piece(job, index, texts[start : start + size])
+            for index, start in enumerate(range(0, len(texts), size))
+        ]
+        job.pieces = [None] * len(pieces)
+        job.remaining = len(pieces)
+        with self._ready:
+            (self._queries if is_query else self._documents).extend(pieces)
+            self._ready.notify()
+        job.done.wait()
+        if job.error is not None:
+            raise errors.EmbeddingError(job.error)
+        return job.result()
+
+    def count_tokens(self, text: str) -> int:
+        with self._tokenizer_lock:
+            encoded = self._tokenizer(text, add_special_tokens=False, verbose=False)
+        return len(encoded["input_ids"])
+
+    def _next_batch(self) -> list[_Piece] | None:
+        """All waiting queries up to a batch, else the oldest document piece."""
+        with self._ready:
+            while not self._queries and not self._documents and not self._stopping:
+                self._ready.wait()
+            if self._stopping:
+                return None
+            if not self._queries:
+                return [self._documents.popleft()]
+            batch = [self._queries.popleft()]
+            size = len(batch[0].texts)
+            while (
+                self._queries and size + len(self._queries[0].texts) <= self.query_batch
+            ):
+                piece = self._queries.popleft()
+                batch.append(piece)
+                size += len(piece.texts)
+            return batch
+
+    def _encode_loop(self) -> None:
+        while (batch := self._next_batch()) is not None:
+            texts = [text for piece in batch for text in piece.texts]
+            try:
+                embeddings = encode_array(
+                    self.model, texts, is_query=batch[0].job.is_query
+                )
+            except Exception as e:
+                for piece in batch:
+                    piece.job.fail(str(e))
+                continue
+            start = 0
+            for piece in batch:
+                end = start + len(piece.texts)
+                piece.job.finish_piece(piece.index, embeddings[start:end])
+                start = end
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "EmbeddingServer"
+
+    def handle(self) -> None:
+        # One connection per client thread, serving its requests in turn
+        while (message := ipc.recv_message(self.request)) is not None:
+            header, _ = message
+            try:
+                reply, payload = self._dispatch(header)
+            except Exception as e:
+                ipc.send_message(self.request, {"ok": False, "error": str(e)})
+                continue
+            ipc.send_message(self.request, {"ok": True, **reply}, payload)
+
+    def _dispatch(self, header: dict[str, Any]) -> tuple[dict[str, Any], memoryview]:
+        queue = self.server.queue
+        if header.get("op") == "encode":
+            embeddings = np.ascontiguousarray(
+                queue.encode(header["texts"], bool(header.get("query"))),
+                dtype=np.float32,
+            )
+            # The array's own buffer goes on the wire, without serializing it
+            return {"shape": list(embeddings.shape)}, embeddings.data.cast("B")
+        if header.get("op") == "count_tokens":
+            return {"tokens": queue.count_tokens(header["text"])}, memoryview(b"")
+        raise ValueError(f"Unknown operation: {header.get('op')}")
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, queue: EmbeddingQueue):
+        # A socket file left by a previous run would make binding fail
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _Handler)
+        self.path = path
+        self.queue = queue
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+
+    from .transformer import get_model, initialize_model
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    path = utils.get_env_var(utils.EMBEDDING_SERVER_SOCKET)
+
+    logger.info("Loading embedding model...")
+    initialize_model()
+    queue = EmbeddingQueue(
+        get_model(),
+        document_batch=utils.get_env_int(
+            utils.EMBEDDING_SERVER_DOCUMENT_BATCH, DEFAULT_DOCUMENT_BATCH
+        ),
+        query_batch=utils.get_env_int(
+            utils.EMBEDDING_SERVER_QUERY_BATCH, DEFAULT_QUERY_BATCH
+        ),
+    )
+    queue.start()
+    server = EmbeddingServer(path, queue)
+
+    def stop(_signum: int, _frame: Any) -> None:
+        # shutdown() waits for serve_forever, so it can't run on this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Embedding server listening on %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        queue.stop()
+    logger.info("Embedding server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from ai_service import errors, utils
-from sentence_transformers import SentenceTransformer
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 
 logger = logging.getLogger(__name__)
 
 # Global model variable - initialized once at startup
-_model: Optional[SentenceTransformer] = None
+_model: Optional["SentenceTransformer"] = None
 
 
 def initialize_model(trust_remote_code: bool = False) -> None:
@@ -15,6 +17,8 @@ def initialize_model(trust_remote_code: bool = False) -> None:
     global _model
     if _model is None:
         model_name = utils.get_env_var(utils.EMBEDDING_MODEL)
+        # Imported on first use: it pulls in torch, which takes seconds
+        from sentence_transformers import SentenceTransformer
 
         try:
             _model = SentenceTransformer(
@@ -26,7 +30,7 @@ def initialize_model(trust_remote_code: bool = False) -> None:
             raise errors.EmbeddingError.model_load_failed(model_name, e) from e
 
 
-def get_model() -> SentenceTransformer:
+def get_model() -> "SentenceTransformer":
     """
     Get the initialized embedding model.
 
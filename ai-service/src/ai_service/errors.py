@@ -21,12 +21,24 @@ class EmbeddingError(AIServiceError):
     def missing_model(cls) -> "EmbeddingError":
         return cls("Embedding model not initialized.")
 
+    @classmethod
+    def server_unavailable(cls, path: str, error: Exception) -> "EmbeddingError":
+        return cls(f"Cannot reach embedding server at '{path}': {error}")
+
+    @classmethod
+    def server_failed(cls, message: str) -> "EmbeddingError":
+        return cls(f"Embedding server failed: {message}")
+
 
 class LLMQueryError(AIServiceError):
     @classmethod
     def query_failed(cls, error: Exception) -> "LLMQueryError":
         return cls(f"Failed to query Ollama: {error}")
 
+    @classmethod
+    def missing_client(cls) -> "LLMQueryError":
+        return cls("Ollama client not initialized.")
+
 
 class DatabaseError(AIServiceError):
     @classmethod
@@ -46,11 +58,39 @@ class DatabaseError(AIServiceError):
         return cls("DB not initialized.")
 
 
+class SnapshotError(AIServiceError):
+    @classmethod
+    def invalid_file(cls, path: str, error: Exception) -> "SnapshotError":
+        return cls(f"Invalid snapshot file {path}: {error}")
+
+    @classmethod
+    def unsupported_format(cls, version: int) -> "SnapshotError":
+        return cls(f"Unsupported snapshot format version: {version}")
+
+    @classmethod
+    def model_mismatch(cls, snapshot_model: str, model: str) -> "SnapshotError":
+        return cls(
+            f"Snapshot was embedded with '{snapshot_model}' but the service uses '{model}'"
+        )
+
+
 class NotFound(AIServiceError):
     @classmethod
     def env_variable(cls, name: str) -> "NotFound":
         return cls(f"Missing {name} environment variable")
 
+    @classmethod
+    def collection(cls, canonical_github_url: str) -> "NotFound":
+        return cls(f"No stored collection for repository: {canonical_github_url}")
+
+    @classmethod
+    def snapshot(cls, canonical_github_url: str) -> "NotFound":
+        return cls(f"No snapshot for repository: {canonical_github_url}")
+
+    @classmethod
+    def session(cls, session_id: str) -> "NotFound":
+        return cls(f"Conversation session not found or expired: {session_id}")
+
 
 class InvalidParam(AIServiceError):
     @classmethod
@@ -65,6 +105,43 @@ class InvalidParam(AIServiceError):
     def embeddings_count_mismatch(cls) -> "InvalidParam":
         return cls("Number of embeddings must match number of chunks")
 
+    @classmethod
+    def metadatas_count_mismatch(cls) -> "InvalidParam":
+        return cls("Number of metadatas must match number of chunks")
+
+    @classmethod
+    def invalid_env_value(cls, name: str, value: str) -> "InvalidParam":
+        return cls(f"Invalid value for {name} environment variable: {value!r}")
+
+    @classmethod
+    def empty_batch(cls) -> "InvalidParam":
+        return cls("A batch needs at least one question")
+
+    @classmethod
+    def batch_too_large(cls, count: int, limit: int) -> "InvalidParam":
+        return cls(f"A batch may have at most {limit} questions, got {count}")
+
+
+class Overloaded(AIServiceError):
+    # HTTP status of the rejection, and seconds to wait before retrying
+    status_code: int = 429
+    retry_after: int = 1
+
+    @classmethod
+    def queue_full(cls, endpoint: str, retry_after: int) -> "Overloaded":
+        error = cls(f"Too many {endpoint} requests waiting, retry later")
+        error.retry_after = retry_after
+        return error
+
+    @classmethod
+    def queue_timeout(
+        cls, endpoint: str, seconds: float, retry_after: int
+    ) -> "Overloaded":
+        error = cls(f"No {endpoint} slot freed up within {seconds:g}s, retry later")
+        error.status_code = 503
+        error.retry_after = retry_after
+        return error
+
 
 class GitCloneError(AIServiceError):
     @classmethod
@@ -6,14 +6,35 @@ This module contains FastAPI router endpoints for the main AI service functional
 Endpoints:
 - POST /ingest: Ingest a GitHub repository and create embeddings.
 - POST /answer: Answer questions about an ingested repository.
+- POST /answer/batch: Answer many questions at once, streamed back as NDJSON.
+- POST /sessions: Start a multi-turn conversation about repositories.
+- POST /sessions/{session_id}/answer: Ask the next question of a conversation.
+- DELETE /sessions/{session_id}: End a conversation.
+- GET /collections: List stored repositories with size and usage bookkeeping.
+- DELETE /collections: Delete all stored data of a repository.
+- POST /snapshots: Publish a repository's index to the snapshot store.
+- POST /snapshots/restore: Load a repository's index from the snapshot store.
 """
 
-from .ingest import router as ingest_router, ingest_github_project
+from .ingest import (
+    router as ingest_router,
+    ingest_github_project,
+    resume_pending_ingests,
+)
 from .answer import router as answer_router, answer_question
+from .batch import router as batch_router
+from .sessions import router as sessions_router
+from .collections import router as collections_router
+from .snapshots import router as snapshots_router
 
 __all__ = [
     "ingest_router",
     "answer_router",
+    "batch_router",
+    "sessions_router",
+    "collections_router",
+    "snapshots_router",
     "ingest_github_project",
+    "resume_pending_ingests",
     "answer_question",
 ]
@@ -1,122 +1,214 @@
+import asyncio
+import json
 import logging
-from fastapi.responses import JSONResponse
+import time
+from typing import Any, AsyncIterator
+
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
 from fastapi import APIRouter
 
-from ai_service import ollama_client, errors, utils
-from ai_service.embeddings import embed_query
-from ai_service.db_setup import set_repo_context, query_chunks
+from ai_service import answer_cache, ollama_client, errors, metrics
+from ai_service.context_builder import build_context
+from ai_service.embeddings import count_tokens, embed_query
+from ai_service.handlers.common import restore_missing, sources
+from ai_service.retrieval import Snippet, retrieve_snippets
+from ai_service.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Identical questions asked concurrently share one generation
+_answers_in_flight = SingleFlight("answer")
+_streams_in_flight = SingleFlight("answer stream")
 
-class AnswerRequest(BaseModel):
-    user_question: str
+
+class RepositoriesRequest(BaseModel):
     canonical_github_url: HttpUrl | None = None  # Optional for general chat
+    canonical_github_urls: list[HttpUrl] | None = None  # Ask across several repos
+
+    def repo_urls(self) -> list[str]:
+        """All requested repositories, without duplicates, in request order."""
+        urls = [self.canonical_github_url] if self.canonical_github_url else []
+        urls.extend(self.canonical_github_urls or [])
+        return list(dict.fromkeys(str(url) for url in urls))
+
+
+class AnswerRequest(RepositoriesRequest):
+    user_question: str
 
 
-def answer_question(
+def _lookup_cached_answer(
     user_question: str,
-    repo_url: str | None = None,
-) -> str:
+    repo_urls: list[str],
+) -> tuple[answer_cache.CacheKey | None, list[float] | None, str | None]:
     """
-    Answer a question with optional repository context.
+    Embed a repository question and look for a cached answer to a similar one.
+
+    Returns:
+        The cache key, the question embedding and the cached answer, if any.
+        All None for general questions, which aren't cached.
+    """
+    if not repo_urls:
+        return None, None, None
+    restore_missing(repo_urls)
+    key = answer_cache.cache_key(repo_urls)
+    query_embedding = embed_query(user_question)
+    return key, query_embedding, answer_cache.lookup(key, query_embedding)
+
+
+def build_prompt(
+    user_question: str,
+    repo_urls: list[str] | None = None,
+    query_embedding: list[float] | None = None,
+    snippets: list[Snippet] | None = None,
+) -> tuple[str, list[Snippet]]:
+    """
+    Build the LLM prompt for a question, retrieving repository context if given.
 
     Args:
         user_question: The user's question
-        repo_url: Optional GitHub repository URL for context-aware answers
+        repo_urls: Optional GitHub repository URLs for context-aware answers.
+            The question is embedded once and all repositories are searched
+            in parallel.
+        query_embedding: The question's embedding, if already computed.
+        snippets: The question's retrieved snippets, if already retrieved.
 
     Returns:
-        AI-generated answer
+        The prompt and the snippets retrieved for it (empty for general questions).
     """
-    try:
-        # Handle project-specific questions with RAG context
-        if repo_url:
-            set_repo_context(repo_url)
-            logger.info("Context set to %s", repo_url)
-            query_embedding = embed_query(user_question)
-            results = query_chunks(query_embedding)
-            documents = results.get("documents", [[]])
-
-            if not documents or not documents[0]:
-                logger.info("No relevant code snippets found for project.")
-                prompt = (
-                    f"I'm analyzing the GitHub project on this repository: {repo_url}\n\n"
-                    f"USER QUESTION related to the current project: {user_question}\n\n"
-                    "SITUATION: No relevant code context was found in the embedded documents for this project.\n\n"
-                    "Please:\n"
-                    "1. Provide a general answer to the question based on your knowledge\n"
-                    "2. Explain that I couldn't find specific code context for this project\n"
-                    "3. Suggest the user try:\n"
-                    "   - Re-uploading the project (the embeddings might be incomplete)\n"
-                    "   - Asking about different aspects of the codebase\n"
-                    "   - Being more specific about file names, functions, or features\n\n"
-                    "Keep your response helpful and encouraging."
-                )
-            else:
-                unique_snippets = list(dict.fromkeys(documents[0]))
-                context = "\n---\n".join(unique_snippets)
-                logger.info("Found context length: %d characters", len(context))
-
-                # Limit context size to prevent overly long prompts
-                context_max_length: int = int(
-                    utils.get_env_var(utils.MAX_CONTEXT_LENGTH)
-                )
-                if len(context) > context_max_length:
-                    context = (
-                        context[:context_max_length]
-                        + "\n... [Context truncated due to length]"
-                    )
-
-                prompt = (
-                    f"You are an expert software engineer analyzing the GitHub project on this repository: {repo_url}\n\n"
-                    f"USER QUESTION related to this project: {user_question}\n\n"
-                    "RELEVANT CODE CONTEXT found from the similarity search:\n"
-                    "```\n"
-                    f"{context}\n"
-                    "```\n\n"
-                    "ANALYSIS INSTRUCTIONS:\n"
-                    "1. **Direct Answer**: Start with a clear, direct answer to the user's question\n"
-                    "2. **Code Analysis**: Examine the provided code context thoroughly\n"
-                    "3. **Implementation Details**: Explain HOW things work, not just WHAT they do\n"
-                    "4. **File References**: When mentioning code, reference the most relevant files/functions when possible\n"
-                    "5. **Architecture Insights**: Explain flows and how different parts connect and interact\n"
-                    "6. **Patterns & Practices**: Identify design patterns used, best practices, or potential improvements\n"
-                    "7. **Completeness Check**: If context seems insufficient, clearly state what's missing\n\n"
-                    "RESPONSE FORMAT:\n"
-                    "- Start with a direct, friendly, exciting, positive and encouraging answer\n"
-                    "- Use clear sections/bullet points for complex explanations\n"
-                    "- Include the most relevant code examples if necessary\n"
-                    "- Be thorough but structured\n"
-                    "- Keep responses complete - finish all thoughts and code examples\n"
-                    "- If you can't answer fully, explain exactly why\n\n"
-                    "Remember: Base your analysis ONLY on the observable code and documentation provided above. Do not speculate beyond what you can see."
-                )
-
-        # Handle general questions without project context
+    # Handle project-specific questions with RAG context
+    if repo_urls:
+        repos = ", ".join(repo_urls)
+        logger.info("Context set to %s", repos)
+        if snippets is None:
+            restore_missing(repo_urls)
+            if query_embedding is None:
+                query_embedding = embed_query(user_question)
+            snippets = retrieve_snippets(query_embedding, repo_urls)
+        project = "project" if len(repo_urls) == 1 else "projects"
+        repositories = (
+            "this repository" if len(repo_urls) == 1 else "these repositories"
+        )
+
+        if not snippets:
+            logger.info("No relevant code snippets found for project.")
+            prompt = (
+                f"I'm analyzing the GitHub {project} on {repositories}: {repos}\n\n"
+                f"USER QUESTION related to the current {project}: {user_question}\n\n"
+                f"SITUATION: No relevant code context was found in the embedded documents for this {project}.\n\n"
+                "Please:\n"
+                "1. Provide a general answer to the question based on your knowledge\n"
+                f"2. Explain that I couldn't find specific code context for this {project}\n"
+                "3. Suggest the user try:\n"
+                "   - Re-uploading the project (the embeddings might be incomplete)\n"
+                "   - Asking about different aspects of the codebase\n"
+                "   - Being more specific about file names, functions, or features\n\n"
+                "Keep your response helpful and encouraging."
+            )
         else:
-            logger.info("Answering general user question")
+            context = build_context(
+                snippets, label_repos=len(repo_urls) > 1, count_tokens=count_tokens
+            )
+            logger.info("Found context length: %d characters", len(context))
+
             prompt = (
-                f"You are a helpful AI assistant. Respond naturally and appropriately to the user's question.\n\n"
-                f"USER QUESTION: {user_question}\n\n"
-                "INSTRUCTIONS:\n"
-                "1. **Respond naturally**: Match the tone and type of question being asked\n"
-                "2. **For greetings**: Respond warmly and offer to help\n"
-                "3. **For programming questions**: Provide helpful technical guidance with examples\n"
-                "4. **For general questions**: Give informative, thoughtful answers\n"
-                "5. **Be conversational**: Keep responses friendly and approachable but do not repeat yourself\n"
-                "6. **Stay helpful**: Focus on actually assisting the user\n\n"
-                "CONTEXT:\n"
-                "- This is an AI Code Explorer tool that can also analyze GitHub projects\n"
-                "- If the user asks about code analysis, mention they can upload GitHub project URLs for detailed code exploration\n"
-                "- Keep responses proportional to the question - simple questions get simple answers\n\n"
-                "Respond in a helpful, natural way."
+                f"You are an expert software engineer analyzing the GitHub {project} on {repositories}: {repos}\n\n"
+                f"USER QUESTION related to this {project}: {user_question}\n\n"
+                "RELEVANT CODE CONTEXT found from the similarity search:\n"
+                "```\n"
+                f"{context}\n"
+                "```\n\n"
+                "ANALYSIS INSTRUCTIONS:\n"
+                "1. **Direct Answer**: Start with a clear, direct answer to the user's question\n"
+                "2. **Code Analysis**: Examine the provided code context thoroughly\n"
+                "3. **Implementation Details**: Explain HOW things work, not just WHAT they do\n"
+                "4. **File References**: When mentioning code, reference the most relevant files/functions when possible\n"
+                "5. **Architecture Insights**: Explain flows and how different parts connect and interact\n"
+                "6. **Patterns & Practices**: Identify design patterns used, best practices, or potential improvements\n"
+                "7. **Completeness Check**: If context seems insufficient, clearly state what's missing\n\n"
+                "RESPONSE FORMAT:\n"
+                "- Start with a direct, friendly, exciting, positive and encouraging answer\n"
+                "- Use clear sections/bullet points for complex explanations\n"
+                "- Include the most relevant code examples if necessary\n"
+                "- Be thorough but structured\n"
+                "- Keep responses complete - finish all thoughts and code examples\n"
+                "- If you can't answer fully, explain exactly why\n\n"
+                "Remember: Base your analysis ONLY on the observable code and documentation provided above. Do not speculate beyond what you can see."
             )
 
-        answer = ollama_client.chat_with_ollama(prompt)
-        logger.info("LLM answer: %s", answer)
+    # Handle general questions without project context
+    else:
+        logger.info("Answering general user question")
+        snippets = []
+        prompt = (
+            f"You are a helpful AI assistant. Respond naturally and appropriately to the user's question.\n\n"
+            f"USER QUESTION: {user_question}\n\n"
+            "INSTRUCTIONS:\n"
+            "1. **Respond naturally**: Match the tone and type of question being asked\n"
+            "2. **For greetings**: Respond warmly and offer to help\n"
+            "3. **For programming questions**: Provide helpful technical guidance with examples\n"
+            "4. **For general questions**: Give informative, thoughtful answers\n"
+            "5. **Be conversational**: Keep responses friendly and approachable but do not repeat yourself\n"
+            "6. **Stay helpful**: Focus on actually assisting the user\n\n"
+            "CONTEXT:\n"
+            "- This is an AI Code Explorer tool that can also analyze GitHub projects\n"
+            "- If the user asks about code analysis, mention they can upload GitHub project URLs for detailed code exploration\n"
+            "- Keep responses proportional to the question - simple questions get simple answers\n\n"
+            "Respond in a helpful, natural way."
+        )
+
+    return prompt, snippets
+
+
+def _flight_key(user_question: str, repo_urls: list[str]) -> tuple[Any, ...]:
+    """Requests with the same repositories and question, up to case and spacing."""
+    return tuple(sorted(repo_urls)), " ".join(user_question.lower().split())
+
+
+async def _generate_answer(user_question: str, repo_urls: list[str]) -> str:
+    """Answer from the cache, or retrieve context and ask the LLM."""
+    # Embedding and vector search block, so keep them off the event loop
+    key, query_embedding, cached = await asyncio.to_thread(
+        _lookup_cached_answer, user_question, repo_urls
+    )
+    if cached is not None:
+        return cached
+    prompt, _ = await asyncio.to_thread(
+        build_prompt, user_question, repo_urls, query_embedding
+    )
+    answer = await ollama_client.chat_with_ollama(prompt)
+    logger.info("LLM answer: %s", answer)
+    if key is not None and query_embedding is not None:
+        answer_cache.store(key, user_question, query_embedding, answer)
+    return answer
+
+
+async def answer_question(
+    user_question: str,
+    repo_urls: list[str] | None = None,
+) -> str:
+    """
+    Answer a question with optional repository context.
+
+    Identical questions (ignoring case and spacing) about the same
+    repositories asked while one is being answered wait for that answer
+    instead of starting another generation.
+
+    Args:
+        user_question: The user's question
+        repo_urls: Optional GitHub repository URLs for context-aware answers.
+
+    Returns:
+        AI-generated answer
+    """
+    repo_urls = repo_urls or []
+    try:
+        answer = await _answers_in_flight.do(
+            _flight_key(user_question, repo_urls),
+            lambda: _generate_answer(user_question, repo_urls),
+        )
     except errors.AIServiceError:
         logger.exception("Answer error")
         raise
@@ -126,15 +218,121 @@ def answer_question(
 
 # Endpoint to answer a question
 @router.post("/answer")
-def answer_endpoint(request: AnswerRequest) -> JSONResponse:
+async def answer_endpoint(request: AnswerRequest) -> JSONResponse:
     """
     Answer endpoint supporting both general and project-specific questions.
 
-    - If canonical_github_url is provided: project-specific answer with RAG context
-    - If canonical_github_url is None: general answer using LLM knowledge
+    - If canonical_github_url(s) are provided: project-specific answer with RAG
+      context retrieved from all given repositories
+    - If no repository is provided: general answer using LLM knowledge
     """
-    repo_url = (
-        str(request.canonical_github_url) if request.canonical_github_url else None
-    )
-    answer = answer_question(request.user_question, repo_url)
+    answer = await answer_question(request.user_question, request.repo_urls())
     return JSONResponse(status_code=200, content={"answer": answer})
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _answer_events(
+    user_question: str,
+    repo_urls: list[str],
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """
+    Yield the retrieval metadata, then the answer tokens, as (event, data) pairs.
+
+    A cached answer is yielded as a single token. Timing is left to each
+    subscriber, since followers of a shared stream start at different times.
+    """
+    key, query_embedding, cached = await asyncio.to_thread(
+        _lookup_cached_answer, user_question, repo_urls
+    )
+    if cached is not None:
+        yield "context", {"repositories": repo_urls, "sources": [], "cached": True}
+        yield "token", {"content": cached}
+        return
+
+    prompt, snippets = await asyncio.to_thread(
+        build_prompt, user_question, repo_urls, query_embedding
+    )
+    yield (
+        "context",
+        {"repositories": repo_urls, "sources": sources(snippets), "cached": False},
+    )
+    tokens: list[str] = []
+    async for token in ollama_client.stream_chat_with_ollama(prompt):
+        tokens.append(token)
+        yield "token", {"content": token}
+    if key is not None and query_embedding is not None:
+        answer_cache.store(key, user_question, query_embedding, "".join(tokens))
+
+
+async def _stream_events(
+    first: tuple[str, dict[str, Any]],
+    events: AsyncIterator[tuple[str, dict[str, Any]]],
+    started: float,
+) -> AsyncIterator[str]:
+    """Frame answer events as server-sent events, ending with this request's timing."""
+    ttft_ms: float | None = None
+    event, data = first
+    try:
+        while True:
+            if event == "token" and ttft_ms is None:
+                ttft_ms = (time.perf_counter() - started) * 1000
+                metrics.observe("time_to_first_token", ttft_ms / 1000)
+                logger.info("Time to first token: %.0f ms", ttft_ms)
+            yield _sse(event, data)
+            try:
+                event, data = await anext(events)
+            except StopAsyncIteration:
+                break
+    except errors.AIServiceError as e:
+        # Headers are already sent, so report the failure in-band
+        logger.exception("Streaming answer error")
+        yield _sse("error", {"error": str(e), "code": e.__class__.__name__})
+        return
+
+    total_ms = (time.perf_counter() - started) * 1000
+    yield _sse("done", {"ttft_ms": ttft_ms, "total_ms": total_ms})
+
+
+# Endpoint to stream an answer as server-sent events
+@router.post("/answer/stream")
+async def answer_stream_endpoint(request: AnswerRequest) -> StreamingResponse:
+    """
+    Streaming variant of /answer.
+
+    Retrieval runs before the response starts, so its errors are regular
+    HTTP errors. The stream then carries these events:
+
+    - `context`: repositories searched, the sources found (file, distance) and
+      whether the answer comes from the answer cache
+    - `token`: a piece of the answer, as soon as Ollama generates it (a cached
+      answer is sent as one token)
+    - `done`: time to first token and total time, in milliseconds
+    - `error`: sent instead of `done` if generation fails midway
+
+    A request identical to one already streaming joins its generation: it
+    receives the tokens produced so far at once, then follows live.
+    """
+    started = time.perf_counter()
+    repo_urls = request.repo_urls()
+    events = _streams_in_flight.stream(
+        _flight_key(request.user_question, repo_urls),
+        lambda: _answer_events(request.user_question, repo_urls),
+    )
+    # Wait for the context event, so retrieval errors fail the request itself
+    first = await anext(events)
+    return StreamingResponse(
+        _stream_events(first, events, started),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Endpoint to inspect the semantic answer cache
+@router.get("/answer/cache")
+async def answer_cache_endpoint() -> JSONResponse:
+    """Size and hit/miss/expiry/invalidation counts of the answer cache."""
+    return JSONResponse(status_code=200, content=answer_cache.get_cache().stats())
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from pydantic import Field
+
+from ai_service import answer_cache, errors, ollama_client, utils
+from ai_service.embeddings import embed_queries
+from ai_service.handlers.answer import RepositoriesRequest, build_prompt
+from ai_service.handlers.common import restore_missing, sources
+from ai_service.retrieval import Snippet, retrieve_snippets_batch
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+DEFAULT_ANSWER_BATCH_MAX_QUESTIONS = 500
+# Generations a batch runs at once. Kept below LLM_MAX_CONCURRENCY by default
+# so a nightly batch leaves slots free for interactive questions.
+DEFAULT_ANSWER_BATCH_PARALLELISM = 2
+
+
+class BatchRequest(RepositoriesRequest):
+    user_questions: list[str]
+    parallelism: int | None = Field(default=None, ge=1)  # ANSWER_BATCH_PARALLELISM
+
+
+@dataclass
+class _BatchItem:
+    index: int
+    question: str
+    embedding: list[float] | None = None
+    cached: str | None = None
+    prompt: str = ""
+    snippets: list[Snippet] | None = None
+
+
+def _prepare_batch(
+    questions: list[str],
+    repo_urls: list[str],
+) -> tuple[answer_cache.CacheKey | None, list[_BatchItem]]:
+    """
+    Embed, look up and retrieve context for all questions of a batch.
+
+    The questions are embedded in one encoder call and each repository is
+    searched with one multi-query lookup for the questions not answered from
+    the answer cache.
+    """
+    items = [_BatchItem(index, question) for index, question in enumerate(questions)]
+    key = None
+    if repo_urls:
+        restore_missing(repo_urls)
+        key = answer_cache.cache_key(repo_urls)
+        for item, embedding in zip(items, embed_queries(questions)):
+            item.embedding = embedding
+            item.cached = answer_cache.lookup(key, embedding)
+
+        pending = [item for item in items if item.cached is None]
+        if pending:
+            rows = retrieve_snippets_batch(
+                [item.embedding for item in pending if item.embedding is not None],
+                repo_urls,
+            )
+            for item, snippets in zip(pending, rows):
+                item.snippets = snippets
+
+    for item in items:
+        if item.cached is None:
+            item.prompt, item.snippets = build_prompt(
+                item.question, repo_urls, item.embedding, item.snippets
+            )
+    logger.info(
+        "Prepared batch of %d questions, %d answered from cache",
+        len(items),
+        sum(item.cached is not None for item in items),
+    )
+    return key, items
+
+
+async def _answer_item(
+    item: _BatchItem,
+    key: answer_cache.CacheKey | None,
+    slots: asyncio.Semaphore,
+) -> dict[str, Any]:
+    """The result line of one question; a failed generation doesn't fail the batch."""
+    result: dict[str, Any] = {"index": item.index, "question": item.question}
+    if item.cached is not None:
+        return {**result, "answer": item.cached, "cached": True, "sources": []}
+    try:
+        async with slots:
+            answer = await ollama_client.chat_with_ollama(item.prompt)
+    except errors.AIServiceError as e:
+        logger.warning("Batch question %d failed: %s", item.index, e)
+        return {**result, "error": str(e), "code": e.__class__.__name__}
+    if key is not None and item.embedding is not None:
+        answer_cache.store(key, item.question, item.embedding, answer)
+    return {
+        **result,
+        "answer": answer,
+        "cached": False,
+        "sources": sources(item.snippets or []),
+    }
+
+
+async def _answer_lines(
+    key: answer_cache.CacheKey | None,
+    items: list[_BatchItem],
+    parallelism: int,
+) -> AsyncIterator[str]:
+    """Yield one NDJSON line per question, in completion order."""
+    slots = asyncio.Semaphore(parallelism)
+    tasks = [asyncio.create_task(_answer_item(item, key, slots)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+    finally:
+        # Stop generating if the client went away
+        for task in tasks:
+            task.cancel()
+
+
+# Endpoint to answer many questions about the same repositories
+@router.post("/answer/batch")
+async def answer_batch_endpoint(request: BatchRequest) -> StreamingResponse:
+    """
+    Answer a batch of questions, e.g. an evaluation set or FAQ to pre-compute.
+
+    Embedding, answer-cache lookup and retrieval are done for the whole batch
+    before the response starts, so their errors are regular HTTP errors. The
+    answers then stream back as NDJSON, one line per question as soon as it is
+    answered, with the question's `index` in the request. Answers are stored
+    in the answer cache, so asking the batch warms it for /answer.
+    """
+    questions = request.user_questions
+    max_questions = utils.get_env_int(
+        utils.ANSWER_BATCH_MAX_QUESTIONS, DEFAULT_ANSWER_BATCH_MAX_QUESTIONS
+    )
+    if not questions:
+        raise errors.InvalidParam.empty_batch()
+    if len(questions) > max_questions:
+        raise errors.InvalidParam.batch_too_large(len(questions), max_questions)
+
+    parallelism = request.parallelism or utils.get_env_int(
+        utils.ANSWER_BATCH_PARALLELISM, DEFAULT_ANSWER_BATCH_PARALLELISM
+    )
+    # Embedding and vector search block, so keep them off the event loop
+    key, items = await asyncio.to_thread(_prepare_batch, questions, request.repo_urls())
+    return StreamingResponse(
+        _answer_lines(key, items, parallelism),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,29 @@
+import logging
+from fastapi.responses import JSONResponse
+from fastapi import APIRouter
+from pydantic import HttpUrl
+
+from ai_service import errors
+from ai_service.db_setup import delete_repo, discard_checkpoint, list_collections
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+# Endpoint to list stored collections with their bookkeeping
+@router.get("/collections")
+def list_collections_endpoint() -> JSONResponse:
+    return JSONResponse(status_code=200, content={"collections": list_collections()})
+
+
+# Endpoint to delete all stored data of a GitHub project
+@router.delete("/collections")
+def delete_collection_endpoint(canonical_github_url: HttpUrl) -> JSONResponse:
+    # An interrupted ingest would otherwise bring the project back on restart
+    interrupted = discard_checkpoint(str(canonical_github_url))
+    if not delete_repo(str(canonical_github_url)) and not interrupted:
+        raise errors.NotFound.collection(str(canonical_github_url))
+    return JSONResponse(
+        status_code=200,
+        content={"message": f"Successfully deleted project: {canonical_github_url}"},
+    )
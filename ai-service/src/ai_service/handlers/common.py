@@ -0,0 +1,61 @@
+"""
+Helpers shared by the answer, session and batch handlers.
+"""
+
+import logging
+import threading
+from typing import Any
+
+from ai_service.db_setup import (
+    has_snapshot,
+    hydrate_from_store,
+    is_evicted,
+    is_stored,
+)
+from ai_service.handlers.ingest import ingest_github_project
+from ai_service.retrieval import Snippet
+
+logger = logging.getLogger(__name__)
+
+# One lock per repository being restored, so each is hydrated or cloned only
+# once while restores of different repositories overlap
+_restore_locks: dict[str, threading.Lock] = {}
+_restore_locks_guard = threading.Lock()
+
+
+def restore_missing(repo_urls: list[str]) -> None:
+    """
+    Transparently restore repositories that aren't stored on this node.
+
+    A snapshot from the shared store is preferred since it needs no cloning
+    or embedding; evicted repositories without one are re-ingested.
+    """
+    for repo_url in repo_urls:
+        if is_stored(repo_url):
+            continue
+        # Only repositories known here get a lock, so the locks stay bounded
+        if not (is_evicted(repo_url) or has_snapshot(repo_url)):
+            continue
+        with _restore_locks_guard:
+            lock = _restore_locks.setdefault(repo_url, threading.Lock())
+        with lock:
+            if is_stored(repo_url):
+                continue
+            if has_snapshot(repo_url):
+                logger.info("Hydrating project from snapshot: %s", repo_url)
+                hydrate_from_store(repo_url)
+            elif is_evicted(repo_url):
+                logger.info("Re-ingesting evicted project: %s", repo_url)
+                ingest_github_project(repo_url)
+
+
+def sources(snippets: list[Snippet]) -> list[dict[str, Any]]:
+    """Retrieval metadata sent to the client along with an answer."""
+    return [
+        {
+            "repo_url": snippet.repo_url,
+            "file_path": snippet.metadata.get("file_path"),
+            "distance": snippet.distance,
+        }
+        for snippet in snippets
+    ]
@@ -1,83 +1,347 @@
+import asyncio
 import logging
+import os
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, HttpUrl
 from fastapi import APIRouter
 
 from ai_service import (
     errors,
+    metrics,
     project_ingestor,
+    utils,
 )
-from ai_service.embeddings import embed_documents
-from ai_service.db_setup import set_repo_context, add_chunks
-from ai_service.chunking import chunk_code_file
+from ai_service.embeddings import embed_documents, pool_embeddings
+from ai_service.db_setup import (
+    Checkpoint,
+    set_repo_context,
+    get_collection,
+    add_chunks,
+    add_file_summaries,
+    record_ingest,
+    staged_ingest,
+    publish_snapshot,
+    snapshot_store_enabled,
+    job_lock,
+    load_checkpoint,
+    start_checkpoint,
+    save_checkpoint,
+    remove_checkpoint,
+    discard_checkpoint,
+    pending_ingests,
+)
+from ai_service.chunking import chunk_code_file, find_near_duplicates
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Files embedded and stored between two checkpoints
+DEFAULT_CHECKPOINT_FILES = 200
+
 
 class IngestRequest(BaseModel):
     canonical_github_url: HttpUrl
 
 
-def ingest_github_project(canonical_github_url: str) -> None:
-    logger.info(f"Ingesting project: {canonical_github_url}")
+def ingest_github_project(
+    canonical_github_url: str, resume_only: bool = False
+) -> dict[str, int]:
+    """
+    Ingest a repository; returns counts of files, chunks and the chunks embedded.
 
+    Progress is checkpointed every INGEST_CHECKPOINT_FILES files. If an earlier
+    ingest of the repository was interrupted and HEAD is still at its commit,
+    this one continues it and only embeds the files it hadn't stored; if HEAD
+    moved, the interrupted ingest is discarded and HEAD ingested from scratch.
+    With `resume_only`, nothing happens unless there is an interrupted ingest,
+    which is then continued at its own commit.
+    """
     set_repo_context(canonical_github_url)  # Set context once at the start
-    project_dir = project_ingestor.clone_github_repo(canonical_github_url)
-    try:
-        code_files = project_ingestor.scan_code_files(project_dir)
-        logger.info(f"Found {len(code_files)} code files to process.")
-
-        code_chunks: list[str] = []
-
-        logger.info("Processing and embedding code files...")
-        for file_path in code_files:
-            try:
-                with open(file_path, encoding="utf-8") as f:
-                    code = f.read().strip()
-                    if not code:
-                        logger.warning(f"Skipping empty file: {file_path}")
-                        continue
-
-                    # NEW: Chunk the file instead of storing whole file
-                    file_chunks = chunk_code_file(file_path, code)
-                    code_chunks.extend(file_chunks)  # Add all chunks from this file
-            except FileNotFoundError:
-                err = errors.FileReadError.file_not_found(file_path)
-                logger.error(err)
-                continue
-            except PermissionError:
-                err = errors.FileReadError.permission_denied(file_path)
-                logger.error(err)
-                continue
-            except UnicodeDecodeError:
-                err = errors.FileReadError.decode_error(file_path)
-                logger.error(err)
-                continue
-            except OSError as e:
-                err = errors.FileReadError.os_error(file_path, e)
-                logger.error(err)
-                continue
-
-        if code_chunks:
-            # Batch embed all documents at once for better performance
-            embeddings = embed_documents(code_chunks)
-
-            add_chunks(code_chunks, embeddings)
-            logger.info(f"Stored {len(code_chunks)} code chunks in ChromaDB.")
+    with job_lock(canonical_github_url, blocking=not resume_only) as acquired:
+        checkpoint = load_checkpoint(canonical_github_url)
+        if not acquired or (resume_only and checkpoint is None):
+            return {}
+        if checkpoint is None:
+            logger.info(f"Ingesting project: {canonical_github_url}")
         else:
-            logger.warning("No valid code snippets found to store.")
-    finally:
-        project_ingestor.cleanup_dir(project_dir)
+            logger.info(
+                f"Resuming ingest of {canonical_github_url} at commit "
+                f"{checkpoint.commit_sha} ({len(checkpoint.done_files)} files done)"
+            )
+
+        project_dir = project_ingestor.clone_github_repo(canonical_github_url)
+        try:
+            return _ingest_checkout(
+                canonical_github_url, project_dir, checkpoint, resume_only
+            )
+        finally:
+            project_ingestor.cleanup_dir(project_dir)
+
+
+def _ingest_checkout(
+    canonical_github_url: str,
+    project_dir: str,
+    checkpoint: Checkpoint | None,
+    resume_only: bool = False,
+) -> dict[str, int]:
+    """
+    Chunk and store a cloned repository, continuing from `checkpoint` if given.
+
+    Unless `resume_only`, the checkpoint is only continued while it is at HEAD.
+    """
+    if (
+        checkpoint is not None
+        and not resume_only
+        and project_ingestor.head_commit(project_dir) != checkpoint.commit_sha
+    ):
+        logger.info(
+            f"HEAD of {canonical_github_url} moved past {checkpoint.commit_sha}, "
+            "discarding the interrupted ingest"
+        )
+        discard_checkpoint(canonical_github_url)
+        checkpoint = None
+    if checkpoint is not None and not project_ingestor.checkout_commit(
+        project_dir, checkpoint.commit_sha
+    ):
+        logger.warning(
+            f"Commit {checkpoint.commit_sha} is gone, "
+            f"ingesting {canonical_github_url} from scratch"
+        )
+        discard_checkpoint(canonical_github_url)
+        checkpoint = None
+
+    commit_sha = project_ingestor.head_commit(project_dir)
+    # Sorted, so that every attempt at a commit chunks and dedups the same way
+    code_files = sorted(project_ingestor.scan_code_files(project_dir))
+    logger.info(f"Found {len(code_files)} code files to process.")
+
+    logger.info("Processing and embedding code files...")
+    with metrics.timed("read_chunk"):
+        code_chunks, chunk_metadatas = _read_and_chunk(code_files, project_dir)
+    stats = {"files": len(code_files), "chunks": len(code_chunks)}
+
+    threshold = utils.get_env_float(utils.NEAR_DUPLICATE_THRESHOLD, 0.0)
+    if code_chunks and threshold > 0:
+        with metrics.timed("dedup"):
+            code_chunks, chunk_metadatas = _collapse_near_duplicates(
+                code_chunks, chunk_metadatas, threshold
+            )
+    stats["near_duplicates"] = stats["chunks"] - len(code_chunks)
+
+    if not code_chunks:
+        logger.warning("No valid code snippets found to store.")
+        if checkpoint is not None:
+            discard_checkpoint(canonical_github_url)
+        stats.update(embedded_chunks=0, resumed_files=0)
+        return stats
+
+    if checkpoint is None:
+        checkpoint = start_checkpoint(canonical_github_url, commit_sha)
+    stats.update(_store_in_batches(checkpoint, code_chunks, chunk_metadatas))
+    remove_checkpoint(canonical_github_url)
+
+    if snapshot_store_enabled():
+        _publish_snapshot(canonical_github_url)
+    return stats
+
+
+def _store_in_batches(
+    checkpoint: Checkpoint,
+    code_chunks: list[str],
+    chunk_metadatas: list[dict[str, str]],
+) -> dict[str, int]:
+    """
+    Embed and store the chunks a few files at a time, then publish them.
+
+    After each batch the checkpoint records its files as done; files already
+    done by an interrupted attempt are skipped, not embedded again.
+    """
+    batch_files = utils.get_env_int(
+        utils.INGEST_CHECKPOINT_FILES, DEFAULT_CHECKPOINT_FILES
+    )
+    indices_by_file: dict[str, list[int]] = {}
+    for i, metadata in enumerate(chunk_metadatas):
+        indices_by_file.setdefault(metadata["file_path"], []).append(i)
+
+    # Write into a new collection version; queries keep using the current one
+    # until it is complete and swapped in. If this fails, the version is kept
+    # for the next attempt to continue.
+    url = checkpoint.canonical_github_url
+    with staged_ingest(url, staging=checkpoint.staging, resumable=True):
+        done = set(checkpoint.done_files)
+        if done and get_collection(expected_count=len(code_chunks)).count() == 0:
+            logger.warning(
+                f"Staging collection {checkpoint.staging} is gone, "
+                "embedding all files again"
+            )
+            done.clear()
+            checkpoint.done_files.clear()
+
+        pending = [path for path in indices_by_file if path not in done]
+        embedded = 0
+        for start in range(0, len(pending), batch_files):
+            files = pending[start : start + batch_files]
+            indices = [i for path in files for i in indices_by_file[path]]
+            chunks = [code_chunks[i] for i in indices]
+            metadatas = [chunk_metadatas[i] for i in indices]
+
+            embeddings = embed_documents(chunks)
+            with metrics.timed("store"):
+                add_chunks(
+                    chunks, embeddings, metadatas, expected_count=len(code_chunks)
+                )
+                _store_file_summaries(embeddings, metadatas)
+            checkpoint.done_files.extend(files)
+            checkpoint.dimension = len(embeddings[0])
+            save_checkpoint(checkpoint)
+            embedded += len(chunks)
+            logger.info(
+                f"Stored {len(chunks)} code chunks in ChromaDB "
+                f"({len(checkpoint.done_files)}/{len(indices_by_file)} files)."
+            )
+
+        with metrics.timed("store"):
+            record_ingest(
+                dimension=checkpoint.dimension, commit_sha=checkpoint.commit_sha
+            )
+    return {
+        "embedded_chunks": embedded,
+        "resumed_files": len(indices_by_file) - len(pending),
+    }
+
+
+async def resume_pending_ingests() -> None:
+    """
+    Background task that resumes ingests interrupted by a crash or restart.
+
+    With several worker processes it runs in all of them; each ingest is
+    resumed by whichever worker takes its lock first.
+    """
+    for canonical_github_url in await asyncio.to_thread(pending_ingests):
+        try:
+            stats = await asyncio.to_thread(
+                ingest_github_project, canonical_github_url, resume_only=True
+            )
+        except Exception:
+            # The checkpoint stays, so the next start tries again
+            logger.exception("Failed to resume ingest of %s", canonical_github_url)
+            continue
+        if stats:
+            logger.info("Resumed ingest of %s: %s", canonical_github_url, stats)
+
+
+def _read_and_chunk(
+    code_files: list[str],
+    project_dir: str,
+) -> tuple[list[str], list[dict[str, str]]]:
+    """Read and chunk the code files, skipping unreadable and empty ones."""
+    code_chunks: list[str] = []
+    chunk_metadatas: list[dict[str, str]] = []
+    for file_path in code_files:
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                code = f.read().strip()
+                if not code:
+                    logger.warning(f"Skipping empty file: {file_path}")
+                    continue
+
+                # NEW: Chunk the file instead of storing whole file
+                file_chunks = chunk_code_file(file_path, code)
+                code_chunks.extend(file_chunks)  # Add all chunks from this file
+                relative_path = os.path.relpath(file_path, project_dir)
+                chunk_metadatas.extend(
+                    {"file_path": relative_path} for _ in file_chunks
+                )
+                metrics.count("files")
+                metrics.count("chunks", len(file_chunks))
+                metrics.count("bytes", len(code.encode("utf-8")))
+        except FileNotFoundError:
+            err = errors.FileReadError.file_not_found(file_path)
+            logger.error(err)
+            continue
+        except PermissionError:
+            err = errors.FileReadError.permission_denied(file_path)
+            logger.error(err)
+            continue
+        except UnicodeDecodeError:
+            err = errors.FileReadError.decode_error(file_path)
+            logger.error(err)
+            continue
+        except OSError as e:
+            err = errors.FileReadError.os_error(file_path, e)
+            logger.error(err)
+            continue
+    return code_chunks, chunk_metadatas
+
+
+def _collapse_near_duplicates(
+    code_chunks: list[str],
+    chunk_metadatas: list[dict[str, str]],
+    threshold: float,
+) -> tuple[list[str], list[dict[str, str]]]:
+    """
+    Drop chunks nearly identical to an earlier one, before they are embedded.
+
+    The kept chunk lists the other files its duplicates came from under
+    `duplicate_files`, so the answer can still point at them.
+    """
+    duplicate_of = find_near_duplicates(code_chunks, threshold)
+    kept = [i for i, original in enumerate(duplicate_of) if original is None]
+    other_files: dict[int, set[str]] = {}
+    for i, original in enumerate(duplicate_of):
+        if original is not None:
+            other_files.setdefault(original, set()).add(chunk_metadatas[i]["file_path"])
+
+    metadatas = []
+    for i in kept:
+        metadata = chunk_metadatas[i]
+        files = other_files.get(i, set()) - {metadata["file_path"]}
+        if files:
+            metadata = {**metadata, "duplicate_files": ", ".join(sorted(files))}
+        metadatas.append(metadata)
+
+    skipped = len(code_chunks) - len(kept)
+    metrics.count("near_duplicate_chunks", skipped)
+    logger.info(
+        f"Skipped {skipped} near-duplicate chunks of {len(code_chunks)} "
+        f"(similarity >= {threshold:g})."
+    )
+    return [code_chunks[i] for i in kept], metadatas
+
+
+def _store_file_summaries(
+    embeddings: list[list[float]],
+    chunk_metadatas: list[dict[str, str]],
+) -> None:
+    """Build the coarse file-level index by pooling each file's chunk vectors."""
+    embeddings_by_file: dict[str, list[list[float]]] = {}
+    for embedding, metadata in zip(embeddings, chunk_metadatas):
+        embeddings_by_file.setdefault(metadata["file_path"], []).append(embedding)
+
+    file_paths = list(embeddings_by_file)
+    add_file_summaries(
+        file_paths,
+        [pool_embeddings(embeddings_by_file[path]) for path in file_paths],
+    )
+    logger.info(f"Stored {len(file_paths)} file summaries in ChromaDB.")
+
+
+def _publish_snapshot(canonical_github_url: str) -> None:
+    """Share the fresh index with other nodes; the ingest succeeds regardless."""
+    try:
+        publish_snapshot(canonical_github_url)
+    except (errors.AIServiceError, OSError):
+        logger.exception("Failed to publish snapshot of %s", canonical_github_url)
 
 
 # Endpoint to ingest a GitHub project
 @router.post("/ingest")
 def ingest_endpoint(request: IngestRequest) -> JSONResponse:
-    ingest_github_project(str(request.canonical_github_url))
+    stats = ingest_github_project(str(request.canonical_github_url))
     return JSONResponse(
         status_code=201,
         content={
             "message": f"Successfully ingested project: {request.canonical_github_url}",
+            "stats": stats,
         },
     )
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from ai_service import errors, ollama_client
+from ai_service.context_builder import assemble_context
+from ai_service.embeddings import count_tokens, embed_query
+from ai_service.handlers.answer import RepositoriesRequest
+from ai_service.handlers.common import restore_missing
+from ai_service.retrieval import retrieve_snippets
+from ai_service.sessions import ChunkKey, Session, Turn, get_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+class SessionQuestion(BaseModel):
+    user_question: str
+
+
+def _system_prompt(repo_urls: list[str]) -> str:
+    """
+    Instructions sent once at the start of a conversation.
+
+    Nothing in it may change between turns, or the cached prefix is lost.
+    """
+    if not repo_urls:
+        return (
+            "You are a helpful AI assistant in a conversation with a user of "
+            "AI Code Explorer, a tool that can also analyze GitHub projects. "
+            "Respond naturally, keep answers proportional to the question and "
+            "use earlier messages of the conversation as context."
+        )
+    repos = ", ".join(repo_urls)
+    return (
+        f"You are an expert software engineer discussing these GitHub repositories with a user: {repos}\n\n"
+        "Each user message may start with RELEVANT CODE CONTEXT found by a similarity search for "
+        "that question. Context sent earlier in the conversation still applies and is not repeated.\n\n"
+        "ANALYSIS INSTRUCTIONS:\n"
+        "1. **Direct Answer**: Start with a clear, direct answer to the user's question\n"
+        "2. **Implementation Details**: Explain HOW things work, not just WHAT they do\n"
+        "3. **File References**: Reference the most relevant files/functions when possible\n"
+        "4. **Completeness Check**: If the context seems insufficient, clearly state what's missing\n\n"
+        "Base your analysis ONLY on the code and documentation provided in this conversation. "
+        "Do not speculate beyond what you can see."
+    )
+
+
+def _user_message(
+    session: Session,
+    user_question: str,
+) -> tuple[str, frozenset[ChunkKey]]:
+    """
+    The next user message: newly retrieved context, then the question.
+
+    Chunks already sent earlier in the session are left out, so each chunk
+    is in the conversation (and processed by the LLM) once.
+
+    Returns:
+        The message and the chunks it adds to the conversation.
+    """
+    if not session.repo_urls:
+        return user_question, frozenset()
+
+    restore_missing(session.repo_urls)
+    snippets = retrieve_snippets(embed_query(user_question), session.repo_urls)
+    sent = session.sent_chunks()
+    new = [s for s in snippets if (s.repo_url, s.document) not in sent]
+    logger.info(
+        "Session %s: %d snippets retrieved, %d new",
+        session.session_id,
+        len(snippets),
+        len(new),
+    )
+    if not new:
+        return f"QUESTION: {user_question}", frozenset()
+
+    context, included = assemble_context(
+        new, label_repos=len(session.repo_urls) > 1, count_tokens=count_tokens
+    )
+    # Snippets cut or left out over the budget may still be sent later
+    chunks = frozenset((s.repo_url, s.document) for s in included)
+    message = (
+        f"RELEVANT CODE CONTEXT:\n```\n{context}\n```\n\nQUESTION: {user_question}"
+    )
+    return message, chunks
+
+
+# Endpoint to start a conversation
+@router.post("/sessions")
+async def create_session_endpoint(request: RepositoriesRequest) -> JSONResponse:
+    """
+    Start a multi-turn conversation about the given repositories (or none).
+
+    Follow-up questions are sent to /sessions/{session_id}/answer.
+    """
+    repo_urls = request.repo_urls()
+    store = get_store()
+    session = store.create(repo_urls, _system_prompt(repo_urls))
+    return JSONResponse(
+        status_code=201,
+        content={
+            "session_id": session.session_id,
+            "repositories": repo_urls,
+            "ttl_seconds": store.ttl_seconds,
+        },
+    )
+
+
+# Endpoint to ask the next question of a conversation
+@router.post("/sessions/{session_id}/answer")
+async def session_answer_endpoint(
+    session_id: str,
+    request: SessionQuestion,
+) -> JSONResponse:
+    """
+    Answer a question in the context of the conversation so far.
+
+    The whole conversation is sent each time, laid out so it starts with the
+    exact messages of the previous request: Ollama reuses their KV cache and
+    only processes the new message. `keep_alive` keeps the model, and so the
+    cache, loaded for as long as the session may live.
+    """
+    store = get_store()
+    session = store.get(session_id)
+    async with store.turn_lock(session):
+        try:
+            # Embedding and vector search block, so keep them off the event loop
+            user_message, chunks = await asyncio.to_thread(
+                _user_message, session, request.user_question
+            )
+            answer = await ollama_client.chat_with_ollama(
+                session.messages(user_message), keep_alive=store.ttl_seconds
+            )
+        except errors.AIServiceError:
+            logger.exception("Session answer error")
+            raise
+        store.add_turn(session, Turn(user_message, answer, chunks))
+    return JSONResponse(
+        status_code=200,
+        content={"answer": answer, "turn": len(session.turns)},
+    )
+
+
+# Endpoint to end a conversation
+@router.delete("/sessions/{session_id}")
+async def delete_session_endpoint(session_id: str) -> JSONResponse:
+    if not get_store().delete(session_id):
+        raise errors.NotFound.session(session_id)
+    return JSONResponse(
+        status_code=200, content={"message": f"Deleted session: {session_id}"}
+    )
@@ -0,0 +1,27 @@
+import logging
+from fastapi.responses import JSONResponse
+from fastapi import APIRouter
+from pydantic import BaseModel, HttpUrl
+
+from ai_service.db_setup import hydrate_from_store, publish_snapshot
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+class SnapshotRequest(BaseModel):
+    canonical_github_url: HttpUrl
+
+
+# Endpoint to publish a project's index to the snapshot store
+@router.post("/snapshots")
+def export_snapshot_endpoint(request: SnapshotRequest) -> JSONResponse:
+    manifest = publish_snapshot(str(request.canonical_github_url))
+    return JSONResponse(status_code=201, content={"snapshot": manifest})
+
+
+# Endpoint to load a project's index from the snapshot store
+@router.post("/snapshots/restore")
+def restore_snapshot_endpoint(request: SnapshotRequest) -> JSONResponse:
+    manifest = hydrate_from_store(str(request.canonical_github_url))
+    return JSONResponse(status_code=200, content={"snapshot": manifest})
@@ -2,7 +2,8 @@
 
 
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -11,7 +12,10 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 from ai_service import (
+    admission,
     errors,
+    metrics,
+    profiling,
     utils,
 )
 
@@ -19,7 +23,15 @@ from ai_service import (
 from fastapi import FastAPI, Request
 import uvicorn
 
-from .handlers import ingest_router, answer_router
+from .handlers import (
+    ingest_router,
+    answer_router,
+    batch_router,
+    sessions_router,
+    collections_router,
+    snapshots_router,
+    resume_pending_ingests,
+)
 
 
 @asynccontextmanager
@@ -43,20 +55,55 @@ async def lifespan(_app: FastAPI):
 
     initialize_db()
 
-    # Initialize SentenceTransformer model
-    logger.info("Loading embedding model...")
-    from ai_service.embeddings import initialize_model
+    # Initialize SentenceTransformer model, unless the embedding server runs it
+    from ai_service.embeddings import initialize_model, ipc
+
+    if ipc.is_enabled():
+        logger.info("Using the embedding server, not loading the model")
+    else:
+        logger.info("Loading embedding model...")
+        initialize_model()
+
+    # Create the pooled Ollama client
+    logger.info("Connecting to Ollama...")
+    from ai_service.ollama_client import initialize_client, close_client
+
+    initialize_client()
+
+    # Enforce the collection quotas in the background
+    from ai_service.db_setup import run_evictor
+
+    evictor = asyncio.create_task(run_evictor())
+
+    # Continue ingests a crash or restart interrupted
+    resumer = asyncio.create_task(resume_pending_ingests())
+
+    # Warm up the models and hot collections; /ready reports when it's done
+    from ai_service.warmup import warm_up
 
-    initialize_model()
+    warmup = asyncio.create_task(warm_up())
 
     yield
 
+    warmup.cancel()
+    resumer.cancel()
+    evictor.cancel()
+    await close_client()
     logger.info("Application shutdown")
 
 
 app = FastAPI(lifespan=lifespan)
+# Profiling is opt-in; without PROFILE_DIR and PROFILE_TOKEN it costs nothing
+if profiling.is_configured():
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Added last, so it runs first: rejected requests cost no further work
+app.add_middleware(admission.AdmissionMiddleware)
 app.include_router(ingest_router)
 app.include_router(answer_router)
+app.include_router(batch_router)
+app.include_router(sessions_router)
+app.include_router(collections_router)
+app.include_router(snapshots_router)
 
 
 # Health check endpoint
@@ -66,6 +113,25 @@ async def health_check():
     return {"status": "healthy", "service": "ai-service"}
 
 
+# Readiness endpoint, distinct from health: ready once warm-up has finished
+@app.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """Readiness check for load balancers: 503 until warm-up completes."""
+    from ai_service.warmup import status
+
+    ready = status()
+    return JSONResponse(status_code=200 if ready["ready"] else 503, content=ready)
+
+
+# Prometheus metrics endpoint
+@app.get("/metrics")
+async def metrics_endpoint() -> PlainTextResponse:
+    """Per-stage latency histograms and throughput counters."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # FastAPI exception handlers
 @app.exception_handler(errors.AIServiceError)
 async def ai_service_error_handler(
@@ -98,6 +164,23 @@ def main() -> None:
         app_port = "8000"
         logger.warning("AI_SERVICE_PORT not set; defaulting to %s", app_port)
 
+    workers = utils.get_env_int(utils.AI_SERVICE_WORKERS, 1)
+    if workers > 1 and not is_dev:
+        # Workers are forked after the model is loaded, so they share it
+        from ai_service.prefork import serve
+
+        serve(
+            "ai_service.main:app",
+            host="0.0.0.0",
+            port=int(app_port),
+            workers=workers,
+            log_level="info",
+            access_log=False,
+        )
+        return
+    if workers > 1:
+        logger.warning("AI_SERVICE_WORKERS is ignored in development (reload)")
+
     uvicorn.run(
         "ai_service.main:app",
         host="0.0.0.0",
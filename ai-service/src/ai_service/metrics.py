@@ -0,0 +1,178 @@
+"""
+Lightweight in-process metrics, exposed in the Prometheus text format.
+
+Every module records through the same three calls: `timed(stage)` around a
+stage of the ingest or answer path, `observe(stage, seconds)` where a block
+can't be wrapped (e.g. across an async generator), and `count(name, value)`
+for throughput counters. Admission control also reports its queues through
+`set_gauge(name, value)`. With METRICS_ENABLED=0 (or false) all of them return
+at once.
+
+Stages: clone, scan, read_chunk, dedup, embed, store, query_embed, vector_search,
+prompt_build, llm_generation, admission_wait, time_to_first_token (from the
+start of a streamed answer request to its first token).
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from ai_service import utils
+
+# Upper bounds in seconds, from a fast vector search to a long ingest
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_PREFIX = "ai_service"
+
+# Counter names and their help text
+COUNTERS = {
+    "files": "Source files read during ingestion.",
+    "chunks": "Chunks produced during ingestion.",
+    "bytes": "Bytes of source code read during ingestion.",
+    "near_duplicate_chunks": "Near-duplicate chunks skipped instead of embedded.",
+    "prompt_tokens": "Prompt tokens processed by the LLM, as reported by Ollama.",
+    "completion_tokens": "Tokens generated by the LLM, as reported by Ollama.",
+    "answer_cache_hits": "Questions answered from the semantic answer cache.",
+    "answer_cache_misses": "Questions not found in the semantic answer cache.",
+    "repo_mirror_hits": "Ingests that fetched into an existing repository mirror.",
+    "repo_mirror_misses": "Ingests that had to clone a repository mirror.",
+    "admission_rejected": "Requests rejected by admission control, by endpoint and reason.",
+}
+
+# Gauge names and their help text
+GAUGES = {
+    "admission_in_flight": "Requests holding an admission slot, by endpoint.",
+    "admission_queue_depth": "Requests waiting for an admission slot, by endpoint.",
+}
+
+# Label names and values of one sample, sorted
+Labels = tuple[tuple[str, str], ...]
+
+_lock = threading.Lock()
+_enabled: bool | None = None
+# Per stage: bucket counts (the last one is +Inf), sum and count
+_histograms: dict[str, tuple[list[int], list[float]]] = {}
+_counters: dict[tuple[str, Labels], float] = {}
+_gauges: dict[tuple[str, Labels], float] = {}
+# Called when a stage starts; returns a callable to run when it ends, or None.
+# Set by the profiler, and only while profiling is configured.
+StageHook = Callable[[str], Callable[[], None] | None]
+_stage_hook: StageHook | None = None
+
+
+def is_enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = utils.get_env_flag(utils.METRICS_ENABLED, True)
+    return _enabled
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record the duration of one run of a stage."""
+    if not is_enabled():
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = ([0] * (len(_BUCKETS) + 1), [0.0])
+        buckets, total = histogram
+        buckets[bisect.bisect_left(_BUCKETS, seconds)] += 1
+        total[0] += seconds
+
+
+def set_stage_hook(hook: StageHook | None) -> None:
+    """Have `hook` called around every timed stage, or stop with None."""
+    global _stage_hook
+    _stage_hook = hook
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one run of a stage (also when it raises)."""
+    end_hook = _stage_hook(stage) if _stage_hook is not None else None
+    if not is_enabled() and end_hook is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if is_enabled():
+            observe(stage, time.perf_counter() - started)
+        if end_hook is not None:
+            end_hook()
+
+
+def count(name: str, value: float = 1, **labels: str) -> None:
+    """Increase a counter."""
+    if not is_enabled():
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    """Set a gauge to its current value."""
+    if not is_enabled():
+        return
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+def reset() -> None:
+    """Forget all recorded values and re-read METRICS_ENABLED."""
+    global _enabled
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+        _enabled = None
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    name = f"{_PREFIX}_stage_duration_seconds"
+    lines = [
+        f"# HELP {name} Duration of ingest and answer stages.",
+        f"# TYPE {name} histogram",
+    ]
+    with _lock:
+        for stage, (buckets, total) in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, bucket in zip((*_BUCKETS, "+Inf"), buckets):
+                cumulative += bucket
+                lines.append(
+                    f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total[0]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative}')
+
+        for counter, help_text in COUNTERS.items():
+            full_name = f"{_PREFIX}_{counter}_total"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} counter")
+            samples = _samples(_counters, counter)
+            lines.extend(f"{full_name}{labels} {value}" for labels, value in samples)
+            if not samples:
+                lines.append(f"{full_name} 0")
+
+        for gauge, help_text in GAUGES.items():
+            full_name = f"{_PREFIX}_{gauge}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} gauge")
+            samples = _samples(_gauges, gauge)
+            lines.extend(f"{full_name}{labels} {value}" for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def _samples(
+    values: dict[tuple[str, Labels], float], name: str
+) -> list[tuple[str, float]]:
+    """The samples of one metric, with their labels formatted, in a stable order."""
+    return [
+        ("{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else "", value)
+        for (metric, labels), value in sorted(values.items())
+        if metric == name
+    ]
@@ -1,14 +1,108 @@
-from ai_service import utils, errors
+import asyncio
+import os
+from typing import Any, AsyncIterator, Sequence
+
+import httpx
 import ollama
 
+from ai_service import metrics, utils, errors
+
+# Generations running at the same time; further requests wait for a slot
+DEFAULT_LLM_MAX_CONCURRENCY = 4
+
+_client: ollama.AsyncClient | None = None
+_model: str | None = None
+_semaphore: asyncio.Semaphore | None = None
+_keep_alive: float | str | None = None
+
+
+def _parse_keep_alive(value: str | None) -> float | str | None:
+    """LLM_KEEP_ALIVE as Ollama expects it: seconds, or a duration like "30m"."""
+    if value is None or not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value.strip()
+
+
+def initialize_client(**client_options: Any) -> None:
+    """
+    Create the shared Ollama client at application startup.
+
+    One pooled HTTP client is reused for every request, and a semaphore caps
+    the number of concurrent generations at LLM_MAX_CONCURRENCY. The server
+    is taken from OLLAMA_HOST, so a local fake server can stand in for load tests.
+    LLM_KEEP_ALIVE (e.g. "30m", or -1 for as long as Ollama runs) sets how
+    long Ollama keeps the model loaded after each request.
+
+    Args:
+        client_options: Extra options for `ollama.AsyncClient` (e.g. host).
+    """
+    global _client, _model, _semaphore, _keep_alive
+    max_concurrency = utils.get_env_int(
+        utils.LLM_MAX_CONCURRENCY, DEFAULT_LLM_MAX_CONCURRENCY
+    )
+    if max_concurrency < 1:
+        raise errors.InvalidParam.invalid_env_value(
+            utils.LLM_MAX_CONCURRENCY, str(max_concurrency)
+        )
+    _model = utils.get_env_var(utils.LLM_MODEL)
+    _semaphore = asyncio.Semaphore(max_concurrency)
+    _keep_alive = _parse_keep_alive(os.getenv(utils.LLM_KEEP_ALIVE))
+    client_options.setdefault(
+        "limits",
+        httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_concurrency,
+        ),
+    )
+    _client = ollama.AsyncClient(**client_options)
+
+
+async def close_client() -> None:
+    """Close the pooled connections at application shutdown."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# A chat message, e.g. {"role": "user", "content": "..."}
+Message = dict[str, str]
+
+
+def _messages(prompt: str | Sequence[Message]) -> list[Message]:
+    """A single user message for a prompt, or the given conversation."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return list(prompt)
+
+
+def _count_tokens(response: Any) -> None:
+    """Record the token counts Ollama reports with a finished generation."""
+    metrics.count("prompt_tokens", response.get("prompt_eval_count") or 0)
+    metrics.count("completion_tokens", response.get("eval_count") or 0)
+
+
+def _get_client() -> tuple[ollama.AsyncClient, str, asyncio.Semaphore]:
+    if _client is None or _model is None or _semaphore is None:
+        raise errors.LLMQueryError.missing_client()
+    return _client, _model, _semaphore
 
-def chat_with_ollama(prompt: str) -> str:
+
+async def chat_with_ollama(
+    prompt: str | Sequence[Message],
+    keep_alive: float | str | None = None,
+) -> str:
     """
     Query Ollama with a prompt and get a response.
 
     Args:
-        prompt: Full prompt to send (including context).
-        model: The local Ollama model to use.
+        prompt: Full prompt to send (including context), or the messages of
+            a conversation.
+        keep_alive: How long Ollama keeps the model (and its prompt cache)
+            loaded after the request. LLM_KEEP_ALIVE if None.
 
     Returns:
         Model-generated response text.
@@ -16,12 +110,74 @@ def chat_with_ollama(prompt: str) -> str:
     Raises:
         LLMQueryError: If the Ollama query fails for any reason.
     """
+    client, model, semaphore = _get_client()
     try:
-        model = utils.get_env_var(utils.LLM_MODEL)
-        response = ollama.chat(  # pyright: ignore[reportUnknownMemberType]
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        async with semaphore:
+            with metrics.timed("llm_generation"):
+                response = await client.chat(  # pyright: ignore[reportUnknownMemberType]
+                    model=model,
+                    messages=_messages(prompt),
+                    keep_alive=_keep_alive if keep_alive is None else keep_alive,
+                )
+        _count_tokens(response)
         return response["message"]["content"]
-    except (ollama.ResponseError, ConnectionError, KeyError, errors.NotFound) as e:
+    except (ollama.ResponseError, ConnectionError, httpx.HTTPError, KeyError) as e:
+        raise errors.LLMQueryError.query_failed(e) from e
+
+
+async def stream_chat_with_ollama(
+    prompt: str | Sequence[Message],
+    keep_alive: float | str | None = None,
+) -> AsyncIterator[str]:
+    """
+    Query Ollama with a prompt and yield the response as it is generated.
+
+    The concurrency slot is held until the stream is exhausted or closed.
+
+    Args:
+        prompt: Full prompt to send (including context), or the messages of
+            a conversation.
+        keep_alive: How long Ollama keeps the model (and its prompt cache)
+            loaded after the request. LLM_KEEP_ALIVE if None.
+
+    Yields:
+        Pieces of the model-generated response text, in order.
+
+    Raises:
+        LLMQueryError: If the Ollama query fails for any reason.
+    """
+    client, model, semaphore = _get_client()
+    try:
+        async with semaphore:
+            with metrics.timed("llm_generation"):
+                stream = await client.chat(  # pyright: ignore[reportUnknownMemberType]
+                    model=model,
+                    messages=_messages(prompt),
+                    keep_alive=_keep_alive if keep_alive is None else keep_alive,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.get("done"):
+                        _count_tokens(chunk)
+                    content = chunk["message"]["content"]
+                    if content:
+                        yield content
+    except (ollama.ResponseError, ConnectionError, httpx.HTTPError, KeyError) as e:
+        raise errors.LLMQueryError.query_failed(e) from e
+
+
+async def load_model() -> None:
+    """
+    Have Ollama load the model into memory without generating anything.
+
+    Raises:
+        LLMQueryError: If Ollama can't be reached or can't load the model.
+    """
+    client, model, _ = _get_client()
+    try:
+        # A chat request without messages only loads the model
+        await client.chat(  # pyright: ignore[reportUnknownMemberType]
+            model=model, messages=[], keep_alive=_keep_alive
+        )
+    except (ollama.ResponseError, ConnectionError, httpx.HTTPError) as e:
         raise errors.LLMQueryError.query_failed(e) from e
@@ -0,0 +1,129 @@
+"""
+Pre-fork serving with several worker processes.
+
+uvicorn's own `--workers` starts every worker as a fresh interpreter, so each
+one loads its own copy of the embedding model. Here the parent imports the app
+and loads the model once, binds the socket and then forks the workers, which
+share the model's weights copy-on-write: inference only reads them, so those
+pages are never copied. Whatever isn't safe to carry across a fork (the
+ChromaDB and Ollama clients, threads, the evictor) is created by each worker
+in the app's lifespan, after the fork.
+
+The parent only supervises: it restarts workers that die and, on SIGTERM or
+SIGINT, stops them and exits.
+"""
+
+import gc
+import logging
+import os
+import signal
+import time
+from typing import Any, Callable, NoReturn
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+# Pause before replacing a dead worker, so a crashing app doesn't spin
+RESTART_DELAY_SECONDS = 1.0
+
+
+def preload_model() -> None:
+    """Load the embedding model in the parent, to be shared by all workers."""
+    from ai_service.embeddings import initialize_model, ipc
+
+    if ipc.is_enabled():
+        # The embedding server holds the model; workers are only its clients
+        return
+    # Loading only reads weights; no forward pass runs before the fork, so
+    # torch starts no thread pools that the workers would inherit broken
+    initialize_model()
+
+
+def _run_worker(config: uvicorn.Config, sockets: list[Any]) -> NoReturn:
+    """Serve in a forked worker until told to stop, then exit without cleanup."""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    code = 0
+    try:
+        uvicorn.Server(config).run(sockets=sockets)
+    except BaseException:
+        logger.exception("Worker %d failed", os.getpid())
+        code = 1
+    finally:
+        # Skip the parent's atexit handlers, which aren't the worker's to run
+        os._exit(code)
+
+
+def serve(
+    app: str,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Callable[[], None] | None = preload_model,
+    **uvicorn_options: Any,
+) -> None:
+    """
+    Serve an app with `workers` processes forked after preloading.
+
+    Args:
+        app: Import string of the ASGI app, e.g. "ai_service.main:app".
+        host: Interface to bind.
+        port: Port to bind.
+        workers: Number of worker processes.
+        preload: Called in the parent before forking, to load what workers share.
+        uvicorn_options: Further options for `uvicorn.Config`.
+    """
+    config = uvicorn.Config(app, host=host, port=port, **uvicorn_options)
+    # Importing the app and preloading in the parent puts both in shared pages
+    config.load()
+    if preload is not None:
+        preload()
+    sockets = [config.bind_socket()]
+    # Everything allocated so far lives as long as the workers; keeping the
+    # garbage collector off it stops it writing to (and so copying) those pages
+    gc.freeze()
+
+    children: set[int] = set()
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(config, sockets)
+        children.add(pid)
+
+    def stop(signum: int, _frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Starting %d workers on %s:%d", workers, host, port)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(
+                "Worker %d exited with code %d, starting a new one",
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            time.sleep(RESTART_DELAY_SECONDS)
+            if not stopping:
+                spawn()
+    for sock in sockets:
+        sock.close()
+    logger.info("All workers stopped")
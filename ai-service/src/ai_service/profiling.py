@@ -0,0 +1,294 @@
+"""
+Opt-in profiling of single requests.
+
+Enabled by setting PROFILE_DIR and PROFILE_TOKEN. A request sent with the
+header `X-Profile-Token: <PROFILE_TOKEN>` (e.g. one /ingest of a repository
+that is slow to ingest) is then profiled while it runs, and its artifacts are
+written to PROFILE_DIR/<profile id>, the id being returned in the
+`X-Profile-Id` response header:
+
+- stacks.folded: CPU samples of all threads as collapsed stacks, for
+  flamegraph.pl or speedscope. Sampling covers the worker threads that
+  embedding, vector search and ingestion run in, which cProfile would miss.
+- allocations.txt and tracemalloc.snapshot: where the memory still allocated
+  at the end of the request was allocated.
+- summary.json: duration, resident memory (RSS), the most sampled functions,
+  and for every stage timed with `metrics.timed` its duration, peak RSS and
+  peak traced Python memory.
+
+Without both variables the middleware isn't installed, so requests pay
+nothing. One request is profiled at a time; requests handled meanwhile show up
+in the CPU samples too.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from types import FrameType
+from typing import Any, Awaitable, Callable
+
+from ai_service import metrics, utils
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile-token"
+DEFAULT_PROFILE_INTERVAL_MS = 5.0
+_TRACEMALLOC_FRAMES = 10
+_TOP_FUNCTIONS = 30
+_TOP_ALLOCATIONS = 50
+# Leaf frames of threads that are waiting, not working
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_current: ContextVar["Profile | None"] = ContextVar("profile", default=None)
+# Serializes profiles: tracemalloc and the sampler are process-wide
+_busy = threading.Lock()
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+def is_configured() -> bool:
+    return bool(os.getenv(utils.PROFILE_DIR)) and bool(os.getenv(utils.PROFILE_TOKEN))
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of the process (its peak where not on Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _traced_bytes() -> int:
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+@dataclass
+class _Stage:
+    stage: str
+    started: float
+    rss_start: int
+    rss_peak: int
+    traced_start: int
+    traced_peak: int
+    ms: float | None = None
+    rss_end: int | None = None
+
+
+class Profile:
+    """CPU samples, memory snapshots and per-stage memory of one request."""
+
+    def __init__(self, directory: str, interval_s: float):
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.directory = os.path.join(directory, self.profile_id)
+        self.interval_s = interval_s
+        self._stacks: Counter[str] = Counter()
+        self._samples = 0
+        self._stages: list[_Stage] = []
+        self._active: list[_Stage] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+        self._started_tracing = False
+        self._started = 0.0
+        self._rss_start = self._rss_peak = 0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._rss_start = self._rss_peak = _rss_bytes()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                names: list[str] = []
+                current: FrameType | None = frame
+                while current is not None:
+                    names.append(_frame_name(current))
+                    current = current.f_back
+                self._stacks[";".join(reversed(names))] += 1
+            self._samples += 1
+            rss, traced = _rss_bytes(), _traced_bytes()
+            with self._lock:
+                self._rss_peak = max(self._rss_peak, rss)
+                for stage in self._active:
+                    stage.rss_peak = max(stage.rss_peak, rss)
+                    stage.traced_peak = max(stage.traced_peak, traced)
+
+    def stage_started(self, stage: str) -> Callable[[], None]:
+        """Track a stage's memory; returns the callable that ends it."""
+        rss, traced = _rss_bytes(), _traced_bytes()
+        record = _Stage(stage, time.perf_counter(), rss, rss, traced, traced)
+        with self._lock:
+            self._active.append(record)
+
+        def end() -> None:
+            rss, traced = _rss_bytes(), _traced_bytes()
+            with self._lock:
+                self._active.remove(record)
+                record.ms = round((time.perf_counter() - record.started) * 1000, 1)
+                record.rss_end = rss
+                record.rss_peak = max(record.rss_peak, rss)
+                record.traced_peak = max(record.traced_peak, traced)
+                self._stages.append(record)
+
+        return end
+
+    def _top_functions(self) -> list[dict[str, Any]]:
+        """
+        The functions running in most samples (self), with the samples they
+        were anywhere on the stack in (total).
+        """
+        total: Counter[str] = Counter()
+        own: Counter[str] = Counter()
+        for stack, samples in self._stacks.items():
+            frames = stack.split(";")
+            for name in set(frames):
+                total[name] += samples
+            own[frames[-1]] += samples
+        return [
+            {"function": name, "self_samples": samples, "total_samples": total[name]}
+            for name, samples in own.most_common(_TOP_FUNCTIONS)
+        ]
+
+    def finish(self, method: str, path: str, status: int) -> None:
+        """Stop profiling and write the artifacts."""
+        self._stop.set()
+        self._sampler.join()
+        snapshot = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),)
+            )
+            if self._started_tracing:
+                tracemalloc.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "stacks.folded"), "w") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in self._stacks.items())
+        if snapshot is not None:
+            snapshot.dump(os.path.join(self.directory, "tracemalloc.snapshot"))
+            top = snapshot.statistics("lineno")[:_TOP_ALLOCATIONS]
+            with open(os.path.join(self.directory, "allocations.txt"), "w") as f:
+                f.writelines(f"{statistic}\n" for statistic in top)
+
+        summary = {
+            "profile_id": self.profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self._started) * 1000, 1),
+            "interval_ms": self.interval_s * 1000,
+            "samples": self._samples,
+            "rss_start": self._rss_start,
+            "rss_peak": max(self._rss_peak, _rss_bytes()),
+            "rss_end": _rss_bytes(),
+            "stages": [
+                {k: v for k, v in asdict(stage).items() if k != "started"}
+                for stage in self._stages
+            ],
+            "top_functions": self._top_functions(),
+        }
+        with open(os.path.join(self.directory, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        logger.info("Profile of %s %s written to %s", method, path, self.directory)
+
+
+def _stage_hook(stage: str) -> Callable[[], None] | None:
+    profile = _current.get()
+    return profile.stage_started(stage) if profile is not None else None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling the requests that carry the profile token."""
+
+    def __init__(self, app: Callable[[Scope, Receive, Send], Awaitable[None]]):
+        self.app = app
+        self.directory = utils.get_env_var(utils.PROFILE_DIR)
+        self.token = utils.get_env_var(utils.PROFILE_TOKEN).encode()
+        self.interval_s = (
+            utils.get_env_float(utils.PROFILE_INTERVAL_MS, DEFAULT_PROFILE_INTERVAL_MS)
+            / 1000
+        )
+        metrics.set_stage_hook(_stage_hook)
+
+    def _requested(self, scope: Scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            logger.warning(
+                "Already profiling a request, not profiling %s", scope["path"]
+            )
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profile = Profile(self.directory, self.interval_s)
+            status = 500
+
+            async def send_with_id(message: dict[str, Any]) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = [
+                        *message.get("headers", []),
+                        (b"x-profile-id", profile.profile_id.encode()),
+                    ]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            profile.start()
+            token = _current.set(profile)
+            try:
+                # Returns once the whole response, streamed or not, is sent
+                await self.app(scope, receive, send_with_id)
+            finally:
+                _current.reset(token)
+                await asyncio.to_thread(
+                    profile.finish, scope["method"], scope["path"], status
+                )
+        finally:
+            _busy.release()
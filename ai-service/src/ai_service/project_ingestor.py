@@ -3,9 +3,7 @@ import os
 import tempfile
 import shutil
 
-from ai_service import errors
-
-from git import Repo, GitCommandError
+from ai_service import errors, metrics, repo_mirrors
 
 logger = logging.getLogger(__name__)
 
@@ -56,10 +54,18 @@ def clone_github_repo(canonical_github_url: str) -> str:
     """
     Clones a GitHub repo to a temporary directory.
     Returns the path to the cloned directory.
+    With REPO_MIRROR_PATH set, checks it out from a cached mirror instead.
     """
+    if repo_mirrors.is_enabled():
+        return repo_mirrors.checkout(canonical_github_url)
+
+    # GitPython is imported on first use to keep it off the startup path
+    from git import Repo, GitCommandError
+
     clone_to = tempfile.mkdtemp()
     try:
-        Repo.clone_from(canonical_github_url, clone_to)
+        with metrics.timed("clone"):
+            Repo.clone_from(canonical_github_url, clone_to)
     except GitCommandError as e:
         shutil.rmtree(clone_to, ignore_errors=True)
         raise errors.GitCloneError.failed(e) from e
@@ -67,6 +73,29 @@ def clone_github_repo(canonical_github_url: str) -> str:
         return clone_to
 
 
+def head_commit(project_dir: str) -> str:
+    """
+    Returns the SHA of the commit checked out in a cloned repo.
+    """
+    from git import Repo
+
+    return Repo(project_dir).head.commit.hexsha
+
+
+def checkout_commit(project_dir: str, commit_sha: str) -> bool:
+    """
+    Checks out a given commit in a cloned repo.
+    Returns False if the repo doesn't have it (e.g. after a force push).
+    """
+    from git import GitCommandError, Repo
+
+    try:
+        Repo(project_dir).git.checkout("--detach", commit_sha)
+    except GitCommandError:
+        return False
+    return True
+
+
 def scan_code_files(root_dir: str) -> list[str]:
     """
     Scans the project directory for code files with given extensions.
@@ -74,10 +103,11 @@ def scan_code_files(root_dir: str) -> list[str]:
     """
     logger.info("Scanning project directory ...")
     code_files: list[str] = []
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            if any(file.endswith(ext) for ext in CODE_EXTENSIONS):
-                code_files.append(os.path.join(root, file))
+    with metrics.timed("scan"):
+        for root, _, files in os.walk(root_dir):
+            for file in files:
+                if any(file.endswith(ext) for ext in CODE_EXTENSIONS):
+                    code_files.append(os.path.join(root, file))
     return code_files
 
 
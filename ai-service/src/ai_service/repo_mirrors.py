@@ -0,0 +1,201 @@
+"""
+Persistent cache of bare mirrors of ingested repositories.
+
+Enabled by setting REPO_MIRROR_PATH. The first ingest of a repository clones
+it with `git clone --mirror` into `<REPO_MIRROR_PATH>/mirrors`; later ingests
+only fetch what changed since. Either way, the files to ingest are checked out
+from the mirror into a temporary `git worktree`, which shares the mirror's
+objects instead of copying them.
+
+Each mirror has a lock file in `<REPO_MIRROR_PATH>/locks`, held exclusively
+(across threads and processes) while it is cloned, fetched, given a worktree
+or deleted, so concurrent ingests of one repository take turns instead of
+corrupting it. Once the mirrors take more than REPO_MIRROR_MAX_BYTES, the
+least recently used ones are deleted, except those in use.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import urlparse
+
+from ai_service import errors, metrics, utils
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 5 * 1024**3
+
+
+def is_enabled() -> bool:
+    return bool(os.getenv(utils.REPO_MIRROR_PATH))
+
+
+def _root() -> str:
+    return utils.get_env_var(utils.REPO_MIRROR_PATH)
+
+
+def _key(canonical_github_url: str) -> str:
+    """Directory name of a repository's mirror: readable, and unique per URL."""
+    digest = hashlib.sha256(canonical_github_url.encode("utf-8")).hexdigest()[:16]
+    # "owner_repo" of ".../owner/repo(.git)"
+    path = urlparse(canonical_github_url).path.strip("/").removesuffix(".git")
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", "_".join(path.split("/")[-2:]))
+    return f"{name}-{digest}"
+
+
+def _mirror_dir(key: str) -> str:
+    return os.path.join(_root(), "mirrors", f"{key}.git")
+
+
+@contextmanager
+def _locked(key: str, blocking: bool = True) -> Iterator[bool]:
+    """Hold a mirror's lock; yields False if `blocking` is off and it's taken."""
+    locks = os.path.join(_root(), "locks")
+    os.makedirs(locks, exist_ok=True)
+    # Lock files are never deleted: removing one that another process just
+    # opened would let two processes hold "the" lock at once
+    with open(os.path.join(locks, f"{key}.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def _clone_mirror(canonical_github_url: str, mirror_dir: str) -> None:
+    from git import Repo
+
+    # Clone next to the final place, so a failed clone never looks like a mirror
+    os.makedirs(os.path.dirname(mirror_dir), exist_ok=True)
+    partial = tempfile.mkdtemp(dir=os.path.dirname(mirror_dir), prefix=".partial-")
+    try:
+        Repo.clone_from(canonical_github_url, partial, mirror=True)
+        os.replace(partial, mirror_dir)
+    finally:
+        shutil.rmtree(partial, ignore_errors=True)
+
+
+def _update_mirror(canonical_github_url: str, mirror_dir: str) -> None:
+    """Fetch into an existing mirror, or clone a fresh one."""
+    from git import GitCommandError, Repo
+
+    if os.path.isdir(mirror_dir):
+        try:
+            Repo(mirror_dir).git.fetch("--prune", "origin")
+            metrics.count("repo_mirror_hits")
+            return
+        except GitCommandError:
+            # A mirror broken by e.g. an interrupted fetch is cloned again
+            logger.warning("Fetch into %s failed, cloning it again", mirror_dir)
+            shutil.rmtree(mirror_dir, ignore_errors=True)
+    metrics.count("repo_mirror_misses")
+    _clone_mirror(canonical_github_url, mirror_dir)
+
+
+def checkout(canonical_github_url: str) -> str:
+    """
+    Check a repository's default branch out into a temporary directory.
+
+    The directory is a worktree of the repository's mirror, which is cloned
+    or fetched first. Remove it with `project_ingestor.cleanup_dir` when done.
+
+    Returns:
+        Path to the checked out files.
+
+    Raises:
+        GitCloneError: If the repository can't be cloned or fetched.
+    """
+    from git import GitCommandError, Repo
+
+    key = _key(canonical_github_url)
+    mirror_dir = _mirror_dir(key)
+    worktree = tempfile.mkdtemp()
+    try:
+        with _locked(key):
+            with metrics.timed("clone"):
+                _update_mirror(canonical_github_url, mirror_dir)
+                repo = Repo(mirror_dir)
+                # Forget the worktrees of earlier ingests, whose directories
+                # were deleted when they finished
+                repo.git.worktree("prune")
+                repo.git.worktree("add", "--detach", worktree, "HEAD")
+            # The directory's mtime is when the mirror was last used
+            os.utime(mirror_dir)
+    except (GitCommandError, OSError) as e:
+        shutil.rmtree(worktree, ignore_errors=True)
+        raise errors.GitCloneError.failed(e) from e
+
+    try:
+        evict(keep=key)
+    except OSError:
+        logger.exception("Failed to evict repository mirrors")
+    return worktree
+
+
+def _size_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _in_use(mirror_dir: str) -> bool:
+    """Whether a worktree of the mirror still exists, i.e. an ingest is reading it."""
+    from git import GitCommandError, Repo
+
+    try:
+        Repo(mirror_dir).git.worktree("prune")
+    except GitCommandError:
+        # Broken beyond use, so nothing can be reading it
+        return False
+    worktrees = os.path.join(mirror_dir, "worktrees")
+    return os.path.isdir(worktrees) and bool(os.listdir(worktrees))
+
+
+def evict(keep: str | None = None) -> list[str]:
+    """
+    Delete least recently used mirrors until they fit in REPO_MIRROR_MAX_BYTES.
+
+    Mirrors that are locked, have a worktree, or are `keep` stay.
+
+    Returns:
+        Directory names of the deleted mirrors.
+    """
+    max_bytes = utils.get_env_int(utils.REPO_MIRROR_MAX_BYTES, DEFAULT_MAX_BYTES)
+    mirrors = os.path.join(_root(), "mirrors")
+    if not os.path.isdir(mirrors):
+        return []
+    entries = []
+    for name in os.listdir(mirrors):
+        path = os.path.join(mirrors, name)
+        if name.endswith(".git") and os.path.isdir(path):
+            entries.append((os.stat(path).st_mtime, name, _size_bytes(path)))
+    total = sum(size for _, _, size in entries)
+
+    evicted: list[str] = []
+    for _, name, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        key = name.removesuffix(".git")
+        if key == keep:
+            continue
+        with _locked(key, blocking=False) as acquired:
+            path = os.path.join(mirrors, name)
+            if not acquired or not os.path.isdir(path) or _in_use(path):
+                continue
+            shutil.rmtree(path)
+        total -= size
+        evicted.append(name)
+        logger.info("Evicted repository mirror %s (%d bytes)", name, size)
+    return evicted
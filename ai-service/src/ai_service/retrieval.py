@@ -0,0 +1,161 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple
+
+from ai_service import metrics, utils
+from ai_service.db_setup import set_repo_context, query_chunks_batch
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on repositories searched at the same time for one question
+DEFAULT_RETRIEVAL_MAX_WORKERS = 8
+
+_executor: ThreadPoolExecutor | None = None
+
+
+class Snippet(NamedTuple):
+    """A retrieved chunk together with where it came from and how close it is."""
+
+    repo_url: str
+    document: str
+    metadata: dict[str, Any]
+    distance: float
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared pool used to fan out collection queries across repositories."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=utils.get_env_int(
+                utils.RETRIEVAL_MAX_WORKERS, DEFAULT_RETRIEVAL_MAX_WORKERS
+            ),
+            thread_name_prefix="retrieval",
+        )
+    return _executor
+
+
+def _query_repo(
+    repo_url: str,
+    query_embeddings: list[list[float]],
+    number_of_results: int,
+) -> list[list[Snippet]]:
+    """Query the collection of one repository, one list of snippets per query."""
+    set_repo_context(repo_url)
+    results = query_chunks_batch(query_embeddings, number_of_results)
+    empty = [[]] * len(query_embeddings)
+    per_query: list[list[Snippet]] = []
+    for documents, metadatas, distances in zip(
+        results.get("documents") or empty,
+        results.get("metadatas") or empty,
+        results.get("distances") or empty,
+    ):
+        metadatas = metadatas or [{}] * len(documents)
+        distances = distances or [0.0] * len(documents)
+        per_query.append(
+            [
+                Snippet(repo_url, document, metadata or {}, float(distance))
+                for document, metadata, distance in zip(documents, metadatas, distances)
+                if document
+            ]
+        )
+    return per_query
+
+
+def _merge(per_repo: list[list[Snippet]]) -> list[Snippet]:
+    """Snippets of all repositories by distance, with duplicate documents removed."""
+    merged = sorted(
+        (snippet for snippets in per_repo for snippet in snippets),
+        key=lambda snippet: snippet.distance,
+    )
+    seen: set[str] = set()
+    unique: list[Snippet] = []
+    for snippet in merged:
+        if snippet.document not in seen:
+            seen.add(snippet.document)
+            unique.append(snippet)
+    return unique
+
+
+def retrieve_snippets(
+    query_embedding: list[float],
+    repo_urls: list[str],
+    number_of_results: int = 4,
+) -> list[Snippet]:
+    """
+    Search one or more repositories with a single query embedding.
+
+    Repositories are queried in parallel, so the latency stays close to that
+    of the slowest single collection instead of growing with their number.
+
+    Args:
+        query_embedding: The embedded user question (computed once).
+        repo_urls: Repositories to search.
+        number_of_results: Number of chunks to retrieve per repository.
+
+    Returns:
+        Snippets from all repositories, most relevant (smallest distance) first,
+        with duplicate documents removed.
+
+    Raises:
+        DatabaseError: If querying any of the collections fails.
+    """
+    return retrieve_snippets_batch([query_embedding], repo_urls, number_of_results)[0]
+
+
+def retrieve_snippets_batch(
+    query_embeddings: list[list[float]],
+    repo_urls: list[str],
+    number_of_results: int = 4,
+) -> list[list[Snippet]]:
+    """
+    Search one or more repositories for several questions at once.
+
+    Each repository gets one multi-query lookup for all the questions, and
+    the repositories are queried in parallel.
+
+    Returns:
+        For each query, in order, the snippets `retrieve_snippets` would return.
+
+    Raises:
+        DatabaseError: If querying any of the collections fails.
+    """
+    with metrics.timed("vector_search"):
+        per_repo = _query_repos(query_embeddings, repo_urls, number_of_results)
+
+    per_query = [
+        _merge([repo_rows[row] for repo_rows in per_repo])
+        for row in range(len(query_embeddings))
+    ]
+    logger.info(
+        "Retrieved %d snippets for %d queries from %d repositories",
+        sum(len(snippets) for snippets in per_query),
+        len(query_embeddings),
+        len(repo_urls),
+    )
+    return per_query
+
+
+def _query_repos(
+    query_embeddings: list[list[float]],
+    repo_urls: list[str],
+    number_of_results: int,
+) -> list[list[list[Snippet]]]:
+    """Query every repository, in parallel if there are several."""
+    if len(repo_urls) == 1:
+        return [_query_repo(repo_urls[0], query_embeddings, number_of_results)]
+    executor = _get_executor()
+    futures = [
+        # Each task runs in its own copy of the context so that setting the
+        # repository context in one thread doesn't leak into another
+        executor.submit(
+            contextvars.copy_context().run,
+            _query_repo,
+            repo_url,
+            query_embeddings,
+            number_of_results,
+        )
+        for repo_url in repo_urls
+    ]
+    return [future.result() for future in futures]
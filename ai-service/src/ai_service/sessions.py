@@ -0,0 +1,375 @@
+"""
+Multi-turn conversation sessions.
+
+A session keeps a fixed system prompt and the exact text of every earlier
+turn, so the messages sent for turn N start with the byte-identical messages
+of turn N-1. Ollama can then reuse the KV cache of that prefix and only has
+to process the new question (and any newly retrieved context).
+
+Sessions live in process memory, expire after SESSION_TTL_SECONDS without use
+and are limited to SESSION_MAX_SESSIONS (least recently used dropped first)
+and SESSION_MAX_TURNS turns each (oldest turns dropped first). With several
+worker processes (AI_SERVICE_WORKERS), any of which may receive a session's
+next question, they are kept in files under `<CHROMA_STORE_PATH>/sessions`
+instead.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass, field
+from typing import IO, Any
+
+from ai_service import errors, utils
+from ai_service.ollama_client import Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_MAX_SESSIONS = 100
+DEFAULT_SESSION_MAX_TURNS = 20
+DEFAULT_SESSION_TTL_SECONDS = 1800
+# How often a turn waiting for another worker's turn of a shared session retries
+LOCK_POLL_SECONDS = 0.05
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+_STORE_LOCK = ".store.lock"
+
+# Identifies a retrieved chunk, so it is sent once per session
+ChunkKey = tuple[str, str]  # (repo_url, document)
+
+
+@dataclass(frozen=True)
+class Turn:
+    """One question and answer, exactly as sent to and received from the LLM."""
+
+    user_message: str
+    answer: str
+    chunks: frozenset[ChunkKey] = frozenset()
+
+
+@dataclass
+class Session:
+    session_id: str
+    repo_urls: list[str]
+    system_prompt: str
+    turns: list[Turn] = field(default_factory=list)
+    last_used: float = field(default_factory=time.time)
+    # Serializes the turns of one conversation
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def messages(self, user_message: str) -> list[Message]:
+        """The conversation so far followed by a new user message."""
+        messages: list[Message] = [{"role": "system", "content": self.system_prompt}]
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.user_message})
+            messages.append({"role": "assistant", "content": turn.answer})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def sent_chunks(self) -> set[ChunkKey]:
+        """Chunks already in the conversation's context."""
+        return set().union(*(turn.chunks for turn in self.turns))
+
+
+class SessionStore:
+    """In-process sessions with TTL, count and length limits."""
+
+    def __init__(self, max_sessions: int, max_turns: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        # Least recently used first
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+    def _expire(self, now: float) -> None:
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.ttl_seconds:
+                del self._sessions[session_id]
+                logger.info("Session %s expired", session_id)
+
+    def create(self, repo_urls: list[str], system_prompt: str) -> Session:
+        """Start a session, dropping the least recently used ones over the limit."""
+        self._expire(time.time())
+        session = Session(uuid.uuid4().hex, repo_urls, system_prompt)
+        self._sessions[session.session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            dropped, _ = self._sessions.popitem(last=False)
+            logger.info("Session %s dropped over SESSION_MAX_SESSIONS", dropped)
+        return session
+
+    def get(self, session_id: str) -> Session:
+        """
+        A live session, marked as used.
+
+        Raises:
+            NotFound: If the session doesn't exist or has expired.
+        """
+        now = time.time()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise errors.NotFound.session(session_id)
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def add_turn(self, session: Session, turn: Turn) -> None:
+        """
+        Append a turn, dropping the oldest ones over the limit.
+
+        Dropping a turn changes the start of the conversation, so the next
+        request can't reuse the cached prefix and is processed in full once.
+        """
+        session.turns.append(turn)
+        if len(session.turns) > self.max_turns:
+            del session.turns[: len(session.turns) - self.max_turns]
+        session.last_used = time.time()
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def turn_lock(self, session: Session) -> AbstractAsyncContextManager[Any]:
+        """Held while a turn is answered, so the turns of a session take turns."""
+        return session.lock
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Sessions in files, shared by all worker processes.
+
+    Each session is `<directory>/<session_id>.json`, atomically replaced on
+    write; the file's mtime is when the session was last used. A turn holds
+    the session's lock file, so turns are serialized across processes too.
+
+    Removing a session leaves its lock file, which a turn may hold or be about
+    to open. Lock files of removed sessions are collected while holding the
+    store-wide lock exclusively; a turn holds it shared while it opens and
+    locks its session's lock file, so it never locks a file being deleted.
+    """
+
+    def __init__(
+        self, directory: str, max_sessions: int, max_turns: int, ttl_seconds: float
+    ):
+        super().__init__(max_sessions, max_turns, ttl_seconds)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str, suffix: str = ".json") -> str:
+        # Session ids come from URLs: only ones this store could create name a file
+        if not _SESSION_ID.fullmatch(session_id):
+            raise errors.NotFound.session(session_id)
+        return os.path.join(self.directory, f"{session_id}{suffix}")
+
+    def _read(self, session_id: str) -> Session | None:
+        path = self._path(session_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            last_used = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        turns = [
+            Turn(
+                turn["user_message"],
+                turn["answer"],
+                frozenset(
+                    (repo_url, document) for repo_url, document in turn["chunks"]
+                ),
+            )
+            for turn in data["turns"]
+        ]
+        return Session(
+            data["session_id"],
+            data["repo_urls"],
+            data["system_prompt"],
+            turns=turns,
+            last_used=last_used,
+        )
+
+    def _write(self, session: Session) -> None:
+        path = self._path(session.session_id)
+        data = {
+            "session_id": session.session_id,
+            "repo_urls": session.repo_urls,
+            "system_prompt": session.system_prompt,
+            "turns": [
+                {
+                    "user_message": turn.user_message,
+                    "answer": turn.answer,
+                    "chunks": sorted(turn.chunks),
+                }
+                for turn in session.turns
+            ],
+        }
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        os.utime(path, (session.last_used, session.last_used))
+
+    def _remove(self, session_id: str) -> bool:
+        # Only the state: the lock file is left to _collect_locks
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store_lock(self) -> IO[str]:
+        """Open the store-wide lock file, never deleted."""
+        return open(os.path.join(self.directory, _STORE_LOCK), "w")
+
+    def _collect_locks(self) -> None:
+        """Delete the lock files of removed sessions that no turn holds."""
+        with self.store_lock() as store_lock:
+            try:
+                fcntl.flock(store_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # A turn is taking its lock; collect next time
+            for name in os.listdir(self.directory):
+                session_id = name.removesuffix(".lock")
+                if not (name.endswith(".lock") and _SESSION_ID.fullmatch(session_id)):
+                    continue
+                if os.path.exists(self._path(session_id)):
+                    continue
+                with open(self._path(session_id, ".lock"), "w") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # A turn of the removed session is finishing
+                    os.remove(self._path(session_id, ".lock"))
+
+    def _by_last_use(self) -> list[tuple[float, str]]:
+        """(last used, session id) of all sessions, least recently used first."""
+        sessions = []
+        for name in os.listdir(self.directory):
+            session_id = name.removesuffix(".json")
+            if not (name.endswith(".json") and _SESSION_ID.fullmatch(session_id)):
+                continue
+            try:
+                mtime = os.stat(os.path.join(self.directory, name)).st_mtime
+            except FileNotFoundError:
+                continue
+            sessions.append((mtime, session_id))
+        return sorted(sessions)
+
+    def _expire(self, now: float) -> None:
+        for last_used, session_id in self._by_last_use():
+            if now - last_used > self.ttl_seconds and self._remove(session_id):
+                logger.info("Session %s expired", session_id)
+        self._collect_locks()
+
+    def create(self, repo_urls: list[str], system_prompt: str) -> Session:
+        self._expire(time.time())
+        session = Session(uuid.uuid4().hex, repo_urls, system_prompt)
+        self._write(session)
+        others = [
+            session_id
+            for _, session_id in self._by_last_use()
+            if session_id != session.session_id
+        ]
+        for dropped in others[: max(0, len(others) + 1 - self.max_sessions)]:
+            if self._remove(dropped):
+                logger.info("Session %s dropped over SESSION_MAX_SESSIONS", dropped)
+        return session
+
+    def get(self, session_id: str) -> Session:
+        now = time.time()
+        self._expire(now)
+        session = self._read(session_id)
+        if session is None:
+            raise errors.NotFound.session(session_id)
+        try:
+            os.utime(self._path(session_id), (now, now))
+        except FileNotFoundError:
+            raise errors.NotFound.session(session_id) from None
+        session.last_used = now
+        return session
+
+    def add_turn(self, session: Session, turn: Turn) -> None:
+        # Under the turn lock, so the file holds every earlier turn
+        latest = self._read(session.session_id)
+        if latest is None:
+            # Deleted or expired while this turn was answered
+            return
+        session.turns = latest.turns
+        super().add_turn(session, turn)
+        self._write(session)
+
+    def delete(self, session_id: str) -> bool:
+        return self._remove(session_id)
+
+    def turn_lock(self, session: Session) -> AbstractAsyncContextManager[Any]:
+        return _SharedTurnLock(self, session)
+
+
+class _SharedTurnLock:
+    """A shared session's lock file; on entry, picks up turns other workers added."""
+
+    def __init__(self, store: SharedSessionStore, session: Session):
+        self._store = store
+        self._session = session
+
+    async def __aenter__(self) -> None:
+        # flock conflicts between open files, even of one process, so this
+        # serializes the turns of coroutines as well as of workers
+        path = self._store._path(self._session.session_id, ".lock")
+        while True:
+            with self._store.store_lock() as store_lock:
+                # Shared, so lock files aren't collected while one is opened
+                if self._try_flock(store_lock, fcntl.LOCK_SH):
+                    self._file = open(path, "w")
+                    if self._try_flock(self._file, fcntl.LOCK_EX):
+                        break
+                    # Not kept open unlocked: it could be collected meanwhile
+                    self._file.close()
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+        latest = self._store._read(self._session.session_id)
+        if latest is not None:
+            self._session.turns = latest.turns
+
+    async def __aexit__(self, *_exc_info: Any) -> None:
+        self._file.close()
+
+    @staticmethod
+    def _try_flock(file: IO[str], operation: int) -> bool:
+        try:
+            fcntl.flock(file, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+
+_store: SessionStore | None = None
+
+
+def get_store() -> SessionStore:
+    """The process-wide session store, configured from the environment."""
+    global _store
+    if _store is None:
+        limits: dict[str, Any] = dict(
+            max_sessions=utils.get_env_int(
+                utils.SESSION_MAX_SESSIONS, DEFAULT_SESSION_MAX_SESSIONS
+            ),
+            max_turns=utils.get_env_int(
+                utils.SESSION_MAX_TURNS, DEFAULT_SESSION_MAX_TURNS
+            ),
+            ttl_seconds=utils.get_env_int(
+                utils.SESSION_TTL_SECONDS, DEFAULT_SESSION_TTL_SECONDS
+            ),
+        )
+        if utils.get_env_int(utils.AI_SERVICE_WORKERS, 1) > 1:
+            # Any worker may receive a session's next question
+            directory = os.path.join(
+                utils.get_env_var(utils.CHROMA_STORE_PATH), "sessions"
+            )
+            _store = SharedSessionStore(directory, **limits)
+        else:
+            _store = SessionStore(**limits)
+    return _store
@@ -0,0 +1,100 @@
+"""
+Coalescing of identical concurrent work.
+
+The first caller for a key (the leader) starts the work; callers arriving
+while it runs (followers) wait for the same result, or replay and follow the
+same stream, instead of starting it again. The work runs in its own task, so
+a caller that disconnects doesn't cancel it for the others.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Generic, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Broadcast(Generic[T]):
+    """Buffers the items of one async iterator and replays them to every subscriber."""
+
+    def __init__(self, source: AsyncIterator[T]) -> None:
+        self._items: list[T] = []
+        self._error: BaseException | None = None
+        self._done = False
+        self._changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[T]) -> None:
+        try:
+            async for item in source:
+                self._items.append(item)
+                async with self._changed:
+                    self._changed.notify_all()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[T]:
+        position = 0
+        while True:
+            while position < len(self._items):
+                yield self._items[position]
+                position += 1
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: self._done or len(self._items) > position
+                )
+
+
+class SingleFlight:
+    """Runs at most one call (or stream) per key at a time and shares its outcome."""
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._streams: dict[Hashable, _Broadcast] = {}
+
+    def _forget(self, registry: dict, key: Hashable, value: object) -> None:
+        if registry.get(key) is value:
+            del registry[key]
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Await `call()`, or the identical call already in flight for `key`."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(self._calls, key, task))
+        else:
+            logger.info("Joined in-flight %s request", self._name)
+        # Shielded, so a follower (or the leader) going away doesn't cancel it
+        return await asyncio.shield(task)
+
+    def stream(
+        self, key: Hashable, start: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        """
+        Iterate `start()`, or join the identical stream already in flight for `key`.
+
+        Followers first receive everything the stream produced so far, then
+        follow it live. Errors raised by the stream reach every subscriber.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(start())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(
+                lambda _: self._forget(self._streams, key, broadcast)
+            )
+        else:
+            logger.info("Joined in-flight %s stream", self._name)
+        return broadcast.subscribe()
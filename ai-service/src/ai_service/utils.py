@@ -6,7 +6,47 @@ CHROMA_STORE_PATH: Final[str] = "CHROMA_STORE_PATH"
 LLM_MODEL: Final[str] = "LLM_MODEL"
 EMBEDDING_MODEL: Final[str] = "EMBEDDING_MODEL"
 AI_SERVICE_PORT: Final[str] = "AI_SERVICE_PORT"
-MAX_CONTEXT_LENGTH: Final[str] = "MAX_CONTEXT_LENGTH"
+AI_SERVICE_WORKERS: Final[str] = "AI_SERVICE_WORKERS"
+CHROMA_SERVER_URL: Final[str] = "CHROMA_SERVER_URL"
+EMBEDDING_SERVER_SOCKET: Final[str] = "EMBEDDING_SERVER_SOCKET"
+EMBEDDING_SERVER_DOCUMENT_BATCH: Final[str] = "EMBEDDING_SERVER_DOCUMENT_BATCH"
+EMBEDDING_SERVER_QUERY_BATCH: Final[str] = "EMBEDDING_SERVER_QUERY_BATCH"
+MAX_CONTEXT_TOKENS: Final[str] = "MAX_CONTEXT_TOKENS"
+TWO_STAGE_MIN_CHUNKS: Final[str] = "TWO_STAGE_MIN_CHUNKS"
+TWO_STAGE_TOP_FILES: Final[str] = "TWO_STAGE_TOP_FILES"
+VECTOR_BACKEND: Final[str] = "VECTOR_BACKEND"
+NUMPY_BACKEND_MAX_CHUNKS: Final[str] = "NUMPY_BACKEND_MAX_CHUNKS"
+RETRIEVAL_MAX_WORKERS: Final[str] = "RETRIEVAL_MAX_WORKERS"
+NEAR_DUPLICATE_THRESHOLD: Final[str] = "NEAR_DUPLICATE_THRESHOLD"
+INGEST_CHECKPOINT_FILES: Final[str] = "INGEST_CHECKPOINT_FILES"
+MAX_COLLECTIONS: Final[str] = "MAX_COLLECTIONS"
+MAX_STORE_BYTES: Final[str] = "MAX_STORE_BYTES"
+EVICTION_INTERVAL_SECONDS: Final[str] = "EVICTION_INTERVAL_SECONDS"
+SNAPSHOT_STORE_PATH: Final[str] = "SNAPSHOT_STORE_PATH"
+REPO_MIRROR_PATH: Final[str] = "REPO_MIRROR_PATH"
+REPO_MIRROR_MAX_BYTES: Final[str] = "REPO_MIRROR_MAX_BYTES"
+LLM_MAX_CONCURRENCY: Final[str] = "LLM_MAX_CONCURRENCY"
+INGEST_MAX_CONCURRENCY: Final[str] = "INGEST_MAX_CONCURRENCY"
+INGEST_MAX_QUEUE: Final[str] = "INGEST_MAX_QUEUE"
+INGEST_QUEUE_TIMEOUT_SECONDS: Final[str] = "INGEST_QUEUE_TIMEOUT_SECONDS"
+ANSWER_MAX_CONCURRENCY: Final[str] = "ANSWER_MAX_CONCURRENCY"
+ANSWER_MAX_QUEUE: Final[str] = "ANSWER_MAX_QUEUE"
+ANSWER_QUEUE_TIMEOUT_SECONDS: Final[str] = "ANSWER_QUEUE_TIMEOUT_SECONDS"
+LLM_KEEP_ALIVE: Final[str] = "LLM_KEEP_ALIVE"
+METRICS_ENABLED: Final[str] = "METRICS_ENABLED"
+PROFILE_DIR: Final[str] = "PROFILE_DIR"
+PROFILE_TOKEN: Final[str] = "PROFILE_TOKEN"
+PROFILE_INTERVAL_MS: Final[str] = "PROFILE_INTERVAL_MS"
+WARMUP_ENABLED: Final[str] = "WARMUP_ENABLED"
+WARMUP_COLLECTIONS: Final[str] = "WARMUP_COLLECTIONS"
+ANSWER_CACHE_MAX_ENTRIES: Final[str] = "ANSWER_CACHE_MAX_ENTRIES"
+ANSWER_CACHE_TTL_SECONDS: Final[str] = "ANSWER_CACHE_TTL_SECONDS"
+ANSWER_CACHE_THRESHOLD: Final[str] = "ANSWER_CACHE_THRESHOLD"
+ANSWER_BATCH_MAX_QUESTIONS: Final[str] = "ANSWER_BATCH_MAX_QUESTIONS"
+ANSWER_BATCH_PARALLELISM: Final[str] = "ANSWER_BATCH_PARALLELISM"
+SESSION_MAX_SESSIONS: Final[str] = "SESSION_MAX_SESSIONS"
+SESSION_MAX_TURNS: Final[str] = "SESSION_MAX_TURNS"
+SESSION_TTL_SECONDS: Final[str] = "SESSION_TTL_SECONDS"
 
 
 def get_env_var(name: str) -> str:
@@ -28,6 +68,78 @@ def get_env_var(name: str) -> str:
     return value
 
 
+def get_env_int(name: str, default: int) -> int:
+    """
+    Retrieve an optional integer environment variable.
+
+    Args:
+        name: Name of the environment variable.
+        default: Value used when the variable is not set.
+
+    Returns:
+        The parsed integer value, or the default.
+
+    Raises:
+        InvalidParam: If the variable is set but is not an integer.
+    """
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError as e:
+        raise errors.InvalidParam.invalid_env_value(name, value) from e
+
+
+def get_env_float(name: str, default: float) -> float:
+    """
+    Retrieve an optional floating-point environment variable.
+
+    Args:
+        name: Name of the environment variable.
+        default: Value used when the variable is not set.
+
+    Returns:
+        The parsed float value, or the default.
+
+    Raises:
+        InvalidParam: If the variable is set but is not a number.
+    """
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError as e:
+        raise errors.InvalidParam.invalid_env_value(name, value) from e
+
+
+def get_env_flag(name: str, default: bool) -> bool:
+    """
+    Retrieve an optional on/off environment variable.
+
+    Args:
+        name: Name of the environment variable.
+        default: Value used when the variable is not set.
+
+    Returns:
+        False for 0, false, no or off; True for 1, true, yes or on (any
+        case); otherwise the default.
+
+    Raises:
+        InvalidParam: If the variable is set to anything else.
+    """
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    flag = value.strip().lower()
+    if flag in ("1", "true", "yes", "on"):
+        return True
+    if flag in ("0", "false", "no", "off"):
+        return False
+    raise errors.InvalidParam.invalid_env_value(name, value)
+
+
 def is_development() -> bool:
     """Check if running in development environment."""
     return os.getenv("ENVIRONMENT", "production").lower() == "development"
@@ -0,0 +1,99 @@
+"""
+Startup warm-up.
+
+Runs the first embedding forward pass, opens the collections of the most
+asked-about repositories and has Ollama load the model, so that the first
+questions after a deploy don't pay for it. `/ready` reports ready only once
+it has finished; `/health` keeps reporting that the process is up.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from ai_service import ollama_client, utils
+from ai_service.db_setup import get_collection, is_stored, set_repo_context
+from ai_service.embeddings import embed_query
+
+logger = logging.getLogger(__name__)
+
+_ready = False
+# Outcome and duration of every warm-up step, reported by /ready
+_steps: dict[str, dict[str, Any]] = {}
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def status() -> dict[str, Any]:
+    return {"ready": is_ready(), "warmup": _steps}
+
+
+def _hot_collections() -> list[str]:
+    """Repositories listed in WARMUP_COLLECTIONS (comma-separated)."""
+    value = os.getenv(utils.WARMUP_COLLECTIONS, "")
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+def _preload_collections(query_embedding: list[float]) -> list[str]:
+    """
+    Query each hot collection once, so its index is loaded from disk.
+
+    The collections are queried directly rather than through retrieval, so
+    warm-up isn't recorded as a query and doesn't reorder eviction.
+    """
+    loaded = []
+    for repo_url in _hot_collections():
+        if not is_stored(repo_url):
+            logger.warning("Warm-up: %s is not stored, skipping", repo_url)
+            continue
+        set_repo_context(repo_url)
+        get_collection().query(query_embeddings=[query_embedding], n_results=1)
+        loaded.append(repo_url)
+    return loaded
+
+
+async def _step(name: str, run: Callable[[], Awaitable[Any]]) -> Any:
+    """Run one warm-up step, recording its outcome. Failures don't stop warm-up."""
+    started = time.perf_counter()
+    try:
+        result = await run()
+    except Exception as e:
+        logger.warning("Warm-up step %s failed: %s", name, e)
+        _steps[name] = {"ok": False, "error": str(e)}
+        return None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info("Warm-up step %s done in %.0f ms", name, elapsed_ms)
+    _steps[name] = {"ok": True, "ms": round(elapsed_ms)}
+    return result
+
+
+async def warm_up() -> None:
+    """
+    Warm up the service, then mark it ready.
+
+    Disabled with WARMUP_ENABLED=0 (or false), in which case the service is ready at once.
+    A failed step is logged and reported by /ready but doesn't keep the service
+    from becoming ready: it can still serve what doesn't depend on that step.
+    """
+    global _ready
+    _ready = False
+    _steps.clear()
+    try:
+        if not utils.get_env_flag(utils.WARMUP_ENABLED, True):
+            return
+        # Blocking work runs in a thread so /health stays responsive meanwhile
+        query_embedding = await _step(
+            "embedding_model", lambda: asyncio.to_thread(embed_query, "warm up")
+        )
+        if query_embedding is not None and _hot_collections():
+            await _step(
+                "collections",
+                lambda: asyncio.to_thread(_preload_collections, query_embedding),
+            )
+        await _step("llm", ollama_client.load_model)
+    finally:
+        _ready = True
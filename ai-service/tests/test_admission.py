@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from ai_service import errors, metrics
+from ai_service.admission import AdmissionMiddleware, Limiter, endpoint_group
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_waiters_get_slots_in_arrival_order():
+    order: list[int] = []
+
+    async def request(limiter: Limiter, number: int) -> None:
+        await limiter.acquire()
+        order.append(number)
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)
+
+    async def run() -> Limiter:
+        limiter = Limiter("answer", max_concurrency=1, max_queue=10, queue_timeout_s=5)
+        await asyncio.gather(*(request(limiter, n) for n in range(5)))
+        return limiter
+
+    limiter = asyncio.run(run())
+
+    assert order == [0, 1, 2, 3, 4]
+    assert (limiter.active, limiter.waiting) == (0, 0)
+
+
+def test_full_queue_is_rejected_at_once():
+    async def run() -> errors.Overloaded:
+        limiter = Limiter("ingest", max_concurrency=1, max_queue=1, queue_timeout_s=5)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(errors.Overloaded) as rejected:
+            await limiter.acquire()
+        limiter.release(1.0)
+        await queued
+        assert limiter.active == 1
+        return rejected.value
+
+    error = asyncio.run(run())
+
+    assert error.status_code == 429
+    assert error.retry_after >= 1
+    assert (
+        'ai_service_admission_rejected_total{endpoint="ingest",reason="queue_full"} 1'
+        in metrics.render()
+    )
+
+
+def test_wait_past_the_deadline_is_rejected():
+    async def run() -> tuple[errors.Overloaded, Limiter]:
+        limiter = Limiter(
+            "answer", max_concurrency=1, max_queue=5, queue_timeout_s=0.05
+        )
+        await limiter.acquire()
+        with pytest.raises(errors.Overloaded) as rejected:
+            await limiter.acquire()
+        return rejected.value, limiter
+
+    error, limiter = asyncio.run(run())
+
+    assert error.status_code == 503
+    assert (limiter.active, limiter.waiting) == (1, 0)
+
+
+def test_slot_handed_over_at_the_deadline_is_passed_on(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    limiter = Limiter("answer", max_concurrency=1, max_queue=5, queue_timeout_s=5)
+
+    async def hand_over_then_time_out(awaitable, timeout: float) -> None:
+        # The running request finishes just as the waiter's deadline passes
+        limiter.release(1.0)
+        awaitable.cancel()
+        raise asyncio.TimeoutError()
+
+    async def run() -> errors.Overloaded:
+        await limiter.acquire()
+        monkeypatch.setattr(asyncio, "wait_for", hand_over_then_time_out)
+        with pytest.raises(errors.Overloaded) as rejected:
+            await limiter.acquire()
+        return rejected.value
+
+    error = asyncio.run(run())
+
+    assert error.status_code == 503
+    assert (limiter.active, limiter.waiting) == (0, 0)
+
+
+def test_retry_after_follows_hold_time():
+    limiter = Limiter("ingest", max_concurrency=2, max_queue=10, queue_timeout_s=5)
+    for _ in range(30):
+        limiter._active += 1
+        limiter.release(20.0)
+
+    # Slots held for 20 s, two of them: one frees up every 10 s
+    assert limiter.retry_after() == 10
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "group"),
+    [
+        ("POST", "/ingest", "ingest"),
+        ("POST", "/answer", "answer"),
+        ("POST", "/answer/stream", "answer"),
+        ("POST", "/answer/batch", "answer"),
+        ("POST", "/sessions/abc/answer", "answer"),
+        ("GET", "/answer/cache", None),
+        ("POST", "/sessions", None),
+        ("GET", "/health", None),
+    ],
+)
+def test_endpoint_groups(method: str, path: str, group: str | None):
+    assert endpoint_group(method, path) == group
+
+
+def test_middleware_answers_overload_with_retry_after():
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.post("/answer")
+    async def answer() -> dict[str, str]:
+        await release.wait()
+        return {"answer": "ok"}
+
+    @app.get("/health")
+    async def health_check() -> dict[str, str]:
+        return {"status": "healthy"}
+
+    limiter = Limiter("answer", max_concurrency=1, max_queue=1, queue_timeout_s=5)
+    app.add_middleware(AdmissionMiddleware, limiters={"answer": limiter})
+
+    async def run() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://t"
+        ) as client:
+            running = asyncio.create_task(client.post("/answer"))
+            queued = asyncio.create_task(client.post("/answer"))
+            while limiter.waiting < 1:
+                await asyncio.sleep(0.01)
+            rejected = await client.post("/answer")
+            # Endpoints without a limit are unaffected
+            health = await client.get("/health")
+            release.set()
+            return [await running, await queued, rejected, health]
+
+    running, queued, rejected, health = asyncio.run(run())
+
+    assert running.status_code == queued.status_code == 200
+    assert rejected.status_code == 429
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert rejected.json()["code"] == "Overloaded"
+    assert health.status_code == 200
+    assert limiter.active == 0
+    assert 'ai_service_admission_queue_depth{endpoint="answer"} 0' in metrics.render()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_service import answer_cache, errors
+from ai_service.answer_cache import CacheKey
+from ai_service.main import app
+from ai_service.retrieval import Snippet
+
+REPO = "https://github.com/test/batch.git"
+
+
+def _lines(body: str) -> list[dict[str, Any]]:
+    return sorted(
+        (json.loads(line) for line in body.splitlines()), key=lambda r: r["index"]
+    )
+
+
+def test_general_batch_streams_one_line_per_question(monkeypatch: pytest.MonkeyPatch):
+    in_flight, peak = [0], [0]
+
+    async def fake_chat(prompt: str) -> str:
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        if "fail" in prompt:
+            raise errors.LLMQueryError.query_failed(ConnectionError("down"))
+        return "ok"
+
+    monkeypatch.setattr("ai_service.ollama_client.chat_with_ollama", fake_chat)
+
+    response = TestClient(app).post(
+        "/answer/batch",
+        json={"user_questions": ["a", "b", "please fail", "d"], "parallelism": 2},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = _lines(response.text)
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["answer"] == "ok"
+    assert results[2]["code"] == "LLMQueryError"
+    assert peak[0] <= 2
+
+
+def test_repository_batch_embeds_and_retrieves_once(monkeypatch: pytest.MonkeyPatch):
+    embed_calls: list[list[str]] = []
+    retrieve_calls: list[int] = []
+
+    def fake_embed_queries(texts: list[str]) -> list[list[float]]:
+        embed_calls.append(texts)
+        return [[float(i), 1.0] for i in range(len(texts))]
+
+    def fake_retrieve(embeddings: list[list[float]], repo_urls: list[str]):
+        retrieve_calls.append(len(embeddings))
+        return [[Snippet(REPO, f"doc {e[0]}", {}, 0.1)] for e in embeddings]
+
+    async def fake_chat(prompt: str) -> str:
+        return "generated"
+
+    monkeypatch.setattr("ai_service.handlers.batch.restore_missing", lambda _: None)
+    monkeypatch.setattr("ai_service.handlers.batch.embed_queries", fake_embed_queries)
+    monkeypatch.setattr(
+        "ai_service.handlers.batch.retrieve_snippets_batch", fake_retrieve
+    )
+    monkeypatch.setattr(
+        answer_cache, "cache_key", lambda urls: CacheKey(tuple(urls), ("v1",))
+    )
+    monkeypatch.setattr(
+        answer_cache,
+        "lookup",
+        lambda key, embedding: "cached" if embedding[0] == 0.0 else None,
+    )
+    monkeypatch.setattr(answer_cache, "store", lambda *args: None)
+    monkeypatch.setattr("ai_service.ollama_client.chat_with_ollama", fake_chat)
+    monkeypatch.setattr(
+        "ai_service.handlers.answer.count_tokens", lambda text: len(text.split())
+    )
+
+    response = TestClient(app).post(
+        "/answer/batch",
+        json={"user_questions": ["q0", "q1", "q2"], "canonical_github_url": REPO},
+    )
+
+    results = _lines(response.text)
+    assert embed_calls == [["q0", "q1", "q2"]]
+    assert retrieve_calls == [2]  # The cached question isn't retrieved
+    assert [r["cached"] for r in results] == [True, False, False]
+    assert results[1]["sources"][0]["repo_url"] == REPO
+
+
+def test_rejects_empty_and_oversized_batches(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("ANSWER_BATCH_MAX_QUESTIONS", "2")
+    client = TestClient(app)
+
+    assert client.post("/answer/batch", json={"user_questions": []}).status_code == 400
+    response = client.post("/answer/batch", json={"user_questions": ["a", "b", "c"]})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pytest
+
+from ai_service import answer_cache
+from ai_service.answer_cache import AnswerCache, CacheKey
+
+REPOS = ("https://github.com/test/cache.git",)
+V1 = ("cache_abc_v1",)
+V2 = ("cache_abc_v2",)
+
+
+def _unit(*values: float) -> list[float]:
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@pytest.fixture
+def cache() -> AnswerCache:
+    return AnswerCache(max_entries=10, ttl_seconds=60, threshold=0.95)
+
+
+def test_similar_question_hits(cache: AnswerCache):
+    cache.put(REPOS, V1, "how does ingestion work?", _unit(1, 0.05), "It clones.")
+
+    assert cache.get(REPOS, V1, _unit(1, 0.1)) == "It clones."
+    assert cache.get(REPOS, V1, _unit(1, 1)) is None
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_other_repositories_miss(cache: AnswerCache):
+    cache.put(REPOS, V1, "question", _unit(1, 0), "answer")
+
+    assert cache.get(("https://github.com/test/other.git",), V1, _unit(1, 0)) is None
+
+
+def test_reingest_invalidates(cache: AnswerCache):
+    cache.put(REPOS, V1, "question", _unit(1, 0), "old answer")
+
+    assert cache.get(REPOS, V2, _unit(1, 0)) is None
+    assert cache.stats()["invalidated"] == 1
+    assert cache.get(REPOS, V1, _unit(1, 0)) is None
+
+
+def test_entries_expire(cache: AnswerCache, monkeypatch: pytest.MonkeyPatch):
+    cache.put(REPOS, V1, "question", _unit(1, 0), "answer")
+    later = time.time() + 61
+    monkeypatch.setattr("ai_service.answer_cache.time.time", lambda: later)
+
+    assert cache.get(REPOS, V1, _unit(1, 0)) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_evicted_over_limit():
+    cache = AnswerCache(max_entries=2, ttl_seconds=60, threshold=0.95)
+    cache.put(REPOS, V1, "a", _unit(1, 0, 0), "answer a")
+    cache.put(REPOS, V1, "b", _unit(0, 1, 0), "answer b")
+    assert cache.get(REPOS, V1, _unit(1, 0, 0)) == "answer a"  # a is now recent
+
+    cache.put(REPOS, V1, "c", _unit(0, 0, 1), "answer c")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get(REPOS, V1, _unit(0, 1, 0)) is None
+    assert cache.get(REPOS, V1, _unit(1, 0, 0)) == "answer a"
+
+
+def test_empty_repositories_are_forgotten(cache: AnswerCache):
+    cache.put(REPOS, V1, "question", _unit(1, 0), "answer")
+    for number in range(5):
+        cache.get((f"https://github.com/test/{number}.git",), V1, _unit(1, 0))
+    assert list(cache._repos) == [REPOS]
+
+    cache.get(REPOS, V2, _unit(1, 0))
+
+    assert cache._repos == {}
+
+
+def test_answer_from_a_replaced_version_is_not_stored(
+    cache: AnswerCache, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(answer_cache, "_cache", cache)
+    monkeypatch.setattr(answer_cache, "collection_version", lambda url: V2[0])
+    answer_cache.store(CacheKey(REPOS, V2), "question", _unit(1, 0), "new answer")
+
+    # Started before the re-ingest, finished after it
+    answer_cache.store(CacheKey(REPOS, V1), "question", _unit(0, 1), "old answer")
+
+    assert cache.get(REPOS, V2, _unit(1, 0)) == "new answer"
+    assert cache.get(REPOS, V2, _unit(0, 1)) is None
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,83 @@
+import json
+from typing import Any, AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_service import errors, metrics
+from ai_service.main import app
+
+
+def _events(body: str) -> list[tuple[str, dict[str, Any]]]:
+    events: list[tuple[str, dict[str, Any]]] = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+def test_answer_stream_sends_context_tokens_and_timing(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    async def fake_stream(prompt: str) -> AsyncIterator[str]:
+        for token in ["Hello", " there", "!"]:
+            yield token
+
+    monkeypatch.setattr("ai_service.ollama_client.stream_chat_with_ollama", fake_stream)
+
+    response = TestClient(app).post(
+        "/answer/stream", json={"user_question": "Hi, how are you?"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert events[0] == (
+        "context",
+        {"repositories": [], "sources": [], "cached": False},
+    )
+    assert [data["content"] for name, data in events if name == "token"] == [
+        "Hello",
+        " there",
+        "!",
+    ]
+    name, timing = events[-1]
+    assert name == "done"
+    assert 0 <= timing["ttft_ms"] <= timing["total_ms"]
+
+
+def test_answer_stream_records_time_to_first_token(monkeypatch: pytest.MonkeyPatch):
+    async def fake_stream(prompt: str) -> AsyncIterator[str]:
+        for token in ["Hello", "!"]:
+            yield token
+
+    monkeypatch.setattr("ai_service.ollama_client.stream_chat_with_ollama", fake_stream)
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    metrics.reset()
+
+    TestClient(app).post("/answer/stream", json={"user_question": "Hi there?"})
+
+    text = metrics.render()
+    metrics.reset()
+    assert (
+        'ai_service_stage_duration_seconds_count{stage="time_to_first_token"} 1' in text
+    )
+
+
+def test_answer_stream_reports_llm_failure_in_band(monkeypatch: pytest.MonkeyPatch):
+    async def failing_stream(prompt: str) -> AsyncIterator[str]:
+        yield "Partial"
+        raise errors.LLMQueryError.query_failed(ConnectionError("Ollama went away"))
+
+    monkeypatch.setattr(
+        "ai_service.ollama_client.stream_chat_with_ollama", failing_stream
+    )
+
+    response = TestClient(app).post(
+        "/answer/stream", json={"user_question": "Hi, how are you?"}
+    )
+
+    events = _events(response.text)
+    assert events[1] == ("token", {"content": "Partial"})
+    assert events[-1][0] == "error"
+    assert events[-1][1]["code"] == "LLMQueryError"
@@ -0,0 +1,81 @@
+from ai_service.chunking import chunk_code_file
+from ai_service.context_builder import assemble_context, build_context
+from ai_service.retrieval import Snippet
+
+REPO = "https://github.com/test/context.git"
+
+
+def _count_words(text: str) -> int:
+    """Stand-in tokenizer: one token per whitespace-separated word."""
+    return len(text.split())
+
+
+def _snippets(chunks: list[str], file_path: str = "src/app.py") -> list[Snippet]:
+    return [
+        Snippet(REPO, chunk, {"file_path": file_path}, float(rank))
+        for rank, chunk in enumerate(chunks)
+    ]
+
+
+def _file(line_count: int) -> str:
+    return "\n".join(f"line_{i}" for i in range(1, line_count + 1))
+
+
+def test_overlapping_chunks_are_merged_without_repeated_lines():
+    chunks = chunk_code_file("/tmp/repo/src/app.py", _file(55))
+    assert len(chunks) == 3  # lines 1-30, 26-55 and 51-55
+
+    context = build_context(_snippets(chunks), False, _count_words, max_tokens=1000)
+
+    lines = context.split("\n")
+    assert lines[0] == "# File: src/app.py (lines 1-55)"
+    assert lines[1:] == [f"line_{i}" for i in range(1, 56)]
+
+
+def test_distant_chunks_stay_separate_in_relevance_order():
+    chunks = chunk_code_file("/tmp/repo/src/app.py", _file(80))
+    # Most relevant first: the last chunk, then the first one
+    snippets = _snippets([chunks[-1], chunks[0]])
+
+    context = build_context(snippets, False, _count_words, max_tokens=1000)
+
+    parts = context.split("\n---\n")
+    assert parts[0].startswith("# File: src/app.py (lines 76-80)")
+    assert parts[1].startswith("# File: src/app.py (lines 1-30)")
+
+
+def test_budget_cuts_at_line_boundary():
+    chunks = chunk_code_file("/tmp/repo/src/app.py", _file(30))
+
+    context = build_context(_snippets(chunks), False, _count_words, max_tokens=20)
+
+    assert _count_words(context) <= 20
+    lines = context.split("\n")
+    assert lines[0].startswith("# File: src/app.py (lines 1-")
+    assert lines[-1] == "... [truncated]"
+    assert all(line.startswith("line_") for line in lines[1:-1])
+
+
+def test_reports_only_snippets_included_in_full():
+    near = chunk_code_file("/tmp/repo/src/app.py", _file(30))
+    far = chunk_code_file("/tmp/repo/src/other.py", _file(30))
+    snippets = _snippets(near) + _snippets(far, file_path="src/other.py")
+
+    # Room for the first file only; the second one is cut
+    context, included = assemble_context(snippets, False, _count_words, 50)
+
+    assert "... [truncated]" in context
+    assert included == snippets[: len(near)]
+
+
+def test_labels_repositories_and_keeps_unparsed_snippets():
+    snippets = [
+        Snippet(REPO, "plain text without a chunk header", {}, 0.1),
+        *_snippets(chunk_code_file("/tmp/repo/src/app.py", "def f():\n    pass")),
+    ]
+
+    context = build_context(snippets, True, _count_words, max_tokens=1000)
+
+    parts = context.split("\n---\n")
+    assert parts[0] == f"# Repository: {REPO}\nplain text without a chunk header"
+    assert parts[1].startswith(f"# Repository: {REPO}\n# File: src/app.py (lines 1-2)")
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ai_service import embeddings, errors
+from ai_service.embeddings import ipc
+from ai_service.embeddings.server import EmbeddingQueue, EmbeddingServer
+
+
+class FakeTokenizer:
+    def __call__(self, text: str, **_kwargs):
+        return {"input_ids": text.split()}
+
+
+class FakeModel:
+    """Embeds a text as [its length, 1], and records every forward pass."""
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.calls: list[tuple[str, list[str]]] = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _encode(self, kind: str, texts: list[str]) -> np.ndarray:
+        self.gate.wait()
+        self.calls.append((kind, list(texts)))
+        if "boom" in texts:
+            raise RuntimeError("model exploded")
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    def encode_query(self, texts, **_kwargs):
+        return self._encode("query", texts)
+
+    def encode_document(self, texts, **_kwargs):
+        return self._encode("document", texts)
+
+
+def _wait_until(condition, timeout_s: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+@pytest.fixture
+def queue(model: FakeModel):
+    queue = EmbeddingQueue(model, document_batch=2, query_batch=8)
+    queue.start()
+    yield queue
+    model.gate.set()
+    queue.stop()
+
+
+@pytest.fixture
+def server(queue: EmbeddingQueue, tmp_path, monkeypatch: pytest.MonkeyPatch):
+    path = str(tmp_path / "embed.sock")
+    server = EmbeddingServer(path, queue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("EMBEDDING_SERVER_SOCKET", path)
+    yield server
+    ipc._close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_queries_overtake_queued_documents(queue: EmbeddingQueue, model: FakeModel):
+    model.gate.clear()
+    documents = threading.Thread(
+        target=queue.encode, args=([f"doc {i}" for i in range(6)], False)
+    )
+    documents.start()
+    # The first document piece is in the model; the other two are queued
+    _wait_until(lambda: len(queue._documents) == 2)
+    queries = [
+        threading.Thread(target=queue.encode, args=([question], True))
+        for question in ("q1", "q2")
+    ]
+    for thread in queries:
+        thread.start()
+    _wait_until(lambda: len(queue._queries) == 2)
+
+    model.gate.set()
+    documents.join()
+    for thread in queries:
+        thread.join()
+
+    kinds = [kind for kind, _ in model.calls]
+    assert kinds == ["document", "query", "document", "document"]
+    # Both waiting queries were encoded in one forward pass
+    assert sorted(model.calls[1][1]) == ["q1", "q2"]
+
+
+def test_document_pieces_are_reassembled_in_order(queue: EmbeddingQueue):
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    result = queue.encode(texts, is_query=False)
+
+    assert result.tolist() == [[len(text), 1.0] for text in texts]
+
+
+def test_embeddings_come_through_the_socket(server: EmbeddingServer):
+    assert embeddings.embed_query("hello") == [5.0, 1.0]
+    assert embeddings.embed_documents(["a", "bbb"]) == [[1.0, 1.0], [3.0, 1.0]]
+    assert embeddings.count_tokens("def main ( )") == 4
+
+
+def test_client_reads_float32_without_copying(server: EmbeddingServer):
+    result = ipc.encode(["abc", "de"], is_query=False)
+
+    assert result.dtype == np.float32
+    assert result.shape == (2, 2)
+    # A view over the received bytes, not an array built from them
+    assert not result.flags.owndata
+    assert isinstance(result.base.base.obj, bytearray)
+
+
+def test_model_errors_reach_the_client(server: EmbeddingServer):
+    with pytest.raises(errors.EmbeddingError, match="model exploded"):
+        embeddings.embed_documents(["fine", "boom"])
+    # The connection stays usable afterwards
+    assert embeddings.embed_query("ok") == [2.0, 1.0]
+
+
+def test_missing_server_raises(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setenv("EMBEDDING_SERVER_SOCKET", str(tmp_path / "missing.sock"))
+    try:
+        with pytest.raises(errors.EmbeddingError, match="Cannot reach"):
+            embeddings.embed_query("hello")
+    finally:
+        ipc._close()
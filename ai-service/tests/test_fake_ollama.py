@@ -0,0 +1,68 @@
+import asyncio
+import importlib.util
+import os
+import time
+
+import httpx
+import pytest
+
+from ai_service import errors, metrics, ollama_client
+
+_PATH = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fake_ollama.py")
+_spec = importlib.util.spec_from_file_location("fake_ollama", _PATH)
+assert _spec and _spec.loader
+fake_ollama = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(fake_ollama)
+
+
+def _run_with_fake(monkeypatch: pytest.MonkeyPatch, call, **options):
+    """Run a call against the service's Ollama client wired to the fake server."""
+    monkeypatch.setenv("LLM_MODEL", "fake-model")
+    transport = httpx.ASGITransport(app=fake_ollama.create_app(**options))
+
+    async def run():
+        ollama_client.initialize_client(host="http://fake-ollama", transport=transport)
+        try:
+            return await call()
+        finally:
+            await ollama_client.close_client()
+
+    return asyncio.run(run())
+
+
+def test_chat_returns_configured_number_of_tokens(monkeypatch: pytest.MonkeyPatch):
+    metrics.reset()
+
+    answer = _run_with_fake(
+        monkeypatch, lambda: ollama_client.chat_with_ollama("one two three"), tokens=5
+    )
+
+    assert len(answer.split()) == 5
+    assert "ai_service_completion_tokens_total 5" in metrics.render()
+    assert "ai_service_prompt_tokens_total 3" in metrics.render()
+
+
+def test_stream_is_paced_by_token_rate(monkeypatch: pytest.MonkeyPatch):
+    async def collect() -> tuple[list[str], float]:
+        started = time.perf_counter()
+        tokens = [t async for t in ollama_client.stream_chat_with_ollama("hi")]
+        return tokens, time.perf_counter() - started
+
+    tokens, seconds = _run_with_fake(
+        monkeypatch, collect, tokens=6, tokens_per_s=100, latency_ms=50
+    )
+
+    assert len(tokens) == 6
+    # 50 ms to the first token, then 5 more at 10 ms each
+    assert seconds >= 0.095
+
+
+def test_load_model_without_messages(monkeypatch: pytest.MonkeyPatch):
+    _run_with_fake(monkeypatch, ollama_client.load_model, latency_ms=10_000)
+
+
+def test_injected_errors_surface_as_llm_errors(monkeypatch: pytest.MonkeyPatch):
+    with pytest.raises(errors.LLMQueryError):
+        _run_with_fake(
+            monkeypatch, lambda: ollama_client.chat_with_ollama("hi"), error_rate=1.0
+        )
@@ -0,0 +1,170 @@
+import asyncio
+import os
+
+import pytest
+from git import Actor, Repo
+
+from ai_service.db_setup import (
+    delete_repo,
+    discard_checkpoint,
+    get_collection,
+    list_collections,
+    load_checkpoint,
+    pending_ingests,
+    set_repo_context,
+)
+from ai_service.db_setup.setup import collection_name_for
+from ai_service.handlers import ingest
+
+_AUTHOR = Actor("Test", "test@example.com")
+FILES = [f"module_{i}.py" for i in range(5)]
+
+
+class Crash(Exception):
+    """Stands in for the process dying mid-ingest."""
+
+
+class FakeEmbedder:
+    """Records what it embeds; raises Crash once `crash_after` calls are done."""
+
+    def __init__(self, crash_after: int | None = None):
+        self.crash_after = crash_after
+        self.calls: list[list[str]] = []
+
+    def __call__(self, chunks: list[str]) -> list[list[float]]:
+        if len(self.calls) == self.crash_after:
+            raise Crash()
+        self.calls.append(list(chunks))
+        return [[1.0, float(i), float(len(chunk))] for i, chunk in enumerate(chunks)]
+
+    def embedded_files(self) -> set[str]:
+        return {
+            name for chunks in self.calls for name in FILES if name in "".join(chunks)
+        }
+
+
+def _commit(work_dir: str, files: dict[str, str]) -> str:
+    repo = Repo(work_dir)
+    for name, content in files.items():
+        with open(os.path.join(work_dir, name), "w") as f:
+            f.write(content)
+    repo.index.add(list(files))
+    sha = repo.index.commit("Update", author=_AUTHOR, committer=_AUTHOR).hexsha
+    repo.remote("origin").push("HEAD:refs/heads/main")
+    return sha
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    """A bare repository of five modules standing in for GitHub."""
+    for name in ("REPO_MIRROR_PATH", "SNAPSHOT_STORE_PATH", "NEAR_DUPLICATE_THRESHOLD"):
+        monkeypatch.delenv(name, raising=False)
+    # Two files per checkpoint: three batches
+    monkeypatch.setenv("INGEST_CHECKPOINT_FILES", "2")
+
+    bare = tmp_path / "upstream" / "app.git"
+    Repo.init(bare, bare=True, initial_branch="main")
+    work_dir = str(tmp_path / "work")
+    Repo.init(work_dir, initial_branch="main").create_remote("origin", str(bare))
+    sha = _commit(
+        work_dir,
+        {
+            name: f"def handler_{i}(request):\n    return {i}\n"
+            for i, name in enumerate(FILES)
+        },
+    )
+    url = f"file://{bare}"
+    yield url, work_dir, sha
+    discard_checkpoint(url)
+    delete_repo(url)
+
+
+def _crash_after_batches(
+    url: str, batches: int, monkeypatch: pytest.MonkeyPatch
+) -> FakeEmbedder:
+    embedder = FakeEmbedder(crash_after=batches)
+    monkeypatch.setattr(ingest, "embed_documents", embedder)
+    with pytest.raises(Crash):
+        ingest.ingest_github_project(url)
+    return embedder
+
+
+def test_resume_skips_the_files_already_stored(upstream, monkeypatch):
+    url, _, sha = upstream
+    crashed = _crash_after_batches(url, 2, monkeypatch)
+
+    checkpoint = load_checkpoint(url)
+    assert checkpoint is not None and checkpoint.commit_sha == sha
+    assert sorted(checkpoint.done_files) == FILES[:4]
+    assert pending_ingests() == [url]
+    # Nothing is published until the ingest completes
+    assert collection_name_for(url) not in list_collections()
+
+    resumed = FakeEmbedder()
+    monkeypatch.setattr(ingest, "embed_documents", resumed)
+    stats = ingest.ingest_github_project(url)
+
+    assert resumed.embedded_files() == {FILES[4]}
+    assert crashed.embedded_files().isdisjoint(resumed.embedded_files())
+    assert stats["resumed_files"] == 4
+    assert stats["embedded_chunks"] == len(resumed.calls[0])
+    set_repo_context(url)
+    assert get_collection().count() == stats["chunks"]
+    assert load_checkpoint(url) is None
+    assert pending_ingests() == []
+
+
+def test_startup_resume_stays_at_the_checkpointed_commit(upstream, monkeypatch):
+    url, work_dir, sha = upstream
+    _crash_after_batches(url, 1, monkeypatch)
+    _commit(work_dir, {FILES[4]: "def handler_4(request):\n    return 'changed'\n"})
+
+    monkeypatch.setattr(ingest, "embed_documents", FakeEmbedder())
+    asyncio.run(ingest.resume_pending_ingests())
+
+    assert list_collections()[collection_name_for(url)]["commit_sha"] == sha
+    set_repo_context(url)
+    stored = get_collection().get(include=["documents"])["documents"]
+    assert not any("changed" in document for document in stored)
+
+
+def test_explicit_ingest_after_head_moved_starts_over(upstream, monkeypatch):
+    url, work_dir, _ = upstream
+    _crash_after_batches(url, 1, monkeypatch)
+    head = _commit(
+        work_dir, {FILES[4]: "def handler_4(request):\n    return 'changed'\n"}
+    )
+
+    fresh = FakeEmbedder()
+    monkeypatch.setattr(ingest, "embed_documents", fresh)
+    stats = ingest.ingest_github_project(url)
+
+    assert stats["resumed_files"] == 0
+    assert fresh.embedded_files() == set(FILES)
+    assert list_collections()[collection_name_for(url)]["commit_sha"] == head
+    set_repo_context(url)
+    stored = get_collection().get(include=["documents"])["documents"]
+    assert any("changed" in document for document in stored)
+    assert load_checkpoint(url) is None
+
+
+def test_pending_ingests_are_resumed_on_startup(upstream, monkeypatch):
+    url, _, _ = upstream
+    _crash_after_batches(url, 1, monkeypatch)
+    resumed = FakeEmbedder()
+    monkeypatch.setattr(ingest, "embed_documents", resumed)
+
+    asyncio.run(ingest.resume_pending_ingests())
+
+    assert resumed.embedded_files() == set(FILES[2:])
+    assert collection_name_for(url) in list_collections()
+    assert pending_ingests() == []
+
+
+def test_resume_only_without_checkpoint_does_nothing(upstream, monkeypatch):
+    url, _, _ = upstream
+    embedder = FakeEmbedder()
+    monkeypatch.setattr(ingest, "embed_documents", embedder)
+
+    assert ingest.ingest_github_project(url, resume_only=True) == {}
+    assert embedder.calls == []
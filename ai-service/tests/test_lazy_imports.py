@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "git"]
+
+
+def _loaded_heavy_modules(statement: str) -> list[str]:
+    probe = (
+        f"import json, sys; {statement}; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import ai_service",
+        "import ai_service.chunking",
+        "import ai_service.context_builder",
+        "import ai_service.main",
+    ],
+)
+def test_heavy_dependencies_are_not_imported_eagerly(statement: str):
+    assert _loaded_heavy_modules(statement) == []
+
+
+def test_lazy_attributes_resolve_on_access():
+    assert _loaded_heavy_modules("import ai_service; ai_service.app") == []
+    assert "chromadb" in _loaded_heavy_modules(
+        "import os, tempfile; os.environ['CHROMA_STORE_PATH'] = tempfile.mkdtemp(); "
+        "import ai_service; ai_service.db_setup.initialize_db()"
+    )
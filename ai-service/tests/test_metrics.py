@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_service import metrics
+from ai_service.main import app
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_timed_stages_fill_cumulative_buckets():
+    metrics.observe("embed", 0.02)
+    metrics.observe("embed", 3.0)
+    with metrics.timed("scan"):
+        pass
+
+    text = metrics.render()
+
+    assert 'ai_service_stage_duration_seconds_bucket{stage="embed",le="0.01"} 0' in text
+    assert (
+        'ai_service_stage_duration_seconds_bucket{stage="embed",le="0.025"} 1' in text
+    )
+    assert 'ai_service_stage_duration_seconds_bucket{stage="embed",le="+Inf"} 2' in text
+    assert 'ai_service_stage_duration_seconds_count{stage="embed"} 2' in text
+    assert 'ai_service_stage_duration_seconds_count{stage="scan"} 1' in text
+
+
+def test_timed_records_failing_blocks():
+    with pytest.raises(ValueError):
+        with metrics.timed("clone"):
+            raise ValueError("boom")
+
+    assert 'ai_service_stage_duration_seconds_count{stage="clone"} 1' in (
+        metrics.render()
+    )
+
+
+def test_counters():
+    metrics.count("chunks", 3)
+    metrics.count("chunks", 2)
+    metrics.count("answer_cache_hits")
+
+    text = metrics.render()
+
+    assert "ai_service_chunks_total 5" in text
+    assert "ai_service_answer_cache_hits_total 1" in text
+    assert "ai_service_files_total 0" in text
+
+
+@pytest.mark.parametrize("value", ["0", "false", "Off", "no"])
+def test_disabled_metrics_record_nothing(monkeypatch: pytest.MonkeyPatch, value: str):
+    monkeypatch.setenv("METRICS_ENABLED", value)
+    metrics.reset()
+
+    metrics.count("files")
+    with metrics.timed("scan"):
+        pass
+
+    text = metrics.render()
+    assert "ai_service_files_total 0" in text
+    assert 'stage="scan"' not in text
+
+
+def test_metrics_endpoint_serves_text_format():
+    metrics.observe("llm_generation", 1.5)
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE ai_service_stage_duration_seconds histogram" in response.text
+    assert 'stage="llm_generation"' in response.text
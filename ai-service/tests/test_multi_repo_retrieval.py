@@ -0,0 +1,43 @@
+"""
+Integration tests - question answering across several repositories.
+Embeds once, fans out over the repository collections and merges by score.
+"""
+
+import pytest
+from ai_service.db_setup import add_chunks, set_repo_context
+from ai_service.embeddings import embed_documents, embed_query
+from ai_service.handlers.answer import build_prompt
+from ai_service.retrieval import retrieve_snippets
+
+AUTH_REPO = "https://github.com/test/multi-repo-auth.git"
+BILLING_REPO = "https://github.com/test/multi-repo-billing.git"
+
+
+@pytest.fixture
+def two_repos() -> None:
+    for repo_url, code in [
+        (AUTH_REPO, "def login(user, password): return check_password(user, password)"),
+        (BILLING_REPO, "def create_invoice(customer, amount): return Invoice(amount)"),
+    ]:
+        set_repo_context(repo_url)
+        add_chunks([code], embed_documents([code]), [{"file_path": "service.py"}])
+
+
+def test_retrieves_from_all_repositories(two_repos: None):
+    snippets = retrieve_snippets(
+        embed_query("how are users logged in?"), [AUTH_REPO, BILLING_REPO]
+    )
+
+    assert {snippet.repo_url for snippet in snippets} == {AUTH_REPO, BILLING_REPO}
+    # Merged by score: the login code is the closest match
+    assert snippets[0].repo_url == AUTH_REPO
+    assert snippets == sorted(snippets, key=lambda snippet: snippet.distance)
+
+
+def test_answer_prompt_contains_context_from_each_repository(two_repos: None):
+    prompt, _ = build_prompt(
+        "How do login and invoices work?", [AUTH_REPO, BILLING_REPO]
+    )
+
+    assert f"# Repository: {AUTH_REPO}" in prompt
+    assert f"# Repository: {BILLING_REPO}" in prompt
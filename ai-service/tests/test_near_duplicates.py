@@ -0,0 +1,91 @@
+import pytest
+
+from ai_service.chunking import chunk_code_file, find_near_duplicates
+from ai_service.chunking.near_duplicates import NUM_PERMUTATIONS, lsh_bands
+from ai_service.handlers.ingest import _collapse_near_duplicates
+
+_LICENSE = """\
+Copyright (c) {year} The Example Authors
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions.
+"""
+
+
+def _function(name: str, body: str) -> str:
+    return "\n".join(
+        [
+            f"def {name}(items, limit=10):",
+            f'    """{body}"""',
+            "    selected = []",
+            "    for item in items:",
+            "        if len(selected) >= limit:",
+            "            break",
+            f"        selected.append({body}(item))",
+            "    return selected",
+        ]
+    )
+
+
+def test_license_headers_in_different_files_are_duplicates():
+    chunks = [
+        chunk_code_file("/repo/a/LICENSE.md", _LICENSE.format(year=2023))[0],
+        chunk_code_file("/repo/b/LICENSE.md", _LICENSE.format(year=2024))[0],
+        chunk_code_file("/repo/c/tools.py", _function("select", "transform"))[0],
+    ]
+
+    assert find_near_duplicates(chunks, threshold=0.8) == [None, 0, None]
+
+
+def test_threshold_decides_how_similar_is_similar_enough():
+    original = _function("select", "transform")
+    edited = original.replace("limit=10", "limit=20")
+    chunks = [
+        chunk_code_file("/repo/a.py", original)[0],
+        chunk_code_file("/repo/b.py", edited)[0],
+    ]
+
+    assert find_near_duplicates(chunks, threshold=0.7) == [None, 0]
+    assert find_near_duplicates(chunks, threshold=0.99) == [None, None]
+
+
+def test_distinct_code_is_kept():
+    chunks = [
+        chunk_code_file(f"/repo/{name}.py", _function(name, body))[0]
+        for name, body in [("load", "parse"), ("save", "dump"), ("rank", "score")]
+    ]
+
+    assert find_near_duplicates(chunks, threshold=0.8) == [None, None, None]
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7, 0.8, 0.9, 0.95])
+def test_bands_divide_the_signature(threshold: float):
+    bands = lsh_bands(threshold)
+
+    assert NUM_PERMUTATIONS % bands == 0
+    # Candidate pairs start below the threshold, so near-duplicates aren't missed
+    assert (1 / bands) ** (bands / NUM_PERMUTATIONS) <= threshold
+
+
+def test_collapsed_chunks_record_the_other_files():
+    chunks = [
+        chunk_code_file("/repo/a/LICENSE.md", _LICENSE.format(year=2023))[0],
+        chunk_code_file("/repo/b/LICENSE.md", _LICENSE.format(year=2024))[0],
+        chunk_code_file("/repo/c/LICENSE.md", _LICENSE.format(year=2025))[0],
+    ]
+    metadatas = [
+        {"file_path": "a/LICENSE.md"},
+        {"file_path": "b/LICENSE.md"},
+        {"file_path": "c/LICENSE.md"},
+    ]
+
+    kept, kept_metadatas = _collapse_near_duplicates(chunks, metadatas, 0.8)
+
+    assert kept == chunks[:1]
+    assert kept_metadatas == [
+        {"file_path": "a/LICENSE.md", "duplicate_files": "b/LICENSE.md, c/LICENSE.md"}
+    ]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from ai_service import errors, ollama_client
+
+
+def _fake_ollama(delay: float, in_flight: list[int], peak: list[int]):
+    """An Ollama chat API stand-in that records how many requests overlap."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(delay)
+        in_flight[0] -= 1
+        body = json.loads(request.content)
+        if body.get("stream"):
+            lines = [
+                {"model": body["model"], "message": {"role": "assistant", "content": t}}
+                for t in ["Hel", "lo"]
+            ]
+            content = "\n".join(json.dumps(line) for line in lines) + "\n"
+            return httpx.Response(200, content=content)
+        return httpx.Response(
+            200,
+            json={
+                "model": body["model"],
+                "message": {"role": "assistant", "content": "Hello"},
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("LLM_MODEL", "fake-model")
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+    in_flight, peak = [0], [0]
+
+    async def start() -> None:
+        ollama_client.initialize_client(
+            host="http://fake-ollama", transport=_fake_ollama(0.05, in_flight, peak)
+        )
+
+    yield start, peak
+    asyncio.run(ollama_client.close_client())
+
+
+def test_concurrent_generations_are_capped(fake_ollama):
+    start, peak = fake_ollama
+
+    async def run() -> list[str]:
+        await start()
+        return await asyncio.gather(
+            *(ollama_client.chat_with_ollama(f"question {i}") for i in range(10))
+        )
+
+    answers = asyncio.run(run())
+
+    assert answers == ["Hello"] * 10
+    assert peak[0] == 2
+
+
+def test_stream_yields_tokens(fake_ollama):
+    start, _ = fake_ollama
+
+    async def run() -> list[str]:
+        await start()
+        return [token async for token in ollama_client.stream_chat_with_ollama("hi")]
+
+    assert asyncio.run(run()) == ["Hel", "lo"]
+
+
+def test_chat_requires_initialized_client():
+    async def run() -> str:
+        return await ollama_client.chat_with_ollama("hi")
+
+    with pytest.raises(errors.LLMQueryError):
+        asyncio.run(run())
+
+
+@pytest.mark.parametrize("keep_alive, expected", [("30m", "30m"), ("-1", -1)])
+def test_load_model_sends_configured_keep_alive(
+    monkeypatch: pytest.MonkeyPatch, keep_alive: str, expected: object
+):
+    monkeypatch.setenv("LLM_MODEL", "fake-model")
+    monkeypatch.setenv("LLM_KEEP_ALIVE", keep_alive)
+    bodies: list[dict[str, object]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(
+            200, json={"model": "fake-model", "message": {"role": "assistant"}}
+        )
+
+    async def run() -> None:
+        ollama_client.initialize_client(
+            host="http://fake-ollama", transport=httpx.MockTransport(handler)
+        )
+        try:
+            await ollama_client.load_model()
+        finally:
+            await ollama_client.close_client()
+
+    asyncio.run(run())
+
+    assert bodies[0]["keep_alive"] == expected
+    assert not bodies[0].get("messages")
@@ -0,0 +1,124 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/task"), reason="needs Linux /proc"
+)
+
+_APP = textwrap.dedent(
+    """
+    import os
+    import preloaded
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = f'{{"pid": {os.getpid()}, "loaded_by": {preloaded.loaded_by}}}'
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": body.encode()})
+    """
+)
+
+_SERVER = textwrap.dedent(
+    """
+    import os, sys
+    from ai_service import prefork
+
+    def preload():
+        import preloaded
+        preloaded.loaded_by = os.getpid()
+
+    prefork.RESTART_DELAY_SECONDS = 0.1
+    prefork.serve("fake_app:app", "127.0.0.1", int(sys.argv[1]), 2, preload=preload)
+    """
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid: int) -> set[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(child) for child in f.read().split()}
+
+
+def _wait_until(condition, timeout_s: float = 20.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            result = condition()
+            if result:
+                return result
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError("condition not met")
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "fake_app.py").write_text(_APP)
+    (tmp_path / "preloaded.py").write_text("loaded_by = None\n")
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(tmp_path), *sys.path]),
+    }
+    process = subprocess.Popen([sys.executable, "-c", _SERVER, str(port)], env=env)
+    yield process, f"http://127.0.0.1:{port}"
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+def _get(url: str) -> dict[str, int]:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+def test_workers_are_forked_after_preload(server):
+    process, url = server
+
+    response = _wait_until(lambda: _get(url))
+    workers = _wait_until(
+        lambda: len(_children(process.pid)) == 2 and _children(process.pid)
+    )
+
+    # Preloading ran once, in the parent, and the workers inherited it
+    assert response["loaded_by"] == process.pid
+    assert response["pid"] in workers
+
+
+def test_dead_worker_is_replaced_and_shutdown_is_clean(server):
+    process, url = server
+    _wait_until(lambda: _get(url))
+    workers = _wait_until(
+        lambda: len(_children(process.pid)) == 2 and _children(process.pid)
+    )
+
+    victim = next(iter(workers))
+    os.kill(victim, signal.SIGKILL)
+    replaced = _wait_until(
+        lambda: (
+            len(_children(process.pid)) == 2
+            and victim not in _children(process.pid)
+            and _children(process.pid)
+        )
+    )
+    assert len(replaced & workers) == 1
+    assert _get(url)["loaded_by"] == process.pid
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=20) == 0
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_service import metrics, profiling
+
+
+def _busy_work(seconds: float) -> list[bytes]:
+    """Spin the CPU and keep some allocations alive."""
+    kept = [bytes(100_000) for _ in range(20)]
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return kept
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_TOKEN", "secret")
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "1")
+    app = FastAPI()
+
+    # A sync endpoint like /ingest, run in a worker thread
+    @app.post("/ingest")
+    def ingest() -> dict[str, int]:
+        with metrics.timed("embed"):
+            kept = _busy_work(0.1)
+        return {"kept": len(kept)}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    yield TestClient(app)
+    metrics.set_stage_hook(None)
+
+
+def test_profiled_request_writes_artifacts(client: TestClient, tmp_path):
+    response = client.post("/ingest", headers={"X-Profile-Token": "secret"})
+
+    assert response.status_code == 200
+    directory = os.path.join(tmp_path, response.headers["x-profile-id"])
+    assert sorted(os.listdir(directory)) == [
+        "allocations.txt",
+        "stacks.folded",
+        "summary.json",
+        "tracemalloc.snapshot",
+    ]
+    with open(os.path.join(directory, "summary.json")) as f:
+        summary = json.load(f)
+    assert summary["path"] == "/ingest"
+    assert summary["status"] == 200
+    [stage] = summary["stages"]
+    assert stage["stage"] == "embed"
+    assert stage["ms"] >= 100
+    assert stage["rss_peak"] >= stage["rss_start"]
+    assert stage["traced_peak"] - stage["traced_start"] >= 2_000_000
+    # The worker thread's work shows up in the samples
+    assert any("_busy_work" in f["function"] for f in summary["top_functions"])
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile-Token": "wrong"}])
+def test_requests_without_the_token_are_not_profiled(
+    client: TestClient, tmp_path, headers: dict[str, str]
+):
+    response = client.post("/ingest", headers=headers)
+
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+def test_profiling_needs_dir_and_token(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("PROFILE_DIR", "/tmp/profiles")
+    monkeypatch.delenv("PROFILE_TOKEN", raising=False)
+
+    assert not profiling.is_configured()
+
+
+def test_stage_hook_runs_with_metrics_disabled(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("METRICS_ENABLED", "0")
+    metrics.reset()
+    calls: list[str] = []
+
+    def hook(stage: str):
+        calls.append(f"start {stage}")
+        return lambda: calls.append(f"end {stage}")
+
+    metrics.set_stage_hook(hook)
+    try:
+        with metrics.timed("scan"):
+            calls.append("body")
+    finally:
+        metrics.set_stage_hook(None)
+        metrics.reset()
+
+    assert calls == ["start scan", "body", "end scan"]
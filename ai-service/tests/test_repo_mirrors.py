@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from git import Actor, Repo
+
+from ai_service import errors, metrics, project_ingestor, repo_mirrors
+
+_AUTHOR = Actor("Test", "test@example.com")
+
+
+def _commit(work_dir: str, name: str, content: str) -> str:
+    repo = Repo(work_dir)
+    with open(os.path.join(work_dir, name), "w") as f:
+        f.write(content)
+    repo.index.add([name])
+    sha = repo.index.commit(f"Add {name}", author=_AUTHOR, committer=_AUTHOR).hexsha
+    repo.remote("origin").push("HEAD:refs/heads/main")
+    return sha
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """A bare repository standing in for GitHub, and a clone to push to it from."""
+
+    def create(name: str) -> tuple[str, str]:
+        bare = tmp_path / "upstream" / f"{name}.git"
+        Repo.init(bare, bare=True, initial_branch="main")
+        work_dir = tmp_path / "work" / name
+        Repo.init(work_dir, initial_branch="main").create_remote("origin", str(bare))
+        _commit(str(work_dir), "main.py", f"print('{name}')\n")
+        return f"file://{bare}", str(work_dir)
+
+    return create
+
+
+@pytest.fixture(autouse=True)
+def mirror_path(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "mirrors"
+    monkeypatch.setenv("REPO_MIRROR_PATH", str(path))
+    monkeypatch.delenv("REPO_MIRROR_MAX_BYTES", raising=False)
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    metrics.reset()
+    yield path
+    metrics.reset()
+
+
+def _mirrors(mirror_path) -> list[str]:
+    return sorted(os.listdir(mirror_path / "mirrors"))
+
+
+def test_repeat_ingest_fetches_into_the_mirror(upstream, mirror_path):
+    url, work_dir = upstream("app")
+
+    first = project_ingestor.clone_github_repo(url)
+    project_ingestor.cleanup_dir(first)
+    sha = _commit(work_dir, "util.py", "def util(): ...\n")
+    second = project_ingestor.clone_github_repo(url)
+
+    try:
+        assert project_ingestor.head_commit(second) == sha
+        assert sorted(os.listdir(second)) == [".git", "main.py", "util.py"]
+        assert len(_mirrors(mirror_path)) == 1
+        text = metrics.render()
+        assert "ai_service_repo_mirror_misses_total 1" in text
+        assert "ai_service_repo_mirror_hits_total 1" in text
+    finally:
+        project_ingestor.cleanup_dir(second)
+
+
+def test_concurrent_ingests_of_one_repository(upstream):
+    url, work_dir = upstream("app")
+    sha = Repo(work_dir).head.commit.hexsha
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        checkouts = list(pool.map(repo_mirrors.checkout, [url] * 6))
+
+    try:
+        assert len(set(checkouts)) == 6
+        assert {project_ingestor.head_commit(path) for path in checkouts} == {sha}
+    finally:
+        for path in checkouts:
+            project_ingestor.cleanup_dir(path)
+
+
+def test_least_recently_used_mirrors_are_evicted(
+    upstream, mirror_path, monkeypatch: pytest.MonkeyPatch
+):
+    # Room for about one mirror
+    monkeypatch.setenv("REPO_MIRROR_MAX_BYTES", "1")
+    first_url, _ = upstream("first")
+    second_url, _ = upstream("second")
+
+    in_use = repo_mirrors.checkout(first_url)
+    second = repo_mirrors.checkout(second_url)
+    # The first mirror has a worktree being ingested, so it stays
+    assert len(_mirrors(mirror_path)) == 2
+
+    project_ingestor.cleanup_dir(in_use)
+    project_ingestor.cleanup_dir(second)
+    third = repo_mirrors.checkout(second_url)
+    project_ingestor.cleanup_dir(third)
+
+    [kept] = _mirrors(mirror_path)
+    assert kept.startswith("upstream_second-")
+
+
+def test_failed_clone_leaves_no_mirror(tmp_path, mirror_path):
+    with pytest.raises(errors.GitCloneError):
+        repo_mirrors.checkout(f"file://{tmp_path}/missing.git")
+
+    assert _mirrors(mirror_path) == []
@@ -0,0 +1,37 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ai_service.handlers import common
+
+SLOW = "https://github.com/test/slow.git"
+FAST = "https://github.com/test/fast.git"
+
+
+def test_restores_of_different_repositories_overlap(monkeypatch: pytest.MonkeyPatch):
+    stored: set[str] = set()
+    fast_restored = threading.Event()
+
+    def ingest(repo_url: str) -> dict[str, int]:
+        # The slow restore only finishes once the other one could run alongside
+        if repo_url == SLOW:
+            assert fast_restored.wait(timeout=5)
+        else:
+            fast_restored.set()
+        stored.add(repo_url)
+        return {}
+
+    monkeypatch.setattr(common, "is_stored", lambda url: url in stored)
+    monkeypatch.setattr(common, "is_evicted", lambda url: url not in stored)
+    monkeypatch.setattr(common, "has_snapshot", lambda url: False)
+    monkeypatch.setattr(common, "ingest_github_project", ingest)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        restores = [
+            pool.submit(common.restore_missing, [url]) for url in (SLOW, SLOW, FAST)
+        ]
+        for restore in restores:
+            restore.result(timeout=10)
+
+    assert stored == {SLOW, FAST}
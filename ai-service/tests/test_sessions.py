@@ -0,0 +1,161 @@
+import asyncio
+import os
+import time
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_service import sessions
+from ai_service.main import app
+
+
+@pytest.fixture
+def chat_calls(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    calls: list[dict[str, Any]] = []
+
+    async def fake_chat(prompt: Any, keep_alive: Any = None) -> str:
+        calls.append({"messages": prompt, "keep_alive": keep_alive})
+        return f"Answer {len(calls)}"
+
+    monkeypatch.setattr("ai_service.ollama_client.chat_with_ollama", fake_chat)
+    monkeypatch.setattr(
+        sessions, "_store", sessions.SessionStore(10, max_turns=2, ttl_seconds=60)
+    )
+    return calls
+
+
+def test_follow_ups_extend_the_previous_messages(chat_calls):
+    client = TestClient(app)
+    session_id = client.post("/sessions", json={}).json()["session_id"]
+
+    for question in ["Hi!", "What can you do?"]:
+        response = client.post(
+            f"/sessions/{session_id}/answer", json={"user_question": question}
+        )
+        assert response.status_code == 200
+
+    first, second = chat_calls[0]["messages"], chat_calls[1]["messages"]
+    assert [m["role"] for m in first] == ["system", "user"]
+    # The second request starts with exactly the first one and its answer
+    assert second[: len(first)] == first
+    assert second[len(first)] == {"role": "assistant", "content": "Answer 1"}
+    assert second[-1] == {"role": "user", "content": "What can you do?"}
+    assert chat_calls[1]["keep_alive"] == 60
+    assert response.json() == {"answer": "Answer 2", "turn": 2}
+
+
+def test_oldest_turns_are_dropped_over_the_limit(chat_calls):
+    client = TestClient(app)
+    session_id = client.post("/sessions", json={}).json()["session_id"]
+
+    for question in ["One", "Two", "Three", "Four"]:
+        client.post(f"/sessions/{session_id}/answer", json={"user_question": question})
+
+    user_messages = [
+        m["content"] for m in chat_calls[-1]["messages"] if m["role"] == "user"
+    ]
+    assert user_messages == ["Two", "Three", "Four"]
+
+
+def test_unknown_and_deleted_sessions_are_not_found(chat_calls):
+    client = TestClient(app)
+    session_id = client.post("/sessions", json={}).json()["session_id"]
+
+    assert client.delete(f"/sessions/{session_id}").status_code == 200
+    response = client.post(
+        f"/sessions/{session_id}/answer", json={"user_question": "Hi!"}
+    )
+    assert response.status_code == 404
+    assert response.json()["code"] == "NotFound"
+
+
+def test_sessions_expire_and_are_bounded(monkeypatch: pytest.MonkeyPatch):
+    store = sessions.SessionStore(max_sessions=2, max_turns=5, ttl_seconds=60)
+    first = store.create([], "system")
+    second = store.create([], "system")
+    store.get(first.session_id)  # Now the most recently used
+    store.create([], "system")
+
+    with pytest.raises(sessions.errors.NotFound):
+        store.get(second.session_id)
+
+    monkeypatch.setattr(sessions.time, "time", lambda: first.last_used + 61)
+    with pytest.raises(sessions.errors.NotFound):
+        store.get(first.session_id)
+
+
+def _shared_stores(tmp_path) -> tuple[sessions.SessionStore, sessions.SessionStore]:
+    """Two workers' stores over one directory."""
+    return tuple(
+        sessions.SharedSessionStore(
+            str(tmp_path), max_sessions=2, max_turns=2, ttl_seconds=60
+        )
+        for _ in range(2)
+    )
+
+
+def test_shared_sessions_continue_on_any_worker(tmp_path):
+    first, second = _shared_stores(tmp_path)
+    session = first.create(["https://github.com/a/b"], "system")
+
+    async def answer(store: sessions.SessionStore, question: str) -> None:
+        current = store.get(session.session_id)
+        async with store.turn_lock(current):
+            store.add_turn(current, sessions.Turn(question, f"Re: {question}"))
+
+    async def run() -> None:
+        # Concurrent turns on two workers are serialized, not lost
+        await asyncio.gather(answer(first, "One"), answer(second, "Two"))
+        await answer(first, "Three")
+
+    asyncio.run(run())
+
+    turns = second.get(session.session_id).turns
+    assert [turn.user_message for turn in turns][-1] == "Three"
+    assert len(turns) == 2
+    assert second.get(session.session_id).repo_urls == ["https://github.com/a/b"]
+    assert second.delete(session.session_id)
+    with pytest.raises(sessions.errors.NotFound):
+        first.get(session.session_id)
+
+
+def test_shared_sessions_expire_and_are_bounded(
+    tmp_path, monkeypatch: pytest.MonkeyPatch
+):
+    first, second = _shared_stores(tmp_path)
+    oldest = first.create([], "system")
+    kept = second.create([], "system")
+    time.sleep(0.01)
+    first.get(oldest.session_id)  # Now the most recently used
+    second.create([], "system")
+
+    with pytest.raises(sessions.errors.NotFound):
+        first.get(kept.session_id)
+    with pytest.raises(sessions.errors.NotFound):
+        first.get("../../etc/passwd")
+
+    now = time.time()
+    monkeypatch.setattr(sessions.time, "time", lambda: now + 61)
+    with pytest.raises(sessions.errors.NotFound):
+        second.get(oldest.session_id)
+    # Only the store-wide lock file, which is never deleted, is left
+    assert os.listdir(tmp_path) == [".store.lock"]
+
+
+def test_lock_of_a_removed_session_is_kept_while_held(tmp_path):
+    first, second = _shared_stores(tmp_path)
+    session = first.create([], "system")
+    lock_path = tmp_path / f"{session.session_id}.lock"
+
+    async def run() -> None:
+        async with first.turn_lock(session):
+            # Deleted by another worker while this turn is being answered
+            assert second.delete(session.session_id)
+            second.create([], "system")
+            assert lock_path.exists()
+        second.create([], "system")
+
+    asyncio.run(run())
+
+    assert not lock_path.exists()
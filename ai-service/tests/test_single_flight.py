@@ -0,0 +1,113 @@
+import asyncio
+from typing import AsyncIterator
+
+import pytest
+
+from ai_service.handlers import answer_question
+from ai_service.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def work() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run() -> list[str]:
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_calls_after_completion_run_again():
+    calls = []
+
+    async def work() -> int:
+        calls.append(1)
+        return len(calls)
+
+    async def run() -> list[int]:
+        flight = SingleFlight("test")
+        return [await flight.do("key", work), await flight.do("key", work)]
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_errors_reach_every_follower():
+    async def work() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run() -> list[object]:
+        flight = SingleFlight("test")
+        return await asyncio.gather(
+            *(flight.do("key", work) for _ in range(3)), return_exceptions=True
+        )
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def work() -> str:
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run() -> str:
+        flight = SingleFlight("test")
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "result"
+
+
+def test_late_stream_subscriber_replays_then_follows():
+    starts = []
+
+    async def tokens() -> AsyncIterator[str]:
+        starts.append(1)
+        for token in ["a", "b", "c", "d"]:
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def collect(stream: AsyncIterator[str]) -> list[str]:
+        return [token async for token in stream]
+
+    async def run() -> tuple[list[str], list[str]]:
+        flight = SingleFlight("test")
+        leader = asyncio.create_task(collect(flight.stream("key", tokens)))
+        await asyncio.sleep(0.025)  # Leader has received some tokens
+        follower = await collect(flight.stream("key", tokens))
+        return await leader, follower
+
+    leader, follower = asyncio.run(run())
+    assert leader == follower == ["a", "b", "c", "d"]
+    assert len(starts) == 1
+
+
+def test_identical_questions_share_one_generation(monkeypatch: pytest.MonkeyPatch):
+    prompts = []
+
+    async def fake_chat(prompt: str) -> str:
+        prompts.append(prompt)
+        await asyncio.sleep(0.05)
+        return "Hello!"
+
+    monkeypatch.setattr("ai_service.ollama_client.chat_with_ollama", fake_chat)
+
+    async def run() -> list[str]:
+        return await asyncio.gather(
+            answer_question("Hi, how are you?"),
+            answer_question("hi,   HOW are you?"),
+            answer_question("Something else"),
+        )
+
+    assert asyncio.run(run()) == ["Hello!"] * 3
+    assert len(prompts) == 2
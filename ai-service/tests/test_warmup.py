@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ai_service import errors, warmup
+from ai_service.db_setup import (
+    add_chunks,
+    delete_repo,
+    list_collections,
+    record_ingest,
+    staged_ingest,
+)
+from ai_service.db_setup.setup import collection_name_for
+from ai_service.main import app
+
+
+class FakeCollection:
+    def query(self, query_embeddings: list[list[float]], n_results: int) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_steps(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    calls: list[str] = []
+
+    async def load_model() -> None:
+        calls.append("llm")
+
+    monkeypatch.setattr(warmup, "embed_query", lambda text: [1.0, 0.0])
+    monkeypatch.setattr(warmup, "is_stored", lambda url: url.endswith("hot.git"))
+    monkeypatch.setattr(warmup, "set_repo_context", calls.append)
+    monkeypatch.setattr(warmup, "get_collection", lambda: FakeCollection())
+    monkeypatch.setattr("ai_service.ollama_client.load_model", load_model)
+    return calls
+
+
+def test_warm_up_runs_every_step_then_is_ready(
+    monkeypatch: pytest.MonkeyPatch, fake_steps: list[str]
+):
+    monkeypatch.setenv(
+        "WARMUP_COLLECTIONS",
+        "https://github.com/test/hot.git, https://github.com/test/missing.git",
+    )
+
+    asyncio.run(warmup.warm_up())
+
+    assert fake_steps == ["https://github.com/test/hot.git", "llm"]
+    status = warmup.status()
+    assert status["ready"] is True
+    assert set(status["warmup"]) == {"embedding_model", "collections", "llm"}
+    assert all(step["ok"] for step in status["warmup"].values())
+
+
+@pytest.mark.parametrize("value", ["0", "false", "False", "off"])
+def test_warm_up_can_be_disabled(
+    monkeypatch: pytest.MonkeyPatch, fake_steps: list[str], value: str
+):
+    monkeypatch.setenv("WARMUP_ENABLED", value)
+
+    asyncio.run(warmup.warm_up())
+
+    assert fake_steps == []
+    assert warmup.status() == {"ready": True, "warmup": {}}
+
+
+def test_failed_step_is_reported_but_still_ready(
+    monkeypatch: pytest.MonkeyPatch, fake_steps: list[str]
+):
+    async def unreachable() -> None:
+        raise errors.LLMQueryError.query_failed(ConnectionError("down"))
+
+    monkeypatch.setattr("ai_service.ollama_client.load_model", unreachable)
+
+    asyncio.run(warmup.warm_up())
+
+    status = warmup.status()
+    assert status["ready"] is True
+    assert status["warmup"]["llm"]["ok"] is False
+
+
+def test_preloading_does_not_count_as_a_query(monkeypatch: pytest.MonkeyPatch):
+    repo_url = "https://github.com/test/warmup-hot.git"
+    with staged_ingest(repo_url):
+        add_chunks(["def hot(): pass"], [[1.0, 0.0]])
+        record_ingest(dimension=2)
+    monkeypatch.setenv("WARMUP_COLLECTIONS", repo_url)
+    try:
+        assert warmup._preload_collections([1.0, 0.0]) == [repo_url]
+        assert list_collections()[collection_name_for(repo_url)]["last_query"] is None
+    finally:
+        delete_repo(repo_url)
+
+
+def test_ready_endpoint_is_unavailable_until_warm(monkeypatch: pytest.MonkeyPatch):
+    client = TestClient(app)
+
+    monkeypatch.setattr(warmup, "_ready", False)
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").status_code == 200
+
+    monkeypatch.setattr(warmup, "_ready", True)
+    assert client.get("/ready").status_code == 200